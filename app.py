@@ -29,6 +29,8 @@ import coloredlogs, logging
 from core import misc
 from core import eth
 from core import bsc
+from core import keypool
+from core import db
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "http://127.0.0.1:4200"}})  # TODO: Move in API_Server
@@ -134,12 +136,17 @@ def get_data_info():
         return Response(eth.event_stream_ether(params), mimetype='text/event-stream')
 
 
+@app.route('/api-usage', methods=['GET'])
+def api_usage():
+    # INFO: Calls, rate limits, invalid and errors by (masked) API key
+    return {"keys": keypool.usage()}
+
+
 @app.route('/download_db')
 def download_investigation():
-    # TODO: Get from config file
     # HACK: Multiuser?
-    file_path = './default.db'  # Change for the path
-    return send_file(file_path, as_attachment=True)
+    file_path = db.export(current_app.config['config'])  # INFO: Investigation and labels in one file
+    return send_file(file_path, as_attachment=True, download_name='default.db')
 
 
 @app.route('/reset_db')
@@ -193,7 +200,8 @@ if __name__ == '__main__':
         API_proc = multiprocessing.Process(name='API',
                                              target=API_Server,
                                              kwargs=kwargs_flask)
-        API_proc.daemon = True
+        # NOTE: Not daemon, a daemon process can not start the classification workers (it is joined below)
+        API_proc.daemon = False
 
         logger.info("HTTPD starting...")
         httpd_proc = multiprocessing.Process(name='httpd',
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+__author__ = "KennBro"
+__copyright__ = "Copyright 2024, Personal Research"
+__credits__ = ["KennBro"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "KennBro"
+__email__ = "kennbro <at> protonmail <dot> com"
+__status__ = "Development"
+
+import re
+import time
+import json
+import random
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+from core import cache
+from core import backend
+from core import keypool
+from core import ratelimit
+
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = 10  # INFO: Connections kept alive per host (eth and bsc workers share the session)
+TIMEOUT = (5, 60)  # INFO: (connect, read) seconds, a full page of 10000 rows can take a while
+RETRIES = 5
+BACKOFF_BASE = 1  # INFO: Seconds, doubled on every retry
+BACKOFF_MAX = 30
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+timeout = TIMEOUT
+retries = RETRIES
+decoder = json.JSONDecoder()
+session = None
+session_lock = threading.Lock()
+
+
+def configure(config):
+    # INFO: api_timeout (read seconds), api_retries and rate_limit in config.yaml for every explorer call
+    global timeout, retries
+
+    timeout = (TIMEOUT[0], float(config.get("api_timeout", TIMEOUT[1])))
+    retries = int(config.get("api_retries", RETRIES))
+    ratelimit.configure(config)
+    cache.configure(config)
+    backend.configure(config)
+
+
+def get_session():
+    # INFO: One pooled session for the whole process, connections stay open between calls
+    global session
+
+    with session_lock:
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+        return session
+
+
+def cached_response(url, content):
+    response = requests.Response()
+    response._content = content
+    response.status_code = 200
+    response.encoding = "utf-8"
+    response.url = url
+    response.waited = 0.0
+    return response
+
+
+def classify(response):
+    # INFO: Server errors and throttling are worth another try, the rate limit NOTOK and the
+    #       invalid key NOTOK are worth another key. Any other NOTOK (bad address...) is not
+    if (response.status_code >= 500) or (response.status_code == 429):
+        return "errors"
+    head = response.content[:256].lower()
+    if b"notok" in head:
+        if b"rate limit" in head:
+            return "rate_limited"
+        if b"invalid api key" in head:
+            return "invalid"
+    return None
+
+
+def backoff(attempt):
+    # INFO: Exponential backoff with full jitter so concurrent workers do not retry together
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+def get(keys, url):
+    # INFO: Rate limited GET to the explorer (url without apikey), answered from the response cache
+    #       when possible. keys (a key or a list) are used round robin. Transient failures are
+    #       retried with backoff or with another key. The seconds queued by the rate limiter and the
+    #       backoff are kept in response.waited so streams can report them.
+    #       The replay and synthetic backends answer without network
+    if backend.mode == "replay":
+        return cached_response(url, backend.replay(url))
+    if backend.mode == "synthetic":
+        return cached_response(url, backend.synthetic(url))
+
+    content = cache.get(url)
+    if content is not None:
+        if backend.mode == "record":
+            backend.record(url, content)
+        return cached_response(url, content)
+
+    pool = keypool.get_pool(keys)
+    waited = 0.0
+    for attempt in range(retries + 1):
+        key = pool.next()
+        key_url = f"{url}&apikey={key}"
+        waited += ratelimit.acquire(key, key_url)
+        try:
+            response = get_session().get(key_url, timeout=timeout)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            pool.report(key, "errors")
+            if attempt == retries:
+                raise
+            reason = type(e).__name__
+        else:
+            outcome = classify(response)
+            if outcome is None:
+                break
+            pool.report(key, outcome)
+            if (attempt == retries) or ((outcome == "invalid") and (pool.available() == 0)):
+                break
+            # INFO: Another key is ready, no need to wait
+            if (outcome != "errors") and (pool.available() > 0):
+                continue
+            reason = f"HTTP {response.status_code}" if outcome == "errors" else outcome
+
+        delay = backoff(attempt)
+        logger.warning(f"Retry {attempt + 1}/{retries} in {delay:0.2f} seconds ({reason})")
+        time.sleep(delay)
+        waited += delay
+
+    response.raise_for_status()
+    response.waited = waited
+
+    # INFO: Errors (rate limit NOTOK, proxy error) come at the head of the body and must not be cached
+    head = response.content[:256]
+    if (b"NOTOK" not in head) and (b'"error"' not in head):
+        cache.put(url, response.content)
+        if backend.mode == "record":
+            backend.record(url, response.content)
+
+    return response
+
+
+def parse_columns(text, idx):
+    # INFO: Decode a list of objects one by one into {column: [values]}, text[idx] is after "["
+    columns = {}
+    count = 0
+    idx = WHITESPACE.match(text, idx).end()
+    if text[idx] == "]":
+        return columns, idx + 1
+
+    while True:
+        row, idx = decoder.raw_decode(text, idx)
+        for key, value in row.items():
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = [None] * count
+            column.append(value)
+        count += 1
+        if len(row) != len(columns):
+            for column in columns.values():
+                if len(column) < count:
+                    column.append(None)
+
+        idx = WHITESPACE.match(text, idx).end()
+        if text[idx] == "]":
+            return columns, idx + 1
+        if text[idx] != ",":
+            raise ValueError(f"Expecting ',' delimiter at {idx}")
+        idx = WHITESPACE.match(text, idx + 1).end()
+
+
+def parse(response):
+    # INFO: Parse the body once. A result with a list of rows comes as column buffers
+    #       ({column: [values]}, see count_rows) without building the list of dicts
+    text = response.text
+    idx = WHITESPACE.match(text, 0).end()
+    if not text.startswith("{", idx):
+        return decoder.decode(text)
+
+    body = {}
+    idx = WHITESPACE.match(text, idx + 1).end()
+    if text[idx] == "}":
+        return body
+
+    while True:
+        key, idx = decoder.raw_decode(text, idx)
+        idx = WHITESPACE.match(text, idx).end()
+        if text[idx] != ":":
+            raise ValueError(f"Expecting ':' delimiter at {idx}")
+        idx = WHITESPACE.match(text, idx + 1).end()
+
+        # NOTE: Lists of scalars (not rows) are decoded as they are
+        start = WHITESPACE.match(text, idx + 1).end() if text[idx] == "[" else idx
+        if (key == "result") and (text[idx] == "[") and (text[start] in "{]"):
+            body[key], idx = parse_columns(text, idx + 1)
+        else:
+            body[key], idx = decoder.raw_decode(text, idx)
+
+        idx = WHITESPACE.match(text, idx).end()
+        if text[idx] == "}":
+            return body
+        if text[idx] != ",":
+            raise ValueError(f"Expecting ',' delimiter at {idx}")
+        idx = WHITESPACE.match(text, idx + 1).end()
+
+
+def count_rows(columns):
+    return len(next(iter(columns.values()), []))
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+__author__ = "KennBro"
+__copyright__ = "Copyright 2024, Personal Research"
+__credits__ = ["KennBro"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "KennBro"
+__email__ = "kennbro <at> protonmail <dot> com"
+__status__ = "Development"
+
+import os
+import time
+import json
+import random
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+from urllib.parse import urlparse, parse_qsl, urlencode
+
+from core import cache
+
+
+logger = logging.getLogger(__name__)
+
+# INFO: live (explorer), record (explorer and save fixtures), replay (fixtures only)
+#       or synthetic (generated wallets, no network)
+MODES = ("live", "record", "replay", "synthetic")
+FIXTURES = "fixtures"
+SYNTHETIC_SIZE = 1000  # INFO: Transactions of a synthetic wallet, the other endpoints are proportional
+SYNTHETIC_HEAD = 20000000
+SYNTHETIC_FIRST = 10000000
+
+mode = "live"
+fixtures = FIXTURES
+latency = 0.0
+synthetic_size = SYNTHETIC_SIZE
+index_lock = threading.Lock()
+
+
+def configure(config):
+    # INFO: backend, fixtures, replay_latency (seconds per call) and synthetic_size in config.yaml
+    global mode, fixtures, latency, synthetic_size
+
+    new_mode = config.get("backend", "live")
+    if new_mode not in MODES:
+        raise ValueError(f"backend must be one of {MODES}, not {new_mode}")
+
+    mode = new_mode
+    fixtures = config.get("fixtures", FIXTURES)
+    latency = float(config.get("replay_latency", 0))
+    synthetic_size = int(config.get("synthetic_size", SYNTHETIC_SIZE))
+
+    if mode == "record":
+        os.makedirs(fixtures, exist_ok=True)
+
+
+def fixture_path(url):
+    key, _, _ = cache.cache_key(url)
+    return os.path.join(fixtures, f"{key}.json")
+
+
+def record(url, content):
+    path = fixture_path(url)
+    exists = os.path.exists(path)
+    with open(path, "wb") as file:
+        file.write(content)
+    if exists:
+        return
+
+    # INFO: Human readable index of the fixtures (without the API key), one line by fixture
+    parsed = urlparse(url)
+    query = urlencode([(k, v) for k, v in parse_qsl(parsed.query) if k != "apikey"])
+    with index_lock:
+        with open(os.path.join(fixtures, "index.jsonl"), "a") as file:
+            file.write(json.dumps({"fixture": os.path.basename(fixture_path(url)), "url": f"{parsed.netloc}{parsed.path}?{query}"}) + "\n")
+
+
+def replay(url):
+    path = fixture_path(url)
+    if not os.path.exists(path):
+        raise Exception(f"No fixture for {url.split('&apikey=')[0]}")
+    if latency > 0:
+        time.sleep(latency)
+
+    with open(path, "rb") as file:
+        return file.read()
+
+
+# INFO: Synthetic wallets
+def fake_hash(*parts, size=64):
+    return "0x" + hashlib.sha256("-".join(str(part) for part in parts).encode()).hexdigest()[:size]
+
+
+@lru_cache(maxsize=16)
+def synthetic_wallet(address, size):
+    # INFO: Deterministic movements of a wallet, every endpoint shares the hashes of txlist
+    rng = random.Random(address)
+    wallets = [fake_hash(address, "wallet", i, size=40) for i in range(max(10, size // 20))]
+    contracts = [fake_hash(address, "contract", i, size=40) for i in range(max(5, size // 50))]
+    tokens = [(fake_hash(address, "token", i, size=40), f"TKN{i}", f"Token {i}", str(rng.choice([6, 8, 18]))) for i in range(10)]
+    # NOTE: NFT and ERC-1155 collections have their own contracts and symbols, a link key never mixes
+    #       token ids with ERC-20 amounts
+    collections = {
+        False: [(fake_hash(address, "nft", i, size=40), f"NFT{i}", f"Collection {i}") for i in range(10)],
+        True: [(fake_hash(address, "multitoken", i, size=40), f"MTK{i}", f"Multitoken {i}") for i in range(10)],
+    }
+    methods = [("0x", ""), ("0xa9059cbb", "transfer(address _to, uint256 _value)"), ("0x7ff36ab5", "swapExactETHForTokens(uint256 amountOutMin, address[] path, address to, uint256 deadline)")]
+
+    blocks = sorted(rng.sample(range(SYNTHETIC_FIRST, SYNTHETIC_HEAD), size))
+    txlist = []
+    for i, block in enumerate(blocks):
+        outgoing = (i > 0) and (rng.random() < 0.5)
+        method_id, function_name = rng.choice(methods)
+        to = rng.choice(contracts) if method_id != "0x" else rng.choice(wallets)
+        txlist.append({
+            "blockNumber": str(block),
+            "timeStamp": str(1438269988 + block * 12),
+            "hash": fake_hash(address, "tx", i),
+            "nonce": str(i),
+            "blockHash": fake_hash("block", block),
+            "transactionIndex": str(rng.randrange(200)),
+            "from": address if outgoing else rng.choice(wallets),
+            "to": to if outgoing else address,
+            "value": str(rng.randrange(10**21)),
+            "gas": "21000",
+            "gasPrice": str(rng.randrange(10**9, 10**11)),
+            "isError": "1" if rng.random() < 0.02 else "0",
+            "txreceipt_status": "1",
+            "input": method_id if method_id == "0x" else method_id + "0" * 128,
+            "contractAddress": "",
+            "cumulativeGasUsed": str(rng.randrange(21000, 10**7)),
+            "gasUsed": "21000",
+            "confirmations": str(SYNTHETIC_HEAD - block),
+            "methodId": method_id,
+            "functionName": function_name,
+        })
+
+    def sample(count):
+        return sorted(rng.sample(txlist, min(count, len(txlist))), key=lambda tx: int(tx["blockNumber"]))
+
+    internals = []
+    for i, tx in enumerate(sample(size // 4)):
+        internals.append({
+            "blockNumber": tx["blockNumber"],
+            "timeStamp": tx["timeStamp"],
+            "hash": tx["hash"],
+            "from": rng.choice(contracts),
+            "to": address,
+            "value": str(rng.randrange(10**20)),
+            "contractAddress": "",
+            "input": "",
+            "type": "call",
+            "gas": "2300",
+            "gasUsed": "0",
+            "traceId": f"0_{i % 3}",
+            "isError": "0",
+            "errCode": "",
+        })
+
+    transfers = []
+    for tx in sample(size // 2):
+        contract, symbol, name, decimal = rng.choice(tokens)
+        outgoing = rng.random() < 0.5
+        transfers.append({
+            "blockNumber": tx["blockNumber"],
+            "timeStamp": tx["timeStamp"],
+            "hash": tx["hash"],
+            "nonce": tx["nonce"],
+            "blockHash": tx["blockHash"],
+            "from": address if outgoing else rng.choice(contracts),
+            "contractAddress": contract,
+            "to": rng.choice(wallets) if outgoing else address,
+            "value": str(rng.randrange(10**24)),
+            "tokenName": name,
+            "tokenSymbol": symbol,
+            "tokenDecimal": decimal,
+            "transactionIndex": tx["transactionIndex"],
+            "gas": tx["gas"],
+            "gasPrice": tx["gasPrice"],
+            "gasUsed": tx["gasUsed"],
+            "cumulativeGasUsed": tx["cumulativeGasUsed"],
+            "input": "deprecated",
+            "confirmations": tx["confirmations"],
+        })
+
+    def nft(tx, i, multitoken):
+        contract, symbol, name = rng.choice(collections[multitoken])
+        row = {
+            "blockNumber": tx["blockNumber"],
+            "timeStamp": tx["timeStamp"],
+            "hash": tx["hash"],
+            "nonce": tx["nonce"],
+            "blockHash": tx["blockHash"],
+            "from": rng.choice(wallets),
+            "contractAddress": contract,
+            "to": address,
+            "tokenID": str(i),
+            "tokenName": name,
+            "tokenSymbol": symbol,
+            "transactionIndex": tx["transactionIndex"],
+            "gas": tx["gas"],
+            "gasPrice": tx["gasPrice"],
+            "gasUsed": tx["gasUsed"],
+            "cumulativeGasUsed": tx["cumulativeGasUsed"],
+            "input": "deprecated",
+            "confirmations": tx["confirmations"],
+        }
+        if multitoken:
+            row["tokenValue"] = str(rng.randrange(1, 100))
+        else:
+            row["tokenDecimal"] = "0"
+        return row
+
+    nfts = [nft(tx, i, False) for i, tx in enumerate(sample(size // 10))]
+    multitokens = [nft(tx, i, True) for i, tx in enumerate(sample(size // 20))]
+
+    return {"txlist": txlist, "txlistinternal": internals, "tokentx": transfers, "tokennfttx": nfts, "token1155tx": multitokens}
+
+
+def synthetic(url):
+    query = dict(parse_qsl(urlparse(url).query))
+    action = query.get("action", "")
+
+    if action == "eth_blockNumber":
+        body = {"jsonrpc": "2.0", "id": 83, "result": hex(SYNTHETIC_HEAD)}
+    elif action in ("getcontractcreation", "getsourcecode"):
+        body = {"status": "0", "message": "No data found", "result": None}
+    elif action == "balance":
+        body = {"status": "1", "message": "OK", "result": str(10**18)}
+    elif action in ("txlist", "txlistinternal", "tokentx", "tokennfttx", "token1155tx"):
+        rows = synthetic_wallet(query["address"].lower(), synthetic_size)[action]
+        startblock = int(query.get("startblock", 0))
+        endblock = int(query.get("endblock", 99999999))
+        rows = [row for row in rows if startblock <= int(row["blockNumber"]) <= endblock]
+        page = int(query.get("page", 1))
+        offset = int(query.get("offset", 10000))
+        rows = rows[(page - 1) * offset:page * offset]
+        if rows:
+            body = {"status": "1", "message": "OK", "result": rows}
+        else:
+            body = {"status": "0", "message": "No transactions found", "result": []}
+    else:
+        raise Exception(f"Synthetic backend does not support {action}")
+
+    return json.dumps(body).encode()
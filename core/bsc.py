@@ -15,8 +15,6 @@ import time
 import json
 import logging
 from numpy import block
-import requests
-import sqlite3
 import traceback
 import pandas as pd
 # from sqlalchemy import text
@@ -26,26 +24,17 @@ from flask import jsonify
 from termcolor import colored
 import coloredlogs, logging
 
+from core import db
+from core import api
+from core import keypool
+from core import wei
+from core import labels
+from core import movements
+
 logger = logging.getLogger(__name__)
 logger.propagate = False  # INFO: To prevent duplicates with flask
 
 
-def insert_with_ignore(table, conn, keys, data_iter):
-    # INFO: This escape is for reserved words
-    escaped_keys = [f'"{k}"' if (k.lower() == 'from') or (k.lower() == 'to') else k for k in keys]
-
-    columns = ','.join(escaped_keys)
-    placeholders = ','.join([f":{k}" for k in keys])
-    stmt = f"INSERT INTO {table.name} ({columns}) VALUES ({placeholders}) ON CONFLICT DO NOTHING"
-    data_dicts = (dict(zip(keys, data)) for data in data_iter)
-
-    logger.debug(f"Columns: {columns}")
-    logger.debug(f"Placeholders: {placeholders}")
-    
-    for data in data_dicts:
-        conn.execute(stmt, data)
-
-
 def db_store_wallet_detail(conn, data):    
 
     conn.execute(f"""INSERT INTO t_address_detail VALUES 
@@ -125,6 +114,15 @@ def db_store_contracts(conn, datas):
     conn.commit()
 
 
+def event_rate_limit(waited, label):
+    # INFO: Report the time a call was queued by the rate limiter
+    if (waited > 0):
+        message = f"<strong>RATE LIMIT</strong> - {label} waited...<strong>{waited:0.4f}</strong> seconds"
+        logger.info(message.replace('<strong>', '').replace('</strong>', ''))
+        data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
+        yield f"data:{data}\n\n"
+
+
 def event_stream_bsc(params):
 
     # INFO: Config Log Level
@@ -132,6 +130,9 @@ def event_stream_bsc(params):
     coloredlogs.install(level=params['config']['level'], fmt=log_format, logger=logger)
     logger.propagate = False  # INFO: To prevent duplicates with flask
 
+    # INFO: Session, timeouts and rate limit shared by every call to the explorer
+    api.configure(params['config'])
+
     logger.info(f"Getting information")
     data = json.dumps({"msg": f"Getting information", "end": False, "error": False, "content": {}})
     yield f"data:{data}\n\n"
@@ -181,9 +182,8 @@ def event_stream_bsc(params):
 
         # Checking wallet and first trx
         key = params['config']['bscscan']
-        dbname = params['config']['dbname']
 
-        connection = sqlite3.connect(dbname)
+        connection = db.connect(params['config'])
         cursor = connection.cursor()
 
         # INFO: Get blockchain param
@@ -212,7 +212,7 @@ def event_stream_bsc(params):
         logger.debug(f"Blockchain: {blockchain}")
 
         # INFO: Warning message about API
-        if (params['config']['bscscan'] == '') or (params['config']['bscscan'] == 'XXX'):
+        if keypool.unconfigured(params['config']['bscscan']):
             message = f"<strong>Bscscan.com api key possibly unconfigured</strong>"
             logger.error(message.replace('<strong>', '').replace('</strong>', ''))
             data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
@@ -260,12 +260,13 @@ def event_stream_bsc(params):
             type = 'wallet'
             contract_creation = {}
             try:
-                url = f"https://api.bscscan.com/api?module=contract&action=getcontractcreation&contractaddresses={address}&apikey={key}"
-                response = requests.get(url)
+                url = f"https://api.bscscan.com/api?module=contract&action=getcontractcreation&contractaddresses={address}"
+                response = api.get(key, url)
+                yield from event_rate_limit(response.waited, "CONTRACT")
                 contract_creation = response.json()
-                json_status = response.json()['status']
-                json_message = response.json()['message']
-                json_result = response.json()['result']
+                json_status = contract_creation['status']
+                json_message = contract_creation['message']
+                json_result = contract_creation['result']
 
                 if (json_message == "NOTOK"):
                     message = f"<strong>Error...</strong>"
@@ -329,8 +330,9 @@ def event_stream_bsc(params):
                 # INFO: Get contract information
                 json_contract = []
                 try:
-                    url = f"https://api.bscscan.com/api?module=contract&action=getsourcecode&address={address}&apikey={key}"
-                    response = requests.get(url)
+                    url = f"https://api.bscscan.com/api?module=contract&action=getsourcecode&address={address}"
+                    response = api.get(key, url)
+                    yield from event_rate_limit(response.waited, "CONTRACT")
                     json_contract = response.json()['result']
 
                     if (len(json_contract) > 0):
@@ -397,8 +399,9 @@ def event_stream_bsc(params):
 
                 # INFO: Get trx creation
                 try:
-                    url = f"https://api.bscscan.com/api?module=account&action=txlist&address={address}&startblock=0&endblock=99999999&page=1&offset=1&sort=asc&apikey={key}"
-                    response = requests.get(url)
+                    url = f"https://api.bscscan.com/api?module=account&action=txlist&address={address}&startblock=0&endblock=99999999&page=1&offset=1&sort=asc"
+                    response = api.get(key, url)
+                    yield from event_rate_limit(response.waited, "TRANSACTIONS")
                     json_object = response.json()['result']
 
                     if (len(json_object) > 0):
@@ -495,7 +498,7 @@ def event_stream_bsc(params):
                     # db_store_transactions_optimized(connection, json_object)
                     df_trx_store = pd.DataFrame(json_object)
                     df_trx_store['blockChain'] = blockchain
-                    df_trx_store.to_sql('t_transactions', connection, if_exists='append', index=False, method=insert_with_ignore)
+                    db.insert_ignore(connection, 't_transactions', df_trx_store)
                     toc = time.perf_counter()
                     message = f"<strong>STORE</strong> - Transactions of contract creation...<strong>{toc - tic:0.4f}</strong> seconds"
                     logger.info(message.replace('<strong>', '').replace('</strong>', ''))
@@ -556,9 +559,7 @@ def event_stream_bsc(params):
                     tic = time.perf_counter()
 
                     # INFO: Check if address exist in labels table
-                    query = f"SELECT * FROM t_labels WHERE address = '{address}'"
-                    cursor.execute(query)
-                    label = cursor.fetchall()
+                    label = labels.find(connection, address)
                     if (len(label) == 0) and (len(json_contract) > 0):
                         # INFO: Store internal label
                         if (json_contract[0]['ContractName'] == ''):
@@ -627,8 +628,9 @@ def event_stream_bsc(params):
             elif (type == "wallet"):
                 # INFO: Get trx
                 try:
-                    url = f"https://api.bscscan.com/api?module=account&action=txlist&address={address}&startblock=0&endblock=99999999&sort=asc&apikey={key}"
-                    response = requests.get(url)
+                    url = f"https://api.bscscan.com/api?module=account&action=txlist&address={address}&startblock=0&endblock=99999999&sort=asc"
+                    response = api.get(key, url)
+                    yield from event_rate_limit(response.waited, "TRANSACTIONS")
                     json_object = response.json()['result']
 
                     if (len(json_object) > 0):
@@ -665,9 +667,10 @@ def event_stream_bsc(params):
 
                 # INFO: Get internals
                 try:
-                    url = f"https://api.bscscan.com/api?module=account&action=txlistinternal&address={address}&startblock=0&endblock=99999999&sort=asc&apikey={key}"
+                    url = f"https://api.bscscan.com/api?module=account&action=txlistinternal&address={address}&startblock=0&endblock=99999999&sort=asc"
 
-                    response = requests.get(url)
+                    response = api.get(key, url)
+                    yield from event_rate_limit(response.waited, "INTERNALS")
                     json_internals = response.json()['result']
 
                     if (len(json_internals) > 0):
@@ -704,9 +707,10 @@ def event_stream_bsc(params):
 
                 # INFO: Get transfers
                 try:
-                    url = f"https://api.bscscan.com/api?module=account&action=tokentx&address={address}&startblock=0&endblock=99999999&sort=asc&apikey={key}"
+                    url = f"https://api.bscscan.com/api?module=account&action=tokentx&address={address}&startblock=0&endblock=99999999&sort=asc"
 
-                    response = requests.get(url)
+                    response = api.get(key, url)
+                    yield from event_rate_limit(response.waited, "TRANSFERS")
                     json_transfers = response.json()['result']
 
                     if (len(json_transfers) > 0):
@@ -743,9 +747,10 @@ def event_stream_bsc(params):
 
                 # INFO: Get NFTs (ERC-721)
                 try:
-                    url = f"https://api.bscscan.com/api?module=account&action=tokennfttx&address={address}&sort=asc&apikey={key}"
+                    url = f"https://api.bscscan.com/api?module=account&action=tokennfttx&address={address}&sort=asc"
 
-                    response = requests.get(url)
+                    response = api.get(key, url)
+                    yield from event_rate_limit(response.waited, "NFTs")
                     json_nfts = response.json()['result']
 
                     if (len(json_nfts) > 0):
@@ -783,7 +788,7 @@ def event_stream_bsc(params):
                 # INFO: Get Multitoken trx (ERC-1551) (NOT IN BSC)
 
                 # try:
-                #     url = f"https://api.bscscan.com/api?module=account&action=token1155tx&address={address}&sort=asc&apikey={key}"
+                #     url = f"https://api.bscscan.com/api?module=account&action=token1155tx&address={address}&sort=asc"
 
                 #     response = requests.get(url)
                 #     json_multitokens = response.json()['result']
@@ -889,7 +894,7 @@ def event_stream_bsc(params):
                     # db_store_transactions_optimized(connection, json_object)
                     df_trx_store = pd.DataFrame(json_object)
                     df_trx_store['blockChain'] = blockchain
-                    df_trx_store.to_sql('t_transactions', connection, if_exists='append', index=False, method=insert_with_ignore)
+                    db.insert_ignore(connection, 't_transactions', df_trx_store)
                     toc = time.perf_counter()
                     message = f"<strong>STORE</strong> - Transactions...<strong>{toc - tic:0.4f}</strong> seconds"
                     logger.info(message.replace('<strong>', '').replace('</strong>', ''))
@@ -904,7 +909,7 @@ def event_stream_bsc(params):
                         df_internals_store['blockChain'] = blockchain
                         df_internals_merged = df_internals_store.merge(df_trx_store[['hash', 'methodId', 'functionName']], on='hash', how='left')
                         df_internals_merged.fillna('', inplace=True)
-                        df_internals_merged.to_sql('t_internals', connection, if_exists='append', index=False, method=insert_with_ignore)
+                        db.insert_ignore(connection, 't_internals', df_internals_merged)
                     toc = time.perf_counter()
                     message = f"<strong>STORE</strong> - Internals...<strong>{toc - tic:0.4f}</strong> seconds"
                     logger.info(message.replace('<strong>', '').replace('</strong>', ''))
@@ -919,7 +924,7 @@ def event_stream_bsc(params):
                         df_transfers_store['blockChain'] = blockchain
                         df_transfers_merged = df_transfers_store.merge(df_trx_store[['hash', 'methodId', 'functionName']], on='hash', how='left')
                         df_transfers_merged.fillna('', inplace=True)
-                        df_transfers_merged.to_sql('t_transfers', connection, if_exists='append', index=False, method=insert_with_ignore)
+                        db.insert_ignore(connection, 't_transfers', df_transfers_merged)
                     toc = time.perf_counter()
                     message = f"<strong>STORE</strong> - Transfers ERC20...<strong>{toc - tic:0.4f}</strong> seconds"
                     logger.info(message.replace('<strong>', '').replace('</strong>', ''))
@@ -934,7 +939,7 @@ def event_stream_bsc(params):
                         df_nfts_store['blockChain'] = blockchain
                         df_nfts_merged = df_nfts_store.merge(df_trx_store[['hash', 'methodId', 'functionName']], on='hash', how='left')
                         df_nfts_merged.fillna('', inplace=True)
-                        df_nfts_merged.to_sql('t_nfts', connection, if_exists='append', index=False, method=insert_with_ignore)
+                        db.insert_ignore(connection, 't_nfts', df_nfts_merged)
                     toc = time.perf_counter()
                     message = f"<strong>STORE</strong> - Transfers ERC721...<strong>{toc - tic:0.4f}</strong> seconds"
                     logger.info(message.replace('<strong>', '').replace('</strong>', ''))
@@ -950,7 +955,7 @@ def event_stream_bsc(params):
                     #     df_multitoken_store['blockChain'] = blockchain
                     #     df_multitoken_merged = df_multitoken_store.merge(df_trx_store[['hash', 'methodId', 'functionName']], on='hash', how='left')
                     #     df_multitoken_merged.fillna('', inplace=True)
-                    #     df_multitoken_merged.to_sql('t_multitoken', connection, if_exists='append', index=False, method=insert_with_ignore)
+                    #     db.insert_ignore(connection, 't_multitoken', df_multitoken_merged)
                     # toc = time.perf_counter()
                     # message = f"<strong>STORE</strong> - Transfers ERC1155...<strong>{toc - tic:0.4f}</strong> seconds"
                     # logger.info(message.replace('<strong>', '').replace('</strong>', ''))
@@ -1084,9 +1089,8 @@ def event_stream_bsc(params):
 
 def test_function_1(params):
     # Checking wallet and first trx
-    dbname = params['config']['dbname']
     address = params.get('address')
-    connection = sqlite3.connect(dbname)
+    connection = db.connect(params['config'])
 
     address = ('bsc', address, 'central')
     # trxs = get_trx_from_address(connection, address)
@@ -1102,9 +1106,8 @@ def test_function_1(params):
 
 def test_function_2(params):
     # Checking wallet and first trx
-    dbname = params['config']['dbname']
     address = params.get('address')
-    connection = sqlite3.connect(dbname)
+    connection = db.connect(params['config'])
 
     address = ('bsc', address, 'central')
 
@@ -1274,8 +1277,7 @@ def get_trx_from_addresses_opt(conn, address_central):
     tags_dict = pd.Series(tags_grouped.tags.values,index=tags_grouped.address).to_dict()
 
     # INFO: Labels
-    df_labels = pd.read_sql_query("SELECT * FROM t_labels WHERE blockChain = 'ethereum'", conn)  # TODO: Multichain
-    labels_dict = df_labels.set_index('address').apply(lambda row: row.to_dict(), axis=1).to_dict()
+    labels_dict = labels.Lookup(conn, 'ethereum')  # TODO: Multichain
 
     # stat_coo = 
     # stat_con = len(json_tags) - stat_coo
@@ -1286,22 +1288,11 @@ def get_trx_from_addresses_opt(conn, address_central):
     # - More info in links
 
     # INFO: Get all Trx, Transfers and internals
-    query = """
-        SELECT blockChain, type, hash, `from`, `to`, value, contractAddress, symbol, name, decimal, valConv, timeStamp, isError
-        FROM (
-            SELECT blockChain, 'transaction' as 'type', hash, `from`, `to`, value, 
-                contractAddress, 'BNB' as 'symbol', 'BNB' as 'name', 18 as 'decimal', value / POWER(10, 18) as valConv, timeStamp, isError
-            FROM t_transactions
-            UNION ALL
-            SELECT blockChain, 'internals', hash, `from`, `to`, value, 
-                contractAddress, 'BNB', 'BNB', 18, value / POWER(10, 18), timeStamp, isError
-            FROM t_internals
-            UNION ALL
-            SELECT blockChain, 'transfers', hash, `from`, `to`, value, 
-                contractAddress, tokenSymbol, tokenName, tokenDecimal, value / POWER(10, tokenDecimal), timeStamp, 0
-            FROM t_transfers
-        ) AS combined
-        ORDER BY timeStamp ASC
+    query = f"""
+        SELECT {movements.SELECT}
+        FROM {movements.DECODE}
+        WHERE m.type IN ({movements.TRANSACTION}, {movements.INTERNALS}, {movements.TRANSFERS})
+        ORDER BY m.timeStamp ASC
     """
     df_all = pd.read_sql_query(query, conn)
 
@@ -1407,54 +1398,41 @@ def get_balance_and_gas(conn, address_central, type, key):
     address_central = address_central[1]
 
     if (type == 'wallet'):
-        # INFO: Get all Trx, Transfers and internals balance
-        query = f"""
+        # INFO: Balance and gas of the ledger (t_ledger, kept at ingest), exact in wei (see core/wei.py)
+        query = """
             SELECT 
-                blockChain,
-                '{address_central}',
-                token,
-                tokenName,
-                SUM(
-                    CASE 
-                        WHEN "From" = '{address_central}' THEN -value / POWER(10, SymbolDecimal)
-                        WHEN "To" = '{address_central}' THEN value / POWER(10, SymbolDecimal)
-                        ELSE 0
-                    END
-                ) AS balance
-            FROM 
-                (
-                SELECT blockChain, 'transaction', hash, `from`, `to`, value, contractAddress, 'BNB' as 'token', 'BNB' as 'tokenName', 18 as 'SymbolDecimal', timeStamp, isError
-                FROM t_transactions
-                UNION 
-                SELECT blockChain, 'internals', hash, `from`, `to`, value, contractAddress, 'BNB',  'BNB', 18 as 'SymbolDecimal', timeStamp, isError
-                FROM t_internals
-                UNION 
-                SELECT blockChain, 'transfers', hash, `from`, `to`, value, contractAddress, tokenSymbol, tokenName, tokenDecimal, timeStamp, 0
-                FROM t_transfers
-                ) AS balance_temp
+                tk.blockChain,
+                tk.symbol AS token,
+                tk.name AS tokenName,
+                tk.decimal AS SymbolDecimal,
+                l.inflow,
+                l.outflow,
+                l.gas
+            FROM t_ledger AS l
+                JOIN t_tokens AS tk ON tk.id = l.token_id
             WHERE 
-                "isError" = 0 AND
-                "blockChain" = 'bsc' AND
-                ("From" = '{address_central}' OR "To" = '{address_central}')
-            GROUP BY 
-                token;
+                l.address_id = ? AND
+                tk.blockChain = 'bsc'
         """
-        # df_balance = pd.read_sql_query(query, conn).to_json(orient = "records")
-        df_balance = pd.read_sql_query(query, conn)
-
-        # INFO: Get Gas
-        query = f"""
-            SELECT 
-                SUM(gasPrice * gasUsed * 1e-18) as "Gas"
-            FROM t_transactions
-            WHERE 
-                "isError" = 0 AND
-                "blockChain" = 'bsc' AND
-                "From" = '{address_central}'
-        """
-        cursor = conn.cursor()
-        cursor.execute(query)
-        gas = cursor.fetchone()[0]
+        df_ledger = pd.read_sql_query(query, conn, params=(movements.address_id(conn, address_central),))
+        df_ledger['raw'] = [int(inflow) - int(outflow) for inflow, outflow in zip(df_ledger['inflow'], df_ledger['outflow'])]
+        gas_raw = wei.exact_sum(df_ledger['gas'])
+        gas = wei.to_float(gas_raw, 18)
+
+        # INFO: By symbol, as the balance query had it
+        df_balance = df_ledger.groupby('token', dropna=False, sort=True)[['blockChain', 'tokenName', 'SymbolDecimal']].first()
+        df_balance['raw'] = df_ledger.groupby('token', dropna=False, sort=True)['raw'].agg(wei.exact_sum)
+
+        # INFO: Gas out of the BNB balance, then one conversion by token. No BNB row (only tokens in or only
+        #       errored transactions) leaves the balance empty, the gas is still reported
+        if 'BNB' in df_balance.index:
+            df_balance.loc['BNB', 'raw'] = max(df_balance.loc['BNB', 'raw'] - gas_raw, 0)
+        df_balance['balance'] = [
+            wei.to_float(raw, decimals) if pd.notna(decimals) else None for raw, decimals in zip(df_balance['raw'], df_balance['SymbolDecimal'])
+        ]
+        df_balance = df_balance.reset_index()
+        df_balance.insert(1, f"'{address_central}'", address_central)
+        df_balance = df_balance[['blockChain', f"'{address_central}'", 'token', 'tokenName', 'balance']]
 
         # Get index of ETH row
         index = df_balance.index[df_balance['token'] == 'BNB'].tolist()
@@ -1464,15 +1442,7 @@ def get_balance_and_gas(conn, address_central, type, key):
         logger.debug(f"+ Balance: {balance}")
         logger.debug(f"++++++++++++++++++++++++++++++++++++++++++++++++++++")
 
-        if (balance.loc[index[0], 'balance'] - gas) >= 0:
-            balance.loc[index[0], 'balance'] -= gas
-        else:
-            balance.loc[index[0], 'balance'] = 0
-
-        # balance.loc[index, 'balance'] -= gas
-        # if (balance.loc[index, 'balance'] < 0):
-        #     balance.loc[index, 'balance'] = 0.0
-        balance = json.loads(balance[balance['token'] == 'BNB'].to_json(orient = "records"))
+        balance = json.loads(balance.to_json(orient = "records"))
 
         # Remove row from tokens
         df_balance.drop(index, inplace=True)
@@ -1482,9 +1452,9 @@ def get_balance_and_gas(conn, address_central, type, key):
 
     else:
         # INFO: Get balance of contract
-        url = f"https://api.bscscan.com/api?module=account&action=balance&address={address_central}&tag=latest&apikey={key}"
+        url = f"https://api.bscscan.com/api?module=account&action=balance&address={address_central}&tag=latest"
         logger.debug(f"BALANCE BSC URL: {url}")
-        response = requests.get(url)
+        response = api.get(key, url)
         json_object = response.json()['result']
         logger.debug(f"BALANCE: {json_object}")
         # print(f"BALANCE: {json_object}")
@@ -1514,8 +1484,7 @@ def get_tags_labels(conn, address_central):
     df_tags = json.loads(pd.read_sql_query(query, conn).to_json(orient = "records"))
 
     # INFO: Get Labels
-    query = f"SELECT * FROM t_labels WHERE blockChain = 'binance' and address = '{address_central}';"
-    df_labels = json.loads(pd.read_sql_query(query, conn).to_json(orient = "records"))
+    df_labels = labels.find(conn, address_central, 'binance')
 
     return {"tags": df_tags, "labels": df_labels}
 
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+__author__ = "KennBro"
+__copyright__ = "Copyright 2024, Personal Research"
+__credits__ = ["KennBro"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "KennBro"
+__email__ = "kennbro <at> protonmail <dot> com"
+__status__ = "Development"
+
+import json
+import time
+import zlib
+import hashlib
+import logging
+import sqlite3
+import threading
+from urllib.parse import urlparse, parse_qsl
+
+
+logger = logging.getLogger(__name__)
+
+# INFO: Raw explorer responses live outside the investigation db, so they survive /reset_db
+CACHE_DB = "cache.db"
+CACHE_SIZE = 512  # INFO: MB
+TTL_OPEN = 600  # INFO: Seconds for queries without a closed block range
+FINALITY = 64  # INFO: Blocks under the chain head the explorer can still be indexing
+
+# INFO: Seconds by action, None never expires. Overridable with cache_ttl in config.yaml
+TTL = {
+    "balance": 60,
+    "eth_blockNumber": 60,
+    "getcontractcreation": None,
+    "getsourcecode": 86400,
+}
+
+connection = None
+connection_lock = threading.Lock()
+max_size = CACHE_SIZE * 1024 * 1024
+ttls = dict(TTL)
+finality = FINALITY
+heads = {}  # INFO: Last chain head seen by explorer host (eth_blockNumber)
+
+
+def configure(config):
+    # INFO: cache_db, cache_size (MB, 0 disables the cache), cache_ttl and cache_finality (blocks) in config.yaml
+    global connection, max_size, ttls, finality
+
+    with connection_lock:
+        max_size = int(config.get("cache_size", CACHE_SIZE)) * 1024 * 1024
+        ttls = dict(TTL)
+        ttls.update(config.get("cache_ttl") or {})
+        finality = int(config.get("cache_finality", FINALITY))
+
+        if connection is not None:
+            connection.close()
+            connection = None
+        if max_size <= 0:
+            return
+
+        # NOTE: Shared by the fetch workers, every use is under connection_lock
+        connection = sqlite3.connect(config.get("cache_db", CACHE_DB), check_same_thread=False)
+        connection.execute("""CREATE TABLE IF NOT EXISTS t_cache (
+                                key TEXT PRIMARY KEY,
+                                action TEXT NOT NULL,
+                                content BLOB NOT NULL,
+                                size INTEGER NOT NULL,
+                                created REAL NOT NULL,
+                                accessed REAL NOT NULL,
+                                expires REAL
+                              );""")
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON t_cache (accessed)")
+        connection.commit()
+
+
+def cache_key(url):
+    # INFO: Same endpoint, address and block range give the same key whatever the API key
+    parsed = urlparse(url)
+    query = sorted((k, v) for k, v in parse_qsl(parsed.query) if k != "apikey")
+    action = dict(query).get("action", "")
+    raw = f"{parsed.netloc}{parsed.path}?" + "&".join(f"{k}={v}" for k, v in query)
+
+    return hashlib.sha256(raw.encode()).hexdigest(), action, dict(query)
+
+
+def observe(url, action, content):
+    # INFO: The chain head of the host, from the eth_blockNumber responses (fetched or cached)
+    if action != "eth_blockNumber":
+        return
+    try:
+        heads[urlparse(url).netloc] = int(json.loads(content)["result"], 16)
+    except (ValueError, KeyError, TypeError):
+        pass
+
+
+def ttl_for(url, action, query):
+    if action in ttls:
+        return ttls[action]
+    # INFO: A block range ending finality blocks under the head never changes. The window at the head (or
+    #       with the head unknown) can still get rows the explorer indexes later
+    head = heads.get(urlparse(url).netloc)
+    endblock = query.get("endblock", "99999999")
+    if (head is not None) and endblock.isdigit() and (int(endblock) <= head - finality):
+        return None
+    return TTL_OPEN
+
+
+def get(url):
+    if connection is None:
+        return None
+
+    key, action, query = cache_key(url)
+    now = time.time()
+    with connection_lock:
+        row = connection.execute("SELECT content, expires FROM t_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if (row[1] is not None) and (row[1] < now):
+            connection.execute("DELETE FROM t_cache WHERE key = ?", (key,))
+            connection.commit()
+            return None
+        connection.execute("UPDATE t_cache SET accessed = ? WHERE key = ?", (now, key))
+        connection.commit()
+
+    logger.debug(f"Cache hit {action}")
+    content = zlib.decompress(row[0])
+    observe(url, action, content)
+    return content
+
+
+def put(url, content):
+    if connection is None:
+        return
+
+    key, action, query = cache_key(url)
+    observe(url, action, content)
+    ttl = ttl_for(url, action, query)
+    if ttl == 0:
+        return
+
+    now = time.time()
+    compressed = zlib.compress(content)
+    expires = None if ttl is None else now + ttl
+    with connection_lock:
+        connection.execute(
+            "INSERT OR REPLACE INTO t_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, action, compressed, len(compressed), now, now, expires),
+        )
+
+        # INFO: LRU eviction when the cache is over its size
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM t_cache").fetchone()[0]
+        if total > max_size:
+            rows = connection.execute("SELECT key, size FROM t_cache ORDER BY accessed").fetchall()
+            evict = []
+            for row_key, size in rows:
+                if total <= max_size:
+                    break
+                evict.append((row_key,))
+                total -= size
+            connection.executemany("DELETE FROM t_cache WHERE key = ?", evict)
+            logger.debug(f"Cache evicted {len(evict)} responses")
+        connection.commit()
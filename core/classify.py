@@ -0,0 +1,960 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+__author__ = "KennBro"
+__copyright__ = "Copyright 2024, Personal Research"
+__credits__ = ["KennBro"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "KennBro"
+__email__ = "kennbro <at> protonmail <dot> com"
+__status__ = "Development"
+
+import os
+import time
+import logging
+import multiprocessing
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np  # pyright: ignore
+import pandas as pd  # pyright: ignore
+from termcolor import colored  # pyright: ignore
+
+from core import wei
+
+
+logger = logging.getLogger(__name__)
+
+# INFO: Classification of the movements of a wallet in actions (nodes and links of the graph). The
+#       features of every hash (type mix, first, second and last hop, the transaction of the hash,
+#       prefix of the function) are computed in bulk, the rules (RULES) are predicates over them (one
+#       rule by row) and only the rows with a rule are walked, in hash order, to build nodes and links
+ZERO = "0x0000000000000000000000000000000000000000"
+TYPES = ["transaction", "internals", "transfers", "nfts", "multitoken"]
+HOP = ["from", "to", "symbol", "name", "contractAddress", "valConv", "type", "decimal"]
+FIRST_OF_TYPE = [("transaction", "from"), ("internals", "to"), ("transfers", "from"), ("nfts", "from"), ("multitoken", "from")]
+
+# INFO: Minimum rows by worker process, a smaller classification stays in this process
+SHARD_ROWS = 10000
+
+# INFO: Scope of a hash, a transaction alone, a transaction and its movements or movements without transaction
+SIMPLE, COMPLEX, INCOMPLETE = "simple", "complex", "incomplete"
+
+
+class Graph:
+    # INFO: Nodes (address -> is contract, in order of appearance) and links of a classification.
+    #       known are the addresses already in t_nodes_classification, stats the rows and seconds by rule
+    def __init__(self, central, known):
+        self.central = central
+        self.known = known
+        self.nodes = {}
+        self.links = {}
+        self.stats = {name: [0, 0.0] for name, _, _, _ in RULES}
+        self.values = None  # INFO: Values added by link of a shard, to merge the sums in the same order
+
+    def node(self, address, contract=False):
+        if (address not in self.nodes) and (address not in self.known):
+            self.nodes[address] = contract
+
+    def link(self, from_address, to_address, symbol, name, contract, value, action, type, node_create=True):
+        if node_create:
+            for address in [from_address, to_address]:
+                self.node(address, contract=(address != self.central))
+
+        if type in ("nfts", "multitokens", "incomplete - nft", "incomplete - multitoken"):
+            key = f"{from_address}->{to_address}-{symbol}-{value}"
+        else:
+            key = f"{from_address}->{to_address}-{symbol}"
+
+        if self.values is not None:
+            self.values.setdefault(key, []).append(value)
+
+        if key not in self.links:
+            self.links[key] = {
+                "link_key": key,
+                "source": from_address,
+                "target": to_address,
+                "symbol": symbol,
+                "name": name,
+                "contract": contract,
+                "count": 1,
+                "sum": value,
+                "sum_exact": wei.add((0, value.decimals), value) if isinstance(value, wei.Wei) else None,
+                "action": [action],
+                "type": type,
+            }
+        else:
+            link = self.links[key]
+            link["count"] += 1
+            link["sum"] += value
+            link["sum_exact"] = wei.add(link["sum_exact"], value)
+            if action not in link["action"]:
+                link["action"].append(action)
+
+    def merge(self, nodes, links, values, stats):
+        # INFO: Adds the graph of the next shard (hashes after the ones already in this graph)
+        for address, contract in nodes.items():
+            if address not in self.nodes:
+                self.nodes[address] = contract
+
+        for key, part in links.items():
+            if key not in self.links:
+                self.links[key] = part
+                continue
+            link = self.links[key]
+            link["count"] += part["count"]
+            for value in values[key]:
+                link["sum"] += value
+            if (link["sum_exact"] is None) or (part["sum_exact"] is None) or (link["sum_exact"][1] != part["sum_exact"][1]):
+                link["sum_exact"] = None
+            else:
+                link["sum_exact"] = (link["sum_exact"][0] + part["sum_exact"][0], link["sum_exact"][1])
+            for action in part["action"]:
+                if action not in link["action"]:
+                    link["action"].append(action)
+
+        for name, (hits, seconds) in stats.items():
+            self.stats[name][0] += hits
+            self.stats[name][1] += seconds
+
+
+def features(df, central):
+    # INFO: Columns by row of the hash of the row, aligned with df
+    hashes = df["hash"]
+    groups = df.groupby("hash", sort=False)
+    f = pd.DataFrame({"position": groups.cumcount(), "size": groups["hash"].transform("size")}, index=df.index)
+
+    # INFO: Type mix
+    for kind in TYPES:
+        f[f"has_{kind}"] = (df["type"] == kind).groupby(hashes).transform("any")
+
+    # INFO: First, second and last hop
+    for hop, mask in (("first", f["position"] == 0), ("second", f["position"] == 1), ("last", f["position"] == f["size"] - 1)):
+        rows = df.loc[mask].set_index("hash")
+        for column in HOP:
+            f[f"{hop}_{column}"] = hashes.map(rows[column])
+
+    # INFO: First movement of a type (the transaction sender, the internal receiver, ...)
+    for kind, column in FIRST_OF_TYPE:
+        rows = df[df["type"] == kind].drop_duplicates("hash").set_index("hash")
+        f[f"{kind}_{column}"] = hashes.map(rows[column])
+
+    # INFO: The transaction of the hash as seen by every row (the rows before it do not know it yet)
+    trx = df["type"] == "transaction"
+    for column in ["from", "to", "symbol", "name", "type"]:
+        f[f"x_{column}"] = df[column].where(trx).groupby(hashes).ffill().fillna("")
+    f["x_valConv"] = df["valConv"].where(trx).groupby(hashes).ffill().fillna(0)
+    f["x_value"] = f["x_valConv"].astype(float)
+    f["x_function"] = df["functionName"].str.split("(").str[0].where(trx).groupby(hashes).ffill().fillna("")
+
+    # INFO: Scope of the hash and the central address as sender or receiver of the transaction
+    simple = ((f["size"] == 1) & f["has_transaction"]).to_numpy()
+    complex = ((f["size"] > 1) & f["has_transaction"]).to_numpy()
+    f["scope"] = np.select([simple, complex], [SIMPLE, COMPLEX], default=INCOMPLETE)
+    f["value_float"] = df["value"].where(simple, 0).astype(float)
+    f["to_central"] = (f["x_from"] == df["to"]) & (df["to"] == central)
+    f["from_central"] = (f["x_from"] == df["from"]) & (df["from"] == central)
+
+    return f
+
+
+def func(x, word, lower=False):
+    # INFO: The function of the transaction of the hash contains word
+    return (x["x_function"].str.lower() if lower else x["x_function"]).str.contains(word, regex=False)
+
+
+# INFO: Rules by priority, (rule, scope, type, predicate). The rule of a row is the first one of its scope and
+#       type whose predicate holds (type None are the rows of the scope without rule yet). Predicates are
+#       masks over the movements and their features (x) and see the central address, the emit of a rule
+#       is in EMIT. A new classification is a row here and its emit in EMIT
+RULES = [
+    # INFO: Simple, a transaction alone
+    ("simple_ether_move", SIMPLE, "transaction", lambda x, central: (x["value_float"] != 0.0) & (x["functionName"] == "")),
+    ("simple_self_deposit", SIMPLE, "transaction", lambda x, central: x["from"] == x["to"]),
+    (
+        "simple_deposit",
+        SIMPLE,
+        "transaction",
+        lambda x, central: (x["value_float"] != 0.0) & x["functionName"].str.contains("deposit", regex=False),
+    ),
+    ("simple_contract_execution", SIMPLE, "transaction", lambda x, central: x["functionName"] != ""),
+    ("simple_do_nothing", SIMPLE, "transaction", lambda x, central: (x["value_float"] == 0.0) & (x["functionName"] == "")),
+    ("simple_not_detected", SIMPLE, "transaction", None),
+    # INFO: Complex, a transaction and its movements (the transaction row only describes the hash)
+    (
+        "internal_withdraw",
+        COMPLEX,
+        "internals",
+        lambda x, central: func(x, "withdraw") & x["to_central"] & (x["x_to"] == x["from"]),
+    ),
+    (
+        "internal_swap",
+        COMPLEX,
+        "internals",
+        lambda x, central: func(x, "swap") & (x["second_from"] == x["last_to"]) & x["has_internals"] & x["has_transfers"],
+    ),
+    (
+        "internal_swap_ether_for_token",
+        COMPLEX,
+        "internals",
+        lambda x, central: (
+            (func(x, "swap") | func(x, "multicall"))
+            & (x["second_to"] == x["last_to"])
+            & x["has_internals"]
+            & x["has_transfers"]
+            & (x["x_value"] != 0)
+        ),
+    ),
+    (
+        "internal_swap_token_by_ether",
+        COMPLEX,
+        "internals",
+        lambda x, central: (
+            x["has_internals"]
+            & x["has_transfers"]
+            & (x["transaction_from"] == x["internals_to"])
+            & (x["internals_to"] == x["transfers_from"])
+        ),
+    ),
+    (
+        "internal_bid",
+        COMPLEX,
+        "internals",
+        lambda x, central: x["to_central"] & (x["x_value"] == 0) & x["has_nfts"] & (x["last_from"] == central),
+    ),
+    (
+        "internal_purchase_nft",
+        COMPLEX,
+        "internals",
+        lambda x, central: (
+            func(x, "purchase") & x["to_central"] & (x["x_value"] != 0) & x["has_nfts"] & (x["last_from"] == ZERO)
+        ),
+    ),
+    (
+        "internal_bridging_in",
+        COMPLEX,
+        "internals",
+        lambda x, central: func(x, "exit") & (x["x_from"] == x["to"]) & (x["x_value"] == 0),
+    ),
+    (
+        "internal_purchase",
+        COMPLEX,
+        "internals",
+        lambda x, central: func(x, "purchase") & (x["x_from"] == x["to"]) & (x["x_value"] != 0),
+    ),
+    ("internal_transfer_ether_to_wa", COMPLEX, "internals", lambda x, central: x["to_central"]),
+    ("internal_not_detected", COMPLEX, "internals", None),
+    (
+        "transfer_swap_tokens",
+        COMPLEX,
+        "transfers",
+        lambda x, central: (
+            (x["x_value"] == 0.0)
+            & func(x, "swap")
+            & (x["second_from"] == x["last_to"])
+            & (x["last_to"] == central)
+            & ~x["has_multitoken"]
+            & ~x["has_nfts"]
+        ),
+    ),
+    (
+        "transfer_sell_nft",
+        COMPLEX,
+        "transfers",
+        lambda x, central: (
+            (x["x_value"] == 0.0)
+            & (x["second_from"] == x["last_to"])
+            & x["has_nfts"]
+            & (x["to"] == central)
+            & (x["last_from"] != ZERO)
+        ),
+    ),
+    (
+        "transfer_borrow",
+        COMPLEX,
+        "transfers",
+        lambda x, central: (x["x_value"] == 0.0) & func(x, "borrow") & (x["x_from"] == x["last_to"]),
+    ),
+    ("transfer_swap_multitoken", COMPLEX, "transfers", lambda x, central: x["has_multitoken"] & x["has_transfers"]),
+    (
+        "transfer_swap_ether",
+        COMPLEX,
+        "transfers",
+        lambda x, central: (
+            (x["x_value"] != 0.0)
+            & func(x, "swap")
+            & x["to_central"]
+            & (x["x_to"] != x["from"])
+            & (x["from"] != x["contractAddress"])
+        ),
+    ),
+    (
+        "transfer_deposit",
+        COMPLEX,
+        "transfers",
+        lambda x, central: (
+            (x["x_value"] == 0.0)
+            & func(x, "deposit")
+            & x["from_central"]
+            & (x["x_to"] == x["to"])
+            & (x["to"] != x["contractAddress"])
+        ),
+    ),
+    (
+        "transfer_from_wa",
+        COMPLEX,
+        "transfers",
+        lambda x, central: x["from_central"] & (x["x_to"] == x["contractAddress"]) & (x["to"] != ZERO),
+    ),
+    (
+        "transfer_liquidity",
+        COMPLEX,
+        "transfers",
+        lambda x, central: x["from_central"] & (x["from"] != ZERO) & (x["to"] != ZERO) & func(x, "liquidity", lower=True),
+    ),
+    ("transfer_mint", COMPLEX, "transfers", lambda x, central: x["to_central"] & (x["from"] == ZERO)),
+    (
+        "transfer_to_wa",
+        COMPLEX,
+        "transfers",
+        lambda x, central: x["to_central"] & (x["x_to"] == x["from"]) & (x["to"] != ZERO),
+    ),
+    ("transfer_burn", COMPLEX, "transfers", lambda x, central: x["from_central"] & (x["to"] == ZERO)),
+    ("transfer_bridging_in", COMPLEX, "transfers", lambda x, central: x["to_central"] & func(x, "exit")),
+    (
+        "transfer_withdraw",
+        COMPLEX,
+        "transfers",
+        lambda x, central: func(x, "withdraw") & x["to_central"] & (x["x_to"] == x["from"]),
+    ),
+    ("transfer_staking", COMPLEX, "transfers", lambda x, central: func(x, "stake") & x["from_central"]),
+    ("transfer_to_wa_generic", COMPLEX, "transfers", lambda x, central: x["to_central"]),
+    ("transfer_from_wa_generic", COMPLEX, "transfers", lambda x, central: x["from_central"]),
+    ("transfer_not_detected", COMPLEX, "transfers", None),
+    ("nft_mint", COMPLEX, "nfts", lambda x, central: x["to_central"] & (x["from"] == ZERO)),
+    ("nft_burn", COMPLEX, "nfts", lambda x, central: x["from_central"] & (x["to"] == ZERO)),
+    (
+        "nft_from_wa",
+        COMPLEX,
+        "nfts",
+        lambda x, central: x["from_central"] & (x["x_to"] == x["contractAddress"]) & (x["to"] != ZERO),
+    ),
+    (
+        "nft_from_wa_marketplace",
+        COMPLEX,
+        "nfts",
+        lambda x, central: x["from_central"] & (x["to"] != "0x0000ea00000000000000000000000000000000000"),
+    ),
+    (
+        "nft_buy",
+        COMPLEX,
+        "nfts",
+        lambda x, central: (
+            x["to_central"] & (x["x_to"] != x["to"]) & (x["to"] != x["contractAddress"]) & (x["from"] != ZERO)
+        ),
+    ),
+    ("nft_not_detected", COMPLEX, "nfts", None),
+    ("multitoken_mint", COMPLEX, "multitoken", lambda x, central: x["to_central"] & (x["from"] == ZERO)),
+    ("multitoken_burn", COMPLEX, "multitoken", lambda x, central: x["from_central"] & (x["to"] == ZERO)),
+    (
+        "multitoken_buy",
+        COMPLEX,
+        "multitoken",
+        lambda x, central: (
+            x["to_central"]
+            & (x["x_value"] > 0.0)
+            & (x["x_to"] != x["from"])
+            & (x["from"] != x["contractAddress"])
+            & (x["decimal"] != 18)
+        ),
+    ),
+    (
+        "multitoken_transfer",
+        COMPLEX,
+        "multitoken",
+        lambda x, central: (
+            x["from_central"] & (x["x_value"] == 0.0) & (x["x_to"] == x["contractAddress"]) & (x["decimal"] == 1)
+        ),
+    ),
+    ("multitoken_not_detected", COMPLEX, "multitoken", None),
+    # INFO: Incomplete, movements without their transaction (it is not of the wallet)
+    (
+        "incomplete_internal_swap_nft",
+        INCOMPLETE,
+        "internals",
+        lambda x, central: x["has_nfts"] & (x["size"] == 2) & (x["internals_to"] == x["nfts_from"]),
+    ),
+    (
+        "incomplete_internal_swap_multitoken",
+        INCOMPLETE,
+        "internals",
+        lambda x, central: (
+            x["has_multitoken"] & (x["size"] == 2) & (x["internals_to"] == x["multitoken_from"]) & (x["last_decimal"] != 18)
+        ),
+    ),
+    (
+        "incomplete_internal_multitoken",
+        INCOMPLETE,
+        "internals",
+        lambda x, central: x["has_multitoken"] & (x["size"] == 2) & (x["internals_to"] == x["multitoken_from"]),
+    ),
+    ("incomplete_internal_from_wa", INCOMPLETE, "internals", lambda x, central: x["from"] == central),
+    ("incomplete_internal_to_wa", INCOMPLETE, "internals", lambda x, central: (x["to"] == central) & (x["size"] == 1)),
+    ("incomplete_internal_not_detected", INCOMPLETE, "internals", None),
+    ("incomplete_transfer_from_wa", INCOMPLETE, "transfers", lambda x, central: x["from"] == central),
+    ("incomplete_transfer_to_wa", INCOMPLETE, "transfers", lambda x, central: x["to"] == central),
+    ("incomplete_transfer_not_detected", INCOMPLETE, "transfers", None),
+    ("incomplete_nft_mint", INCOMPLETE, "nfts", lambda x, central: (x["to"] == central) & (x["from"] == ZERO)),
+    ("incomplete_nft_burn", INCOMPLETE, "nfts", lambda x, central: (x["from"] == central) & (x["to"] == ZERO)),
+    ("incomplete_nft_from_wa", INCOMPLETE, "nfts", lambda x, central: x["from"] == central),
+    ("incomplete_nft_to_wa", INCOMPLETE, "nfts", lambda x, central: x["to"] == central),
+    ("incomplete_nft_not_detected", INCOMPLETE, "nfts", None),
+    (
+        "incomplete_multitoken_burn",
+        INCOMPLETE,
+        "multitoken",
+        lambda x, central: (x["from"] == central) & (x["decimal"] <= 2) & (x["to"] == ZERO),
+    ),
+    (
+        "incomplete_multitoken_mint",
+        INCOMPLETE,
+        "multitoken",
+        lambda x, central: (x["to"] == central) & (x["decimal"] <= 2) & (x["from"] == ZERO),
+    ),
+    (
+        "incomplete_multitoken_from_wa",
+        INCOMPLETE,
+        "multitoken",
+        lambda x, central: (x["from"] == central) & (x["decimal"] != 18),
+    ),
+    ("incomplete_multitoken_to_wa", INCOMPLETE, "multitoken", lambda x, central: (x["to"] == central) & (x["decimal"] != 18)),
+    ("incomplete_multitoken_not_detected", INCOMPLETE, "multitoken", None),
+    # NOTE: Other rows of an incomplete hash (unknown types)
+    ("incomplete_not_detected", INCOMPLETE, None, None),
+]
+
+
+def compile_rules(rules):
+    # INFO: Rules grouped by scope and type, in the order of the table
+    compiled = {}
+    for name, scope, kind, when in rules:
+        compiled.setdefault((scope, kind), []).append((name, when))
+    return compiled
+
+
+def evaluate(x, compiled, central, stats):
+    # INFO: Rule of every row. Every group of rules is evaluated once over the rows of its scope and type,
+    #       a row takes the first rule that holds and the seconds are added to the stats of the rule
+    rule = np.full(len(x), "", dtype=object)
+    scopes = x["scope"].to_numpy()
+    kinds = x["type"].to_numpy()
+    for (scope, kind), group_rules in compiled.items():
+        rows = (scopes == scope) & (rule == "")
+        if kind is not None:
+            rows &= kinds == kind
+        positions = np.flatnonzero(rows)
+        if len(positions) == 0:
+            continue
+
+        group = x.iloc[positions]
+        pending = np.ones(len(positions), dtype=bool)
+        for name, when in group_rules:
+            tic = time.perf_counter()
+            if when is None:
+                mask = pending.copy()
+            else:
+                mask = when(group, central).fillna(False).to_numpy(dtype=bool) & pending
+            rule[positions[mask]] = name
+            pending &= ~mask
+            stats[name][1] += time.perf_counter() - tic
+            if not pending.any():
+                break
+
+    return pd.Series(rule, index=x.index)
+
+
+COMPILED = compile_rules(RULES)
+
+
+def not_detected(group, r, label):
+    logger.error(f"++ NOT DETECTED{label} = {r['type']} = {r['hash']} ==================")
+    if logger.isEnabledFor(logging.ERROR):
+        logger.error(f"GROUP\n{group(r)[['type', 'from', 'to', 'value', 'contractAddress']]}")
+
+
+def link_hop(g, r, hop, action, type=None, node_create=True):
+    # INFO: Link of the first, second or last hop of the hash
+    g.link(
+        r[f"{hop}_from"],
+        r[f"{hop}_to"],
+        r[f"{hop}_symbol"],
+        r[f"{hop}_name"],
+        r[f"{hop}_contractAddress"],
+        r[f"{hop}_valConv"],
+        action,
+        r[f"{hop}_type"] if type is None else type,
+        node_create=node_create,
+    )
+
+
+def link_row(g, r, from_address, to_address, action, type=None, value="valConv"):
+    g.link(from_address, to_address, r["symbol"], r["name"], r["contractAddress"], r[value], action, r["type"] if type is None else type)
+
+
+def link_transaction(g, r, action, value=None, type=None):
+    # INFO: Link of the transaction of the hash (ether from the sender to the contract)
+    value = r["x_valConv"] if value is None else value
+    g.link(r["x_from"], r["x_to"], r["x_symbol"], r["x_name"], "", value, action, r["x_type"] if type is None else type)
+
+
+def emit_simple(g, r, group, action):
+    function = r["functionName"]
+    if action == "":
+        logger.error(f"++ NOT DETECTED = {r['type']} ==================")
+    g.node(r["from"], contract=False)
+    g.node(r["to"], contract=(function != ""))
+    g.link(r["from"], r["to"], r["symbol"], r["name"], "", r["valConv"], action, r["type"], node_create=False)
+
+
+def emit_swap_multitoken(g, r, group):
+    # 0xf7557d9bf453561b48e523eba9ef8a364ea194e4b197c5cd50176ef108e5e06c
+    rows = group(r)
+    swap_token_by_multitoken = False
+    filter_df = rows[rows["type"].isin(["transfers", "multitoken"])]
+    group_key = pd.Series([frozenset(pair) for pair in zip(filter_df["from"], filter_df["to"])], index=filter_df.index)
+    for key, grouped_df in filter_df.groupby(group_key):
+        if len(grouped_df) > 1:  # NOTE: swap transfer multitoken
+            swap_token_by_multitoken = True
+            action = "swap token by multitoken"
+            for position, node_create in ((0, True), (-1, False)):
+                hop = grouped_df.iloc[position]
+                g.link(
+                    hop["from"], hop["to"], hop["symbol"], hop["name"], hop["contractAddress"], hop["valConv"], action, hop["type"], node_create
+                )
+    if not swap_token_by_multitoken:
+        logger.error(f"++ NOT DETECTED = {r['type']} = Multitoken =====")
+
+
+def emit_swap_nft(g, r, group, action, type):
+    # INFO: The target of the NFT is a wallet
+    g.node(r["last_to"], contract=False)
+    g.link(r["last_to"], r["last_from"], r["first_symbol"], r["first_name"], "", r["first_valConv"], action, "incomplete - internal")
+    link_hop(g, r, "last", action, type=type)
+
+
+# INFO: Rule -> (emit of the links and nodes of the row, rule ends the hash). group(r) are the rows of the hash
+EMIT = {
+    # INFO: Simple
+    "simple_ether_move": (lambda g, r, group: emit_simple(g, r, group, "ether move"), False),
+    "simple_self_deposit": (lambda g, r, group: emit_simple(g, r, group, "self deposit"), False),
+    "simple_deposit": (lambda g, r, group: emit_simple(g, r, group, "deposit"), False),
+    "simple_contract_execution": (lambda g, r, group: emit_simple(g, r, group, "contract execution"), False),
+    "simple_do_nothing": (lambda g, r, group: emit_simple(g, r, group, "do nothing"), False),
+    "simple_not_detected": (lambda g, r, group: emit_simple(g, r, group, ""), False),
+    # INFO: Complex - Internals
+    # 0x344bc8fcc078e736944f728d29f1a5a04303588c793417143e8f5852e5e04b22
+    "internal_withdraw": (
+        lambda g, r, group: (
+            link_transaction(g, r, "withdraw internal (unwrap)"),
+            g.link(r["x_to"], r["x_from"], r["symbol"], r["name"], "", r["valConv"], "withdraw internal (unwrap)", r["type"], False),
+        ),
+        False,
+    ),
+    # 0x26bae55868fed567c6f865259156ff1c56891f2c2bb87ba5cdfa1903d3823d18
+    "internal_swap": (
+        lambda g, r, group: [
+            link_hop(g, r, hop, "swap ether by token" if r["second_from"] == g.central else "swap token by ether", node_create=create)
+            for hop, create in (("second", True), ("last", False))
+        ],
+        True,
+    ),
+    # 0xf9358c40ad6b71c12d33139504c462c73d822ff58aaf968374858e139da0740b
+    "internal_swap_ether_for_token": (
+        lambda g, r, group: (
+            link_transaction(g, r, "swap ether for token", value=r["valConv"], type="transaction"),
+            g.link(
+                r["x_to"], r["x_from"], r["last_symbol"], r["last_name"], r["last_contractAddress"], r["last_valConv"],
+                "swap ether for token", r["last_type"], False,
+            ),
+        ),
+        True,
+    ),
+    # 0xf8f8a9326e6e6f7bcdaca207e4ece32998cb9022dfd61235939693d892c836d9
+    "internal_swap_token_by_ether": (
+        lambda g, r, group: (
+            link_transaction(g, r, "swap token by ether", value=r["valConv"], type="transaction"),
+            g.link(
+                r["x_to"], r["x_from"], r["last_symbol"], r["last_name"], r["last_contractAddress"], r["last_valConv"],
+                "swap token by ether", r["last_type"], False,
+            ),
+        ),
+        True,
+    ),
+    # 0x11eca391dfa1b0ce3ab75a96de135234b752e89e9289919ca1d3b9922a0ae256
+    "internal_bid": (
+        lambda g, r, group: (
+            g.link(
+                r["x_to"], r["x_from"], r["second_symbol"], r["second_name"], r["second_contractAddress"], r["second_valConv"],
+                "bid" if "bid" in r["x_function"].lower() else "not detected", r["second_type"],
+            ),
+            g.node(r["last_to"], contract=False),  # TODO: Verify that always is a wallet
+            link_hop(g, r, "last", "bid" if "bid" in r["x_function"].lower() else "not detected", type="nfts"),
+        ),
+        True,
+    ),
+    # 0xe7bd55ddf0b6cd170b59f724ce2297a5c28d5837e7968a0885300970a4c8e7a7
+    "internal_purchase_nft": (
+        lambda g, r, group: (
+            link_transaction(g, r, "purchase nft with ether", value=r["x_valConv"] - r["valConv"], type="transaction"),
+            g.link(
+                r["x_to"], r["x_from"], r["last_symbol"], r["last_name"], r["last_contractAddress"], r["last_valConv"],
+                "purchase nft with ether", "nfts", False,
+            ),
+        ),
+        True,
+    ),
+    # 0xef233f6abc71024c9894f3b83cb03c94a06efc1b3f7befac95017509a907b6f4
+    "internal_bridging_in": (
+        lambda g, r, group: g.link(r["from"], r["to"], r["symbol"], r["name"], "", r["valConv"], "bridging in", r["type"]),
+        False,
+    ),
+    "internal_purchase": (
+        lambda g, r, group: (
+            logger.debug(colored(f"++ {r['hash']}", "red")),  # FIX: Checked
+            logger.debug(colored("++ PURCHASE WITH ETHER ===========================", "light_cyan")),  # TODO: Checked
+        ),
+        False,
+    ),
+    # 0xc5d30d442ed9899304b6234230797cee8b0c0066407a5294a9531d758a2732c5
+    # WARN: Super generic
+    "internal_transfer_ether_to_wa": (
+        lambda g, r, group: g.link(r["from"], r["to"], r["symbol"], r["name"], "", r["valConv"], "Transfer ether to wa", r["type"]),
+        False,
+    ),
+    "internal_not_detected": (lambda g, r, group: not_detected(group, r, ""), True),
+    # INFO: Complex - Transfers
+    # 0xfff2a20407ec45aa55974a967da2fbb33d1a9590062570835f4afdcdf49ed52e
+    "transfer_swap_tokens": (
+        lambda g, r, group: (
+            g.link(
+                r["x_from"], r["x_to"], r["second_symbol"], r["second_name"], r["second_contractAddress"], r["second_valConv"],
+                "swap tokens", r["second_type"],
+            ),
+            g.link(
+                r["x_to"], r["x_from"], r["last_symbol"], r["last_name"], r["last_contractAddress"], r["last_valConv"],
+                "swap tokens", r["last_type"], False,
+            ),
+        ),
+        True,
+    ),
+    # 0xf1b8c703a12b2f3f9c582720d2b7cb0052c042743f74a912e625ec4208c75ce4
+    "transfer_sell_nft": (
+        lambda g, r, group: (
+            link_hop(g, r, "second", "sell nft to wallet"),
+            link_hop(g, r, "last", "sell nft to wallet", type="nfts", node_create=False),
+        ),
+        True,
+    ),
+    # 0xfcf7f2cfc1add7e3837c8d1ee1de783f5f792d08d26bf6403ba1e17c8e906d1c
+    "transfer_borrow": (
+        lambda g, r, group: g.link(
+            r["x_to"], r["x_from"], r["last_symbol"], r["last_name"], r["last_contractAddress"], r["last_valConv"], "borrow", r["last_type"],
+        ),
+        True,
+    ),
+    "transfer_swap_multitoken": (emit_swap_multitoken, True),
+    # 0xe3553ba5a5c4d40d578bb3eaf5e04f0de935528f7ff24d302470e962ce342de1
+    "transfer_swap_ether": (
+        lambda g, r, group: (
+            link_transaction(g, r, "swap ether by token"),
+            g.link(
+                r["x_to"], r["x_from"], r["last_symbol"], r["last_name"], r["last_contractAddress"], r["last_valConv"],
+                "swap ether by token", r["last_type"], False,
+            ),
+        ),
+        False,
+    ),
+    "transfer_deposit": (
+        lambda g, r, group: g.link(
+            r["x_to"], r["x_from"], r["last_symbol"], r["last_name"], r["last_contractAddress"], r["last_valConv"],
+            "deposit token", r["last_type"],
+        ),
+        False,
+    ),
+    # 0xf01325b1b4c10b4cbe86c94cf65e459dde587b86bcdcbe50beaa8fa94df4b7e8
+    # NOTE: From wallet to wallet
+    "transfer_from_wa": (
+        lambda g, r, group: (g.node(r["to"], contract=False), link_row(g, r, r["x_from"], r["to"], "transfer tk from wa")),
+        False,
+    ),
+    # 0xf8c274a35c37916eb0cd52355f68ff68252b28181dec64c074c33a537371f688
+    "transfer_liquidity": (lambda g, r, group: link_row(g, r, r["x_from"], r["to"], "add liquidity"), False),
+    # 0xf8c274a35c37916eb0cd52355f68ff68252b28181dec64c074c33a537371f688
+    "transfer_mint": (lambda g, r, group: None, False),
+    # 0xfe45d513dc4fc8fb844f7a4b4375b15e3e7ac0a1923fb8e9cf70b6428968a408
+    "transfer_to_wa": (lambda g, r, group: link_row(g, r, r["x_from"], r["x_to"], "transfer tk to wa"), False),
+    # 0xed24c36025e354558cd0ff7969351757dbde659bdad0e006e3dfddce0f5a9e9f
+    "transfer_burn": (lambda g, r, group: None, False),  # TODO: Do it in the future
+    # 0xf14dfe2372837a17b43451969d318308db1de93897e27c2669d7ea2a2f3fa393
+    # WARN: Determine if it's always a bridging
+    "transfer_bridging_in": (lambda g, r, group: link_row(g, r, r["x_to"], r["to"], "bridging in"), False),
+    # 0xa467f35aa8a63fbb853ce751490e0fac24fd2933414ad54f15daad3ef78bce49
+    "transfer_withdraw": (lambda g, r, group: link_row(g, r, r["x_to"], r["x_from"], "transfer tk to wa (withdraw)"), False),
+    # 0xe944230ad186b7849ef6e3fbf79e12ddcba2d08d525ce05572bf759ebd694bab
+    "transfer_staking": (lambda g, r, group: link_row(g, r, r["x_from"], r["to"], "staking"), False),
+    # 0xdfe9f6c611b98a1b9c8fb1573152b02a82a69a1cb5437847357f89722c84ba41
+    # WARN: Super generic
+    "transfer_to_wa_generic": (lambda g, r, group: link_row(g, r, r["x_to"], r["x_from"], "transfer tk to wa (generic)"), False),
+    # 0xe14b6581a3f101a9dc0de191662b5f5bec4b39d3fe391605527853040e1a2a00
+    # WARN: Super generic
+    "transfer_from_wa_generic": (lambda g, r, group: link_row(g, r, r["x_from"], r["x_to"], "transfer tk from wa (generic)"), False),
+    "transfer_not_detected": (lambda g, r, group: not_detected(group, r, ""), True),
+    # INFO: Complex - Nfts
+    # 0xe38cd8174c029b1d0b452a499bb9e62de2402319fc9f9514ff5059c79d220119
+    "nft_mint": (lambda g, r, group: link_row(g, r, r["x_to"], r["x_from"], "mint nft", value="value"), False),
+    # 0x83a7a3f749d400f3d33adee0e4a055901015b8c7dda9bfdac0706183f4001071
+    "nft_burn": (lambda g, r, group: link_row(g, r, r["x_from"], r["x_to"], "burn nft", value="value"), False),
+    # WARN: Is always the "to" a wallet
+    "nft_from_wa": (
+        lambda g, r, group: (g.node(r["to"], contract=False), link_row(g, r, r["from"], r["to"], "transfer nft from wa", value="value")),
+        False,
+    ),
+    # WARN: Similar to previous rule but between particulars
+    "nft_from_wa_marketplace": (
+        lambda g, r, group: (
+            g.node(r["to"], contract=False),
+            link_row(g, r, r["from"], r["to"], "transfer nft from wa (marketplace)", value="value"),
+        ),
+        False,
+    ),
+    "nft_buy": (
+        lambda g, r, group: (link_transaction(g, r, "buy nft with eth"), link_row(g, r, r["x_to"], r["x_from"], "buy nft with eth", value="value")),
+        False,
+    ),
+    "nft_not_detected": (lambda g, r, group: not_detected(group, r, ""), True),
+    # INFO: Complex - Multitoken
+    # 0x8afd1b8eb53024809e52396faeb488d3b5fb769242ca2c777b32b46807ff33d2
+    "multitoken_mint": (lambda g, r, group: link_row(g, r, r["x_to"], r["x_from"], "mint nft", "multitoken - nfts", value="value"), False),
+    # 0x8afd1b8eb53024809e52396faeb488d3b5fb769242ca2c777b32b46807ff33d2
+    "multitoken_burn": (lambda g, r, group: link_row(g, r, r["x_from"], r["x_to"], "burn nft", "multitoken - nfts", value="value"), False),
+    # 0x3c5f26298c02fdcd9fe79d2bd7697ed65dfece0ddcab6d7228e469d58ea78afb
+    # NOTE: The source of the NFT is a wallet
+    "multitoken_buy": (
+        lambda g, r, group: (
+            link_transaction(g, r, "buy nft with ether"),
+            g.node(r["from"], contract=False),
+            link_row(g, r, r["from"], r["to"], "buy nft with ether", "multitoken - nfts"),
+        ),
+        False,
+    ),
+    # 0xff29144cab03e9f3fa2ce19e0c08041d67ea6ecea4a7aed69c657e58f6a0c5a4
+    # NOTE: The target of the NFT is a wallet
+    "multitoken_transfer": (
+        lambda g, r, group: (g.node(r["to"], contract=False), link_row(g, r, r["from"], r["to"], "transfer nft", "multitoken - nfts")),
+        False,
+    ),
+    "multitoken_not_detected": (lambda g, r, group: not_detected(group, r, ""), True),
+    # INFO: Incomplete - Internals
+    # 0xfb11efd2453075e0998c3b6941886858b08b0431b373a96c0347621c1a114820
+    "incomplete_internal_swap_nft": (lambda g, r, group: emit_swap_nft(g, r, group, "swap nft by ether", "incomplete - nft"), True),
+    # 0xeec66c2570d78bee45bbb1e519a85a5e1cce4e948f5ead33eeddf0d3a4e43e8a
+    "incomplete_internal_swap_multitoken": (
+        lambda g, r, group: emit_swap_nft(g, r, group, "swap nft by ether", "incomplete - multitoken"),
+        True,
+    ),
+    "incomplete_internal_multitoken": (
+        lambda g, r, group: logger.error(f"++ NOT DETECTED = INCOMPLETE = internal = multitoken = {r['hash']}"),
+        True,
+    ),
+    "incomplete_internal_from_wa": (
+        lambda g, r, group: (
+            logger.debug(f"{group(r)[['type', 'from', 'to', 'value']]}") if logger.isEnabledFor(logging.DEBUG) else None,
+            logger.debug(colored(f"++ TRANSFER ETHER FROM WA = {r['hash']}", "magenta")),
+        ),
+        False,
+    ),
+    # 0xf8a8423ec2343ec73f0e74bece8d080bb2ff2358172dfa1bcfef33eac175e402
+    "incomplete_internal_to_wa": (
+        lambda g, r, group: g.link(
+            r["from"], r["to"], r["symbol"], r["name"], "", r["valConv"], "transfer ether to wa", "incomplete - internal"
+        ),
+        False,
+    ),
+    "incomplete_internal_not_detected": (lambda g, r, group: not_detected(group, r, " = INCOMPLETE"), True),
+    # INFO: Incomplete - Transfers
+    # 0xe66315f2fe34aa1bfaa588f0d13ae451295e3eeaad8667ae29d6eb35020ee5c6
+    # TODO: Determine in always is a wallet
+    "incomplete_transfer_from_wa": (
+        lambda g, r, group: (
+            g.node(r["to"], contract=False),
+            link_row(g, r, r["from"], r["to"], "transfer token from wa", "incomplete - transfer"),
+        ),
+        False,
+    ),
+    # 0xa0546af5aa96775452ccb151399e3b27738e2f1912659516a75e36e5be0dc4c7
+    # TODO: Determine in always is a wallet
+    "incomplete_transfer_to_wa": (
+        lambda g, r, group: (
+            g.node(r["from"], contract=False),
+            link_row(g, r, r["from"], r["to"], "transfer token to wa", "incomplete - transfer"),
+        ),
+        False,
+    ),
+    "incomplete_transfer_not_detected": (lambda g, r, group: not_detected(group, r, " = INCOMPLETE"), True),
+    # INFO: Incomplete - Nfts
+    # 0xfff4d346c753177912550b94746d7f4f6d82a46853de29fa111efdf13613a738
+    # WARN: Mint nft without source transaction shows the source node as nft contract instead 0x0000...
+    "incomplete_nft_mint": (
+        lambda g, r, group: link_row(g, r, r["contractAddress"], r["to"], "mint nft", "incomplete - nft", value="value"),
+        False,
+    ),
+    # WARN: Burn nft without source transaction shows the target node as nft contract instead 0x0000...
+    "incomplete_nft_burn": (
+        lambda g, r, group: (
+            logger.debug(colored(f"++ BURN NFT = {r['hash']} =========", "magenta")),
+            link_row(g, r, r["from"], r["contractAddress"], "burn nft", "incomplete - nft", value="value"),
+        ),
+        False,
+    ),
+    # 0xf29085efbaf2ce00835a4a30a0f6e4b072247cba80d15b514b2766607d87e78a
+    # TODO: Verify that source node always be a wallet
+    "incomplete_nft_from_wa": (
+        lambda g, r, group: (
+            g.node(r["to"], contract=False),
+            link_row(g, r, r["from"], r["to"], "transfer nft from wa", "incomplete - nft", value="value"),
+        ),
+        False,
+    ),
+    # 0xfe59b6be7da4e8f8c1e8e61bc5c6d9b60e73c217135c7ad4891c6749223abc1b
+    # TODO: Verify that source node always be a wallet
+    "incomplete_nft_to_wa": (
+        lambda g, r, group: (
+            g.node(r["from"], contract=False),
+            link_row(g, r, r["from"], r["to"], "transfer nft to wa", "incomplete - nft", value="value"),
+        ),
+        False,
+    ),
+    "incomplete_nft_not_detected": (lambda g, r, group: not_detected(group, r, " = INCOMPLETE"), True),
+    # INFO: Incomplete - Multitoken
+    # WARN: Burn nft without source transaction shows the target node as nft contract instead 0x0000...
+    "incomplete_multitoken_burn": (
+        lambda g, r, group: (
+            logger.info(colored(f"++ MULTITOKEN BURN NFT = {r['hash']} =====", "magenta")),
+            link_row(g, r, r["from"], r["contractAddress"], "burn nft", "incomplete - multitoken", value="value"),
+        ),
+        False,
+    ),
+    # 0xfe3766f76a45f1ad86ed6185f19640a947e52b178a90973ab7a0fe5255db09eb
+    # WARN: Mint nft without source transaction shows the source node as nft contract instead 0x0000...
+    "incomplete_multitoken_mint": (
+        lambda g, r, group: link_row(g, r, r["contractAddress"], r["to"], "mint nft", "incomplete - multitoken", value="value"),
+        False,
+    ),
+    # 0xdc750957ecefc6940acbeea777eafbd5cdaaeac2a9eae5a65a232581151a73d3
+    # TODO: Verify that source node always be a wallet
+    "incomplete_multitoken_from_wa": (
+        lambda g, r, group: (
+            g.node(r["to"], contract=False),
+            link_row(g, r, r["from"], r["to"], "transfer nft from wa", "incomplete - multitoken"),
+        ),
+        False,
+    ),
+    # 0xfdfb8c4491abdd4176e82874f1c8718f961af65d06e405be76b3fb67fd4b677b
+    # TODO: Verify that source node always be a wallet
+    "incomplete_multitoken_to_wa": (
+        lambda g, r, group: (
+            g.node(r["from"], contract=False),
+            link_row(g, r, r["from"], r["to"], "transfer nft to wa", "incomplete - multitoken"),
+        ),
+        False,
+    ),
+    "incomplete_multitoken_not_detected": (lambda g, r, group: not_detected(group, r, " = INCOMPLETE"), True),
+    "incomplete_not_detected": (lambda g, r, group: not_detected(group, r, " = INCOMPLETE"), True),
+}
+
+
+def classify(df, central, known, workers=1):
+    # INFO: df are the movements without error in time order (hash, type, from, to, value, contractAddress,
+    #       symbol, name, decimal, valConv, functionName), known the addresses already in the graph and
+    #       workers the processes to classify with (0 is a process by core)
+    g = Graph(central, set(known))
+    if len(df) == 0:
+        return g
+
+    parts = shards(df, workers)
+    if len(parts) == 1:
+        run(g, df)
+        return g
+
+    # INFO: Hashes are independent, every worker classifies a range of them and the graphs are merged
+    #       in the order of the ranges (the order of the loop in one process)
+    logger.info(f"Classifying {len(df)} movements in {len(parts)} processes")
+    context = multiprocessing.get_context("spawn")  # NOTE: No fork of a process with threads (flask, fetchers)
+    with ProcessPoolExecutor(max_workers=len(parts), mp_context=context) as executor:
+        level = max([logger.getEffectiveLevel()] + [handler.level for handler in logger.handlers])
+        for nodes, links, values, stats in executor.map(classify_shard, parts, repeat(central), repeat(g.known), repeat(level)):
+            g.merge(nodes, links, values, stats)
+
+    return g
+
+
+def shards(df, workers):
+    # INFO: Movements split in contiguous ranges of sorted hashes, one by worker
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(df) // SHARD_ROWS)
+    if workers <= 1:
+        return [df]
+    if multiprocessing.current_process().daemon:
+        logger.warning("A daemon process can not start workers, classifying in this process")
+        return [df]
+
+    hashes = np.sort(df["hash"].unique())
+    return [df[df["hash"].isin(part)] for part in np.array_split(hashes, workers)]
+
+
+def classify_shard(df, central, known, level):
+    logger.setLevel(level)  # NOTE: A spawned worker does not have the logging of the server
+    g = Graph(central, known)
+    g.values = {}
+    run(g, df)
+    return g.nodes, g.links, g.values, g.stats
+
+
+def run(g, df):
+    # INFO: Nodes and links of the movements in g
+    central = g.central
+    df = df.reset_index(drop=True)
+    x = pd.concat([df, features(df, central)], axis=1)
+    rule = evaluate(x, COMPILED, central, g.stats)
+
+    # INFO: Rows after the one that ends its hash are not classified
+    stop = rule.map(lambda name: EMIT[name][1] if name else False).astype(int)
+    ended = (stop.groupby(df["hash"]).cumsum() - stop) > 0
+    active = (rule != "") & ~ended
+
+    # INFO: Nodes and links in the order of the loop by hash (sorted) and row
+    rows = x[active].assign(rule=rule[active])
+    rows = rows.sort_values("hash", kind="stable")
+    indices = df.groupby("hash", sort=False).indices
+
+    def group(r):
+        return df.iloc[indices[r["hash"]]]
+
+    columns = list(rows.columns)
+    for values in rows.itertuples(index=False, name=None):  # NOTE: to_dict would turn wei.Wei into float
+        r = dict(zip(columns, values))
+        tic = time.perf_counter()
+        EMIT[r["rule"]][0](g, r, group)
+        stats = g.stats[r["rule"]]
+        stats[0] += 1
+        stats[1] += time.perf_counter() - tic
+
+    return g
+
+
+def report(g):
+    # INFO: Rows and seconds (predicate and emit) by rule, the slowest first
+    for name, (hits, seconds) in sorted(g.stats.items(), key=lambda item: item[1][1], reverse=True):
+        if hits or seconds:
+            logger.debug(f"Rule {name}: {hits} rows in {seconds:.4f} seconds")
+
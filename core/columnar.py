@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+__author__ = "KennBro"
+__copyright__ = "Copyright 2024, Personal Research"
+__credits__ = ["KennBro"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "KennBro"
+__email__ = "kennbro <at> protonmail <dot> com"
+__status__ = "Development"
+
+import os
+import shutil
+import logging
+import pandas as pd  # pyright: ignore
+import pyarrow as pa  # pyright: ignore
+import pyarrow.dataset as ds  # pyright: ignore
+import pyarrow.parquet as pq  # pyright: ignore
+
+from core import wei
+
+
+logger = logging.getLogger(__name__)
+
+# INFO: Raw movements also written as Parquet (optional, parquet in config.yaml), partitioned by
+#       chain and block range: {parquet_dir}/{table}/chain=eth/block=12000000/part-*.parquet
+#       Tables and the columns of their UNIQUE constraint (rows written twice are dropped on read)
+TABLES = {
+    "t_transactions": ["blockChain", "blockNumber", "timeStamp", "hash", "from", "to", "value"],
+    "t_internals": ["blockChain", "blockNumber", "timeStamp", "hash", "from", "to", "value"],
+    "t_transfers": ["blockChain", "blockNumber", "timeStamp", "hash", "from", "to", "value"],
+    "t_nfts": ["blockChain", "blockNumber", "timeStamp", "hash", "from", "to", "tokenID"],
+    "t_multitoken": ["blockChain", "blockNumber", "timeStamp", "hash", "from", "to", "tokenID"],
+}
+BLOCK_RANGE = 1000000
+PARTITIONING = ds.partitioning(pa.schema([("chain", pa.string()), ("block", pa.int64())]), flavor="hive")
+
+# INFO: Movement columns of the readers, as the UNION ALL of the movement tables in SQL
+MOVEMENT_COLUMNS = ["blockChain", "type", "hash", "from", "to", "value", "contractAddress", "symbol", "name",
+                    "decimal", "valConv", "timeStamp", "isError", "methodId", "functionName"]
+
+enabled = False
+root = None
+block_range = BLOCK_RANGE
+
+
+def directory(config):
+    return config.get("parquet_dir") or f"{os.path.splitext(config['dbname'])[0]}_parquet"
+
+
+def configure(config):
+    # INFO: parquet (true or false), parquet_dir (default next to dbname) and parquet_block_range in config.yaml
+    global enabled, root, block_range
+
+    enabled = bool(config.get("parquet", False))
+    root = directory(config)
+    block_range = int(config.get("parquet_block_range", BLOCK_RANGE))
+
+
+def remove(config):
+    if os.path.isdir(directory(config)):
+        shutil.rmtree(directory(config))
+
+
+def write(table, df):
+    # INFO: One file by (chain, block range) of the rows. Every column as string, like the explorer sends them.
+    #       The file name comes from the content, so a page written again replaces its file
+    if (not enabled) or (table not in TABLES) or (len(df) == 0):
+        return 0
+
+    df = df.astype("string")
+    blocks = (pd.to_numeric(df["blockNumber"]) // block_range) * block_range
+    for (chain, block), part in df.groupby([df["blockChain"], blocks], sort=False):
+        path = os.path.join(root, table, f"chain={chain}", f"block={block}")
+        os.makedirs(path, exist_ok=True)
+        digest = int(pd.util.hash_pandas_object(part, index=False).sum()) & 0xFFFFFFFFFFFFFFFF
+        name = f"part-{part['blockNumber'].iloc[0]}-{part['blockNumber'].iloc[-1]}-{digest:016x}.parquet"
+        pq.write_table(pa.Table.from_pandas(part, preserve_index=False), os.path.join(path, name))
+
+    return len(df)
+
+
+def read(table, columns, chain=None, address=None, sides=("from", "to")):
+    # INFO: Column-wise scan of a table, only the columns asked for. chain prunes partitions and
+    #       address keeps the rows where it is in one of sides (from, to)
+    path = os.path.join(root, table)
+    key = TABLES[table]
+    names = list(dict.fromkeys(columns + key))
+    if not os.path.isdir(path):
+        return pd.DataFrame(columns=columns)
+
+    schema = pa.schema([(name, pa.string()) for name in names] + [("chain", pa.string()), ("block", pa.int64())])
+    dataset = ds.dataset(path, format="parquet", partitioning=PARTITIONING, schema=schema)
+
+    expression = None
+    if chain is not None:
+        expression = ds.field("chain") == chain
+    if address is not None:
+        match = None
+        for side in sides:
+            match = (ds.field(side) == address) if match is None else (match | (ds.field(side) == address))
+        expression = match if expression is None else (expression & match)
+
+    df = dataset.to_table(columns=names, filter=expression).to_pandas()
+    return df.drop_duplicates(subset=key)[columns].reset_index(drop=True)
+
+
+def movements(native, chain=None, address=None):
+    # INFO: Transactions, internals, transfers, nfts and multitoken in one frame (MOVEMENT_COLUMNS),
+    #       native is (symbol, name) of the coin of the chain
+    symbol, name = native
+    common = ["blockChain", "hash", "from", "to", "contractAddress", "timeStamp"]
+
+    df_trx = read("t_transactions", common + ["value", "isError", "methodId", "functionName"], chain, address)
+    df_trx = df_trx.assign(type="transaction", symbol=symbol, name=name, decimal=18)
+
+    df_int = read("t_internals", common + ["value", "isError"], chain, address)
+    df_int = df_int.assign(type="internals", symbol=symbol, name=name, decimal=18, methodId="0x", functionName="")
+
+    df_trf = read("t_transfers", common + ["value", "tokenSymbol", "tokenName", "tokenDecimal"], chain, address)
+    df_trf = df_trf.rename(columns={"tokenSymbol": "symbol", "tokenName": "name", "tokenDecimal": "decimal"})
+    df_trf = df_trf.assign(type="transfers", isError="0", methodId="0x", functionName="")
+
+    df_nft = read("t_nfts", common + ["tokenID", "tokenSymbol", "tokenName", "tokenDecimal"], chain, address)
+    df_nft = df_nft.rename(columns={"tokenID": "value", "tokenSymbol": "symbol", "tokenName": "name", "tokenDecimal": "decimal"})
+    df_nft = df_nft.assign(type="nfts", valConv=df_nft["value"], isError="0", methodId="0x", functionName="")
+
+    df_mul = read("t_multitoken", common + ["tokenID", "tokenSymbol", "tokenName", "tokenValue"], chain, address)
+    df_mul = df_mul.rename(columns={"tokenID": "value", "tokenSymbol": "symbol", "tokenName": "name", "tokenValue": "decimal"})
+    df_mul = df_mul.assign(type="multitoken", valConv=df_mul["value"], isError="0", methodId="0x", functionName="")
+
+    # INFO: Converted amounts, exact from the raw units as the ingest stores them in t_movements (see core/movements.py)
+    for df in (df_trx, df_int, df_trf):
+        df["decimal"] = pd.to_numeric(df["decimal"], errors="coerce")
+        raws = wei.integer_strings(df["value"])
+        df["valConv"] = [wei.to_float(raw, dec) if dec == dec else None for raw, dec in zip(raws, df["decimal"])]
+
+    frames = [df[MOVEMENT_COLUMNS] for df in (df_trx, df_int, df_trf, df_nft, df_mul)]
+    df_all = pd.concat(frames, ignore_index=True)
+    df_all["timeStamp"] = pd.to_numeric(df_all["timeStamp"])
+    df_all["isError"] = pd.to_numeric(df_all["isError"])
+
+    return df_all.sort_values("timeStamp", kind="stable").reset_index(drop=True)
+
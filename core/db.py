@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+__author__ = "KennBro"
+__copyright__ = "Copyright 2024, Personal Research"
+__credits__ = ["KennBro"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "KennBro"
+__email__ = "kennbro <at> protonmail <dot> com"
+__status__ = "Development"
+
+import os
+import logging
+import sqlite3
+
+from core import wei
+from core import labels
+from core import columnar
+from core import movements
+
+logger = logging.getLogger(__name__)
+
+# INFO: Connection profile, every key overridable with sqlite in config.yaml
+PRAGMAS = {
+    "journal_mode": "WAL",  # INFO: Readers (graph requests) do not block on the ingest writer
+    "synchronous": "NORMAL",  # INFO: Safe with WAL, commits no longer wait for fsync
+    "cache_size": -65536,  # INFO: Negative is KiB (64 MB)
+    "mmap_size": 268435456,  # INFO: 256 MB
+    "temp_store": "MEMORY",
+}
+
+
+# INFO: Hashes already classified by central address and their movements classified, an ingest classifies
+#       the new ones and again the ones with more movements stored
+SQL_CREATE_HASHES = """CREATE TABLE IF NOT EXISTS t_hashes_classification (
+                          address text NOT NULL,
+                          hash text NOT NULL,
+                          movements integer,
+                          UNIQUE(address, hash)
+                      );"""
+
+# INFO: Last block fetched by address and endpoint, an aborted ingest resumes after it
+SQL_CREATE_FETCH_PROGRESS = """CREATE TABLE IF NOT EXISTS t_fetch_progress (
+                                  blockChain text NOT NULL,
+                                  address text NOT NULL,
+                                  action text NOT NULL,
+                                  block_done number NOT NULL,
+                                  UNIQUE(blockChain, address, action)
+                              );"""
+
+# INFO: Secondary indexes of the movement tables, the UNIQUE constraints do not start with the
+#       columns the per-address queries filter on
+INDEXES = {
+    "t_transactions": [
+        ("from_gas", "`from`, isError, gasPrice, gasUsed"),  # INFO: Covers the gas query
+        ("to", "`to`"),
+        ("hash", "hash"),
+        ("timestamp", "timeStamp"),
+    ],
+    "t_internals": [("from", "`from`"), ("to", "`to`"), ("hash", "hash"), ("timestamp", "timeStamp")],
+    "t_transfers": [("from", "`from`"), ("to", "`to`"), ("hash", "hash"), ("timestamp", "timeStamp")],
+    "t_nfts": [("from", "`from`"), ("to", "`to`"), ("hash", "hash"), ("timestamp", "timeStamp")],
+    "t_multitoken": [("from", "`from`"), ("to", "`to`"), ("hash", "hash"), ("timestamp", "timeStamp")],
+    "t_funders_creators": [("to", "`to`"), ("from", "`from`"), ("hash", "hash")],
+    "t_movements": [("from", "from_id, isError"), ("to", "to_id, isError"), ("hash", "hash"), ("timestamp", "timeStamp")],
+}
+
+
+def connect(config):
+    # INFO: Every connection to the investigation db (dbname in config.yaml) comes from here
+    pragmas = dict(PRAGMAS)
+    pragmas.update(config.get("sqlite") or {})
+
+    conn = sqlite3.connect(config["dbname"], uri=True)
+    for pragma, value in pragmas.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    wei.register(conn)
+    labels.attach(conn, config)  # INFO: Etherscan and bscscan labels, read-only (labels_db in config.yaml)
+    columnar.configure(config)  # INFO: The Parquet store goes with the investigation db
+
+    return conn
+
+
+def export(config):
+    # INFO: Copy of the investigation to download, the file alone is the whole investigation (WAL content
+    #       included) with the etherscan and bscscan labels of the label db in t_labels
+    export_path = f"{os.path.splitext(config['dbname'])[0]}_export.db"
+    if os.path.exists(export_path):
+        os.remove(export_path)
+
+    conn = connect(config)
+    target = sqlite3.connect(export_path)
+    conn.backup(target)
+    conn.close()
+
+    target.execute("PRAGMA journal_mode = DELETE")
+    labels.attach(target, config)
+    columns = ", ".join(labels.COLUMNS)
+    target.execute(f"INSERT INTO main.t_labels ({columns}) SELECT {columns} FROM labels.t_labels")
+    target.commit()
+    target.close()
+
+    return export_path
+
+
+def remove(config):
+    # INFO: The db file, its WAL and shared memory files and the last download
+    os.remove(config["dbname"])
+    for path in (config["dbname"] + "-wal", config["dbname"] + "-shm", f"{os.path.splitext(config['dbname'])[0]}_export.db"):
+        if os.path.exists(path):
+            os.remove(path)
+    columnar.remove(config)
+
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def insert_ignore(conn, table, df):
+    # INFO: Bulk INSERT ... ON CONFLICT DO NOTHING of a DataFrame, one executemany in one transaction.
+    #       Columns the table does not have (new fields of the explorer) are left out
+    existing = set(table_columns(conn, table))
+    columns = [column for column in df.columns if column in existing]
+    if (len(df) == 0) or (len(columns) == 0):
+        return 0
+
+    # NOTE: Quoted names for reserved words (from, to)
+    names = ",".join(f'"{column}"' for column in columns)
+    placeholders = ",".join(["?"] * len(columns))
+    stmt = f"INSERT INTO {table} ({names}) VALUES ({placeholders}) ON CONFLICT DO NOTHING"
+
+    with conn:
+        cursor = conn.executemany(stmt, df[columns].itertuples(index=False, name=None))
+
+    # INFO: Raw movements also to the unified t_movements and to the Parquet store when it is enabled
+    if table in movements.TABLES:
+        insert_ignore(conn, "t_movements", movements.project(conn, table, df))
+        columnar.write(table, df[columns])
+
+    return cursor.rowcount
+
+
+def upsert(conn, table, df, conflict, assignments):
+    # INFO: Bulk INSERT ... ON CONFLICT (conflict) DO UPDATE SET assignments of a DataFrame, the new
+    #       values are excluded.column in the assignments. One executemany in one transaction
+    existing = set(table_columns(conn, table))
+    columns = [column for column in df.columns if column in existing]
+    if (len(df) == 0) or (len(columns) == 0):
+        return 0
+
+    names = ",".join(f'"{column}"' for column in columns)
+    placeholders = ",".join(["?"] * len(columns))
+    updates = ", ".join(f"{column} = {expression}" for column, expression in assignments.items())
+    stmt = f"INSERT INTO {table} ({names}) VALUES ({placeholders}) ON CONFLICT ({conflict}) DO UPDATE SET {updates}"
+
+    with conn:
+        cursor = conn.executemany(stmt, df[columns].itertuples(index=False, name=None))
+
+    return cursor.rowcount
+
+
+def json_union(table, column):
+    # INFO: SQL of the JSON array of the row plus the values of the new one (excluded) it does not have, in order
+    return f"""(
+        SELECT json_group_array(value) FROM (
+            SELECT value FROM json_each({table}.{column})
+            UNION ALL
+            SELECT value FROM json_each(excluded.{column}) WHERE value NOT IN (SELECT value FROM json_each({table}.{column}))
+        )
+    )"""
+
+
+def ensure_unique_links(conn):
+    # INFO: link_key is the UPSERT target of the links. Dbs created before the constraint have a row by
+    #       ingest of the same link, they are merged once (count and sum added, actions joined)
+    columns = table_columns(conn, "t_links_classification")
+    if len(columns) == 0:
+        return 0
+    if "sum_exact" not in columns:
+        conn.execute("ALTER TABLE t_links_classification ADD COLUMN sum_exact TEXT")
+        conn.commit()
+    for index in conn.execute("PRAGMA index_list(t_links_classification)").fetchall():
+        if index[2] and [row[2] for row in conn.execute(f"PRAGMA index_info({index[1]})").fetchall()] == ["link_key"]:
+            return 0
+
+    with conn:
+        merged = conn.execute("""
+            UPDATE t_links_classification AS l
+            SET count = (SELECT SUM(d.count) FROM t_links_classification AS d WHERE d.link_key = l.link_key),
+                sum = (SELECT SUM(d.sum) FROM t_links_classification AS d WHERE d.link_key = l.link_key),
+                sum_exact = NULL,
+                action = (
+                    SELECT json_group_array(DISTINCT j.value)
+                    FROM t_links_classification AS d, json_each(d.action) AS j
+                    WHERE d.link_key = l.link_key
+                )
+            WHERE link_key IN (SELECT link_key FROM t_links_classification GROUP BY link_key HAVING COUNT(*) > 1)
+        """).rowcount
+        conn.execute("DELETE FROM t_links_classification WHERE rowid NOT IN (SELECT MIN(rowid) FROM t_links_classification GROUP BY link_key)")
+        conn.execute("CREATE UNIQUE INDEX idx_links_classification_key ON t_links_classification (link_key)")
+
+    return merged
+
+
+def ensure_hashes(conn):
+    # INFO: Classified hashes. Hashes of dbs created before the count of movements have it NULL, they are
+    #       not classified again
+    conn.execute(SQL_CREATE_HASHES)
+    if "movements" not in table_columns(conn, "t_hashes_classification"):
+        conn.execute("ALTER TABLE t_hashes_classification ADD COLUMN movements integer")
+    conn.commit()
+
+
+def ensure_indexes(conn):
+    # INFO: Idempotent, also migrates dbs created before the indexes existed
+    created = 0
+    for table, indexes in INDEXES.items():
+        if len(table_columns(conn, table)) == 0:
+            continue
+        for name, columns in indexes:
+            index = f"idx_{table[2:]}_{name}"
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index,)).fetchone() is None:
+                conn.execute(f"CREATE INDEX {index} ON {table} ({columns})")
+                created += 1
+    conn.commit()
+
+    return created
@@ -13,39 +13,183 @@ __status__ = "Development"
 
 import time
 import json
+import queue
 import logging
-import requests
-import sqlite3
+import threading
 import traceback
 import pandas as pd  # pyright: ignore
-import pandasql as psql  # pyright: ignore
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import yaml
 
 # from sqlalchemy import text
 # from datetime import datetime
 # from flask import jsonify
 
-from termcolor import colored  # pyright: ignore
 import coloredlogs  # pyright: ignore
 
 from core import misc
+from core import db
+from core import api
+from core import keypool
+from core import wei
+from core import labels
+from core import classify
+from core import columnar
+from core import movements
 
 logger = logging.getLogger(__name__)
 # logger.propagate = False  # INFO: To prevent duplicates with flask
 
 
 def insert_with_ignore(table, conn, keys, data_iter):
+    # INFO: to_sql method for tables pandas creates (if_exists="replace"), the rest use db.insert_ignore
     # INFO: This escape is for reserved words
     escaped_keys = [f'"{k}"' if (k.lower() == "from") or (k.lower() == "to") else k for k in keys]
 
     columns = ",".join(escaped_keys)
-    placeholders = ",".join([f":{k}" for k in keys])
+    placeholders = ",".join(["?"] * len(keys))
     stmt = f"INSERT INTO {table.name} ({columns}) VALUES ({placeholders}) ON CONFLICT DO NOTHING"
-    data_dicts = (dict(zip(keys, data)) for data in data_iter)
 
-    for data in data_dicts:
-        conn.execute(stmt, data)
+    conn.executemany(stmt, data_iter)
+
+
+# INFO: Account endpoints of a wallet
+ACCOUNT_ENDPOINTS = {
+    "txlist": {
+        "label": "TRANSACTIONS",
+        "found": "Found first block and trx",
+        "not_found": "First block and trx",
+        "table": "t_transactions",
+        "store": "Transactions",
+    },
+    "txlistinternal": {
+        "label": "INTERNALS",
+        "found": "Found internals",
+        "not_found": "Internals",
+        "table": "t_internals",
+        "store": "Internals",
+    },
+    "tokentx": {
+        "label": "TRANSFERS",
+        "found": "Found transfers",
+        "not_found": "Transfers",
+        "table": "t_transfers",
+        "store": "Transfers ERC20",
+    },
+    "tokennfttx": {
+        "label": "NFTs",
+        "found": "Found NFTs",
+        "not_found": "Transfers",
+        "table": "t_nfts",
+        "store": "Transfers ERC721",
+    },
+    "token1155tx": {
+        "label": "MULTITOKENS",
+        "found": "Found Multi Token Standard",
+        "not_found": "Transfers",
+        "table": "t_multitoken",
+        "store": "Transfers ERC1155",
+    },
+}
+
+PAGE_SIZE = 10000  # INFO: Etherscan never returns more than 10000 rows for a query
+
+
+def fetch_last_block(key):
+    url = f"https://api.etherscan.io/api?module=proxy&action=eth_blockNumber"
+    response = api.get(key, url)
+    return int(api.parse(response)["result"], 16)
+
+
+def fetch_account_pages(action, address, key, startblock, endblock, offset=PAGE_SIZE):
+    # INFO: Walk the endpoint by block windows. A full page can cut its last block in half,
+    #       so those rows are dropped and the next window starts again at that block.
+    #       Yield (columns, block_done, waited) where columns are the rows as {column: [values]},
+    #       every block <= block_done is complete and waited is the time queued by the rate limiter
+    while startblock <= endblock:
+        url = (
+            f"https://api.etherscan.io/api?module=account&action={action}&address={address}"
+            f"&startblock={startblock}&endblock={endblock}&page=1&offset={offset}&sort=asc"
+        )
+        response = api.get(key, url)
+        waited = response.waited
+        json_response = api.parse(response)
+        json_result = json_response["result"]
+
+        if (json_response["message"] == "NOTOK") or (not isinstance(json_result, dict)):
+            raise Exception(f"{action}: {json_result}")
+
+        rows = api.count_rows(json_result)
+        if rows < offset:
+            yield json_result, endblock, waited
+            return
+
+        blocks = json_result["blockNumber"]
+        last_block = int(blocks[-1])
+        # NOTE: Rows are sorted by block, the last block is a suffix of the page
+        cut = rows
+        while (cut > 0) and (int(blocks[cut - 1]) == last_block):
+            cut -= 1
+        if cut == 0:
+            # WARN: A single block with more rows than a page, the excess can not be paged
+            logger.warning(f"{action}: block {last_block} exceeds {offset} rows for {address}")
+            yield json_result, last_block, waited
+            startblock = last_block + 1
+        else:
+            yield {column: values[:cut] for column, values in json_result.items()}, last_block - 1, waited
+            startblock = last_block
+
+
+def fetch_account_endpoints(address, key, actions, startblocks, endblock, max_workers=5):
+    # INFO: One worker per endpoint pages through it and hands every page over a queue, so the
+    #       caller stores pages as they arrive (the SQLite connection stays in the caller thread).
+    #       Events are ("page", action, columns, block_done), ("wait", action, seconds, None),
+    #       ("done", action, None, endblock) and ("error", action, traceback, None)
+    events = queue.Queue()
+    stop = threading.Event()
+
+    def worker(action):
+        try:
+            for page, block_done, waited in fetch_account_pages(action, address, key, startblocks[action], endblock):
+                if stop.is_set():
+                    return
+                if waited > 0:
+                    events.put(("wait", action, waited, None))
+                events.put(("page", action, page, block_done))
+            events.put(("done", action, None, endblock))
+        except Exception:
+            events.put(("error", action, traceback.format_exc(), None))
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for action in actions:
+            executor.submit(worker, action)
+        pending = len(actions)
+        while pending > 0:
+            event = events.get()
+            if event[0] in ("done", "error"):
+                pending -= 1
+            yield event
+    finally:
+        stop.set()
+        executor.shutdown(wait=False)
+
+
+def event_rate_limit(waited, label):
+    # INFO: Report the time a call was queued by the rate limiter
+    if waited > 0:
+        message = f"<strong>RATE LIMIT</strong> - {label} waited...<strong>{waited:0.4f}</strong> seconds"
+        logger.info(message.replace("<strong>", "").replace("</strong>", ""))
+        data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
+        yield f"data:{data}\n\n"
+
+
+def merge_methods(df, df_methods):
+    # INFO: Transfer methodId and functionName of the transaction to the rest of movements
+    df_merged = df.merge(df_methods, on="hash", how="left")
+    df_merged.fillna("", inplace=True)
+    return df_merged
 
 
 def db_store_wallet_detail(conn, data):
@@ -104,6 +248,132 @@ def db_store_address_block(conn, data):
     conn.commit()
 
 
+def db_update_address_block(conn, address, block_to, date_to, all_data):
+    conn.execute(
+        "UPDATE t_blocks SET block_to = ?, date_to = COALESCE(?, date_to), all_data = ? WHERE blockChain = ? AND address = ?",
+        (block_to, date_to, all_data, "eth", address),  # TODO: Manage multiple blockchain
+    )
+
+    conn.commit()
+
+
+def db_get_fetch_progress(conn, address):
+    cursor = conn.execute(
+        "SELECT action, block_done FROM t_fetch_progress WHERE blockChain = ? AND address = ?",
+        ("eth", address),  # TODO: Manage multiple blockchain
+    )
+    return {action: int(block_done) for action, block_done in cursor.fetchall()}
+
+
+def db_store_fetch_progress(conn, address, progress):
+    conn.executemany(
+        """INSERT INTO t_fetch_progress (blockChain, address, action, block_done) VALUES (?, ?, ?, ?)
+           ON CONFLICT(blockChain, address, action) DO UPDATE SET block_done = excluded.block_done""",
+        [("eth", address, action, block_done) for action, block_done in progress.items()],  # TODO: Manage multiple blockchain
+    )
+
+    conn.commit()
+
+
+def db_select_in(conn, query, values, params=()):
+    # INFO: First column of query for values (IN by chunks, indexed lookups) as a set
+    found = set()
+    for i in range(0, len(values), movements.CHUNK):
+        chunk = list(values[i:i + movements.CHUNK])
+        placeholders = ",".join(["?"] * len(chunk))
+        found.update(row[0] for row in conn.execute(query.format(placeholders=placeholders), list(params) + chunk))
+    return found
+
+
+def db_read_in(conn, query, values, params=()):
+    # INFO: Rows of query for values (IN by chunks, indexed lookups) as a DataFrame
+    values = list(values)
+    frames = []
+    for i in range(0, len(values), movements.CHUNK):
+        chunk = list(values[i:i + movements.CHUNK])
+        placeholders = ",".join(["?"] * len(chunk))
+        frames.append(pd.read_sql_query(query.format(placeholders=placeholders), conn, params=list(params) + chunk))
+    if not frames:
+        return pd.read_sql_query(query.format(placeholders="NULL"), conn, params=list(params))
+    return pd.concat(frames, ignore_index=True)
+
+
+def db_pending_hashes(conn, address):
+    # INFO: Hashes of the stored movements of the address to classify, with the movements already classified
+    #       of each one (0 if none): the ones collected now, the ones an aborted ingest stored before and the
+    #       classified ones with movements collected later
+    address_id = movements.address_id(conn, address)
+    query = """
+        SELECT c.hash, IFNULL(h.movements, 0)
+        FROM (SELECT hash, COUNT(*) AS movements FROM t_movements WHERE from_id = ? OR to_id = ? GROUP BY hash) AS c
+        LEFT JOIN t_hashes_classification AS h ON h.address = ? AND h.hash = c.hash
+        WHERE (h.hash IS NULL) OR (c.movements > h.movements)
+    """
+    return dict(conn.execute(query, (address_id, address_id, address)).fetchall())
+
+
+def db_collected(conn, address, hashes):
+    # INFO: Stored rows of the hashes by endpoint, the ones where address is the sender or the receiver
+    #       as the explorer sends them (strings)
+    collected = {}
+    for action, endpoint in ACCOUNT_ENDPOINTS.items():
+        query = f"SELECT * FROM {endpoint['table']} WHERE (`from` = ? OR `to` = ?) AND hash IN ({{placeholders}})"
+        collected[action] = db_read_in(conn, query, hashes, (address, address)).astype(str)
+    return collected
+
+
+def db_movements(conn, address, hashes, classified=None):
+    # INFO: Stored movements of the hashes where address is the sender or the receiver, in UNION columns and
+    #       order (see movements.union), ties by time keep the order of the types and of arrival. With classified
+    #       (hash -> movements) only the first ones stored of every hash, as they were classified
+    address_id = movements.address_id(conn, address)
+    query = f"""
+        SELECT {movements.SELECT}, m.methodId, m.functionName, m.type AS kind, m.rowid AS arrival
+        FROM {movements.DECODE}
+        WHERE (m.from_id = ? OR m.to_id = ?) AND m.hash IN ({{placeholders}})
+    """
+    df = db_read_in(conn, query, hashes, (address_id, address_id))
+    if classified is not None:
+        rank = df.sort_values("arrival").groupby("hash").cumcount().reindex(df.index)
+        df = df[rank < df["hash"].map(classified)]
+    df = df.sort_values(["timeStamp", "kind", "arrival"], kind="stable")
+    return df[movements.UNION].reset_index(drop=True)
+
+
+def db_remove_links(conn, links):
+    # INFO: Takes the links of a classification out of the graph, sum comes again from the exact sum (no float
+    #       residue) and the links left without count are deleted
+    # NOTE: Actions stay, other hashes of the link can have them
+    rows = []
+    for key, link in links.items():
+        exact = str(wei.to_decimal(-link["sum_exact"][0], link["sum_exact"][1])) if link["sum_exact"] is not None else None
+        rows.append((link["count"], float(link["sum"]), exact, exact, key))
+    conn.executemany(
+        """UPDATE t_links_classification
+           SET count = count - ?,
+               sum = CASE WHEN sum_exact IS NULL THEN sum - ? ELSE wei_to_float(wei_add(sum_exact, ?)) END,
+               sum_exact = wei_add(sum_exact, ?)
+           WHERE link_key = ?""",
+        rows,
+    )
+
+    keys = list(links)
+    for i in range(0, len(keys), movements.CHUNK):
+        chunk = keys[i:i + movements.CHUNK]
+        conn.execute(f"DELETE FROM t_links_classification WHERE count <= 0 AND link_key IN ({','.join(['?'] * len(chunk))})", chunk)
+    conn.commit()
+
+
+def db_store_hashes(conn, address, counts):
+    conn.executemany(
+        """INSERT INTO t_hashes_classification (address, hash, movements) VALUES (?, ?, ?)
+           ON CONFLICT(address, hash) DO UPDATE SET movements = excluded.movements""",
+        [(address, hash, int(count)) for hash, count in counts.items()],
+    )
+
+    conn.commit()
+
+
 def db_store_contracts(conn, datas):
     for data in datas:
         try:
@@ -136,10 +406,202 @@ def db_store_contracts(conn, datas):
     conn.commit()
 
 
+def event_collect_wallet(connection, params, address, blockchain, startblock=0, stored=False):
+    # INFO: Collect the account endpoints of a wallet from startblock, storing every page as it arrives
+    #       and moving t_blocks.block_to forward. Return True or None if the collection was aborted
+    #       (stored=True when t_address_detail has the wallet already), the collected rows are read back
+    #       from the db. Every endpoint restarts after its own checkpoint in t_fetch_progress
+    key = params["config"]["ethscan"]
+    workers = params["config"].get("fetch_workers", len(ACCOUNT_ENDPOINTS))
+
+    checkpoint = db_get_fetch_progress(connection, address)
+    startblocks = {action: max(startblock, checkpoint.get(action, -1) + 1) for action in ACCOUNT_ENDPOINTS}
+
+    rows_found = {action: 0 for action in ACCOUNT_ENDPOINTS}
+    progress = {action: startblocks[action] - 1 for action in ACCOUNT_ENDPOINTS}
+    last_page_block = {action: -1 for action in ACCOUNT_ENDPOINTS}
+    pending = []  # INFO: Pages waiting for the transactions of their blocks (methodId and functionName)
+
+    # INFO: Transactions stored by a previous run for the blocks the other endpoints still need. Only the
+    #       blocks of pages not stored yet are kept (see the checkpoint below)
+    df_methods = pd.read_sql_query(
+        "SELECT blockNumber, hash, methodId, functionName FROM t_transactions WHERE blockChain = ? AND blockNumber >= ? AND blockNumber < ?",
+        connection,
+        params=(blockchain, min(startblocks.values()), startblocks["txlist"]),
+    )
+    date_to = None
+    max_block = startblock - 1
+    traceback_text = ""
+
+    # INFO: The chain head bounds every endpoint, so block_to is the same high-water mark for all
+    try:
+        endblock = fetch_last_block(key)
+        head = True
+    except Exception:
+        logger.warning("Last block not available, collecting without upper bound")
+        endblock = 99999999
+        head = False
+
+    message = "<strong>DATA COLLECTED</strong> - Storing..."
+    logger.info(message.replace("<strong>", "").replace("</strong>", ""))
+    data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
+    yield f"data:{data}\n\n"
+
+    def store_page(action, df_page, block_done):
+        tic = time.perf_counter()
+        if action != "txlist":
+            df_page = merge_methods(df_page, df_methods[["hash", "methodId", "functionName"]])
+        db.insert_ignore(connection, ACCOUNT_ENDPOINTS[action]["table"], df_page)
+        progress[action] = block_done
+        toc = time.perf_counter()
+        return f"<strong>STORE</strong> - {ACCOUNT_ENDPOINTS[action]['store']} ({len(df_page)})...<strong>{toc - tic:0.4f}</strong> seconds"
+
+    try:
+        events = fetch_account_endpoints(address, key, list(ACCOUNT_ENDPOINTS), startblocks, endblock, workers)
+        for event, action, content, block_done in events:
+            messages = []
+            progress_before = dict(progress)
+
+            if event == "error":
+                traceback_text = content
+                events.close()
+                break
+
+            elif event == "wait":
+                yield from event_rate_limit(content, ACCOUNT_ENDPOINTS[action]["label"])
+                continue
+
+            elif event == "done":
+                endpoint = ACCOUNT_ENDPOINTS[action]
+                if rows_found[action] > 0:
+                    message = f"<strong>{endpoint['label']}</strong> - {endpoint['found']}"
+                else:
+                    message = f"<strong>{endpoint['label']}<strong> - {endpoint['not_found']} <strong>NOT FOUND</strong>"
+                logger.info(message.replace("<strong>", "").replace("</strong>", ""))
+                data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
+                yield f"data:{data}\n\n"
+
+                if action == "txlist":
+                    progress[action] = block_done
+                else:
+                    pending.append((action, None, last_page_block[action], block_done))
+
+            elif api.count_rows(content) == 0:
+                if action == "txlist":
+                    progress[action] = block_done
+                else:
+                    pending.append((action, None, last_page_block[action], block_done))
+
+            else:
+                rows_found[action] += api.count_rows(content)
+                max_block = max(max_block, int(content["blockNumber"][-1]))
+                df_page = pd.DataFrame(content)
+                df_page["blockChain"] = blockchain
+
+                if action == "txlist":
+                    messages.append(store_page(action, df_page, block_done))
+                    df_methods = pd.concat(
+                        [df_methods, df_page[["blockNumber", "hash", "methodId", "functionName"]].astype({"blockNumber": "int64"})],
+                        ignore_index=True,
+                    )
+                    date_to = content["timeStamp"][-1]
+
+                    # INFO: Store wallet detail with the first page
+                    if not stored:
+                        message = "<strong>TRANSACTIONS</strong> - Storing details..."
+                        logger.info(message.replace("<strong>", "").replace("</strong>", ""))
+                        data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
+                        yield f"data:{data}\n\n"
+
+                        # Get first trx
+                        first = {column: values[0] for column, values in content.items()}
+                        logger.debug(f"First trx :\n{first}")
+                        # Determine type of address   # TODO: NFT
+                        first["type"] = "wallet"
+
+                        if first["to"] == "" and first["contractAddress"] != "":
+                            first["type"] = "contract"
+                        # Get last block collected
+                        first["last_block"] = content["blockNumber"][-1]
+                        first["timeStamp_to"] = content["timeStamp"][-1]
+                        # INFO: Complete when every endpoint is exhausted
+                        first["all_data"] = False
+                        # Set address
+                        first["address"] = address
+
+                        # PERF: Analyze if wallet_detail and block table can merge
+
+                        # Store detail
+                        db_store_wallet_detail(connection, first)
+                        # Store blocks
+                        db_store_address_block(connection, first)
+                        stored = True
+                else:
+                    last_page_block[action] = int(content["blockNumber"][-1])
+                    pending.append((action, df_page, last_page_block[action], block_done))
+
+            # INFO: Store pages whose transactions are already collected
+            while pending and (pending[0][2] <= progress["txlist"]):
+                pending_action, df_page, _, pending_done = pending.pop(0)
+                if df_page is None:
+                    progress[pending_action] = pending_done
+                else:
+                    messages.append(store_page(pending_action, df_page, pending_done))
+
+            for message in messages:
+                logger.info(message.replace("<strong>", "").replace("</strong>", ""))
+                data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
+                yield f"data:{data}\n\n"
+
+            # INFO: Checkpoint every endpoint, every block <= block_to is complete in all of them
+            if progress != progress_before:
+                db_store_fetch_progress(connection, address, progress)
+                if stored:
+                    db_update_address_block(connection, address, min(progress.values()), date_to, False)
+
+                # PERF: The next pages of the other endpoints start after their checkpoint, the transactions
+                #       before it are not needed anymore
+                floor = min(block for action, block in progress.items() if action != "txlist")
+                df_methods = df_methods[df_methods["blockNumber"] > floor]
+
+        if (traceback_text == "") and (not stored):
+            raise Exception("First block and trx NOT FOUND")
+
+    except Exception:
+        traceback.print_exc()
+        traceback_text = traceback.format_exc()
+
+    if traceback_text != "":
+        message = "<strong>Error...</strong>"
+        logger.warning(f"{message}")
+        data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
+        yield f"data:{data}\n\n"
+
+        for line in traceback_text.splitlines():
+            message = f"{line}"
+            logger.warning(f"{message}")
+            data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
+            yield f"data:{data}\n\n"
+
+        message = " "
+        logger.warning(f"{message}")
+        data = json.dumps({"msg": f"{message}", "end": True, "error": True, "content": {}})
+        yield f"data:{data}\n\n"
+        return None
+
+    # INFO: Collection complete
+    db_update_address_block(connection, address, endblock if head else max_block, date_to, True)
+
+    return True
+
+
 def event_stream_ether(params):
     # INFO: Config Log Level
     log_format = "%(asctime)s %(name)s %(lineno)d %(levelname)s %(message)s"
     coloredlogs.install(level=params["config"]["level"], fmt=log_format, logger=logger)
+
+    # INFO: Session, timeouts and rate limit shared by every call to the explorer
+    api.configure(params["config"])
     logger.propagate = False  # INFO: To prevent duplicates with flask
 
     logger.info("Getting information")
@@ -191,9 +653,8 @@ def event_stream_ether(params):
 
         # Checking wallet and first trx
         key = params["config"]["ethscan"]
-        dbname = params["config"]["dbname"]
 
-        connection = sqlite3.connect(dbname)
+        connection = db.connect(params["config"])
         cursor = connection.cursor()
 
         # INFO: Get blockchain param
@@ -221,7 +682,7 @@ def event_stream_ether(params):
         logger.debug(f"Blockchain: {blockchain}")
 
         # INFO: Warning message about API
-        if (params["config"]["ethscan"] == "") or (params["config"]["ethscan"] == "XXX"):
+        if keypool.unconfigured(params["config"]["ethscan"]):
             message = "<strong>Etherscan.io api key possibly unconfigured</strong>"
             logger.error(message.replace("<strong>", "").replace("</strong>", ""))
             data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
@@ -255,10 +716,6 @@ def event_stream_ether(params):
         cursor.execute(query)
         wallet_detail = cursor.fetchone()
         json_object = []
-        json_internals = []
-        json_transfers = []
-        json_nfts = []
-        json_multitokens = []
 
         # Inicialize DataFrames
         df_trx_store = pd.DataFrame(
@@ -285,12 +742,13 @@ def event_stream_ether(params):
             type = "wallet"
             contract_creation = {}
             try:
-                url = f"https://api.etherscan.io/api?module=contract&action=getcontractcreation&contractaddresses={address}&apikey={key}"
-                response = requests.get(url)
+                url = f"https://api.etherscan.io/api?module=contract&action=getcontractcreation&contractaddresses={address}"
+                response = api.get(key, url)
+                yield from event_rate_limit(response.waited, "CONTRACT")
                 contract_creation = response.json()
-                json_status = response.json()["status"]
-                json_message = response.json()["message"]
-                json_result = response.json()["result"]
+                json_status = contract_creation["status"]
+                json_message = contract_creation["message"]
+                json_result = contract_creation["result"]
 
                 if json_message == "NOTOK":
                     message = "<strong>Error...</strong>"
@@ -354,8 +812,9 @@ def event_stream_ether(params):
                 # INFO: Get contract information
                 json_contract = []
                 try:
-                    url = f"https://api.etherscan.io/api?module=contract&action=getsourcecode&address={address}&apikey={key}"
-                    response = requests.get(url)
+                    url = f"https://api.etherscan.io/api?module=contract&action=getsourcecode&address={address}"
+                    response = api.get(key, url)
+                    yield from event_rate_limit(response.waited, "CONTRACT")
                     json_contract = response.json()["result"]
 
                     if len(json_contract) > 0:
@@ -422,8 +881,9 @@ def event_stream_ether(params):
 
                 # INFO: Get trx creation
                 try:
-                    url = f"https://api.etherscan.io/api?module=account&action=txlist&address={address}&startblock=0&endblock=99999999&page=1&offset=1&sort=asc&apikey={key}"
-                    response = requests.get(url)
+                    url = f"https://api.etherscan.io/api?module=account&action=txlist&address={address}&startblock=0&endblock=99999999&page=1&offset=1&sort=asc"
+                    response = api.get(key, url)
+                    yield from event_rate_limit(response.waited, "TRANSACTIONS")
                     json_object = response.json()["result"]
 
                     if len(json_object) > 0:
@@ -520,7 +980,7 @@ def event_stream_ether(params):
                     # db_store_transactions_optimized(connection, json_object)
                     df_trx_store = pd.DataFrame(json_object)
                     df_trx_store["blockChain"] = blockchain
-                    df_trx_store.to_sql("t_transactions", connection, if_exists="append", index=False, method=insert_with_ignore)
+                    db.insert_ignore(connection, "t_transactions", df_trx_store)
                     toc = time.perf_counter()
                     message = f"<strong>STORE</strong> - Transactions of contract creation...<strong>{toc - tic:0.4f}</strong> seconds"
                     logger.info(message.replace("<strong>", "").replace("</strong>", ""))
@@ -577,9 +1037,7 @@ def event_stream_ether(params):
                     tic = time.perf_counter()
 
                     # INFO: Check if address exist in labels table
-                    query = f"SELECT * FROM t_labels WHERE address = '{address}'"
-                    cursor.execute(query)
-                    label = cursor.fetchall()
+                    label = labels.find(connection, address)
                     if (len(label) == 0) and (len(json_contract) > 0):
                         # INFO: Store internal label
                         if json_contract[0]["ContractName"] == "":
@@ -656,361 +1114,30 @@ def event_stream_ether(params):
 
             # INFO: Get wallet info
             elif type == "wallet":
-                # INFO: Get trx
-                try:
-                    url = f"https://api.etherscan.io/api?module=account&action=txlist&address={address}&startblock=0&endblock=99999999&sort=asc&apikey={key}"
-                    response = requests.get(url)
-                    json_object = response.json()["result"]
-
-                    if len(json_object) > 0:
-                        message = "<strong>TRANSACTIONS</strong> - Found first block and trx"
-                        logger.info(message.replace("<strong>", "").replace("</strong>", ""))
-                        data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
-                        yield f"data:{data}\n\n"
-                    else:
-                        message = "<strong>TRANSACTIONS<strong> - First block and trx <strong>NOT FOUND</strong>"
-                        logger.info(message.replace("<strong>", "").replace("</strong>", ""))
-                        data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
-                        yield f"data:{data}\n\n"
-
-                except Exception:
-                    traceback.print_exc()
-                    traceback_text = traceback.format_exc()
-
-                    connection.close()
-                    message = "<strong>Error...</strong>"
-                    logger.warning(f"{message}")
-                    data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
-                    yield f"data:{data}\n\n"
-
-                    for line in traceback_text.splitlines():
-                        message = f"{line}"
-                        logger.warning(f"{message}")
-                        data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
-                        yield f"data:{data}\n\n"
-
-                    message = " "
-                    logger.warning(f"{message}")
-                    data = json.dumps({"msg": f"{message}", "end": True, "error": True, "content": {}})
-                    yield f"data:{data}\n\n"
-
-                # INFO: Get internals
-                try:
-                    url = f"https://api.etherscan.io/api?module=account&action=txlistinternal&address={address}&startblock=0&endblock=99999999&sort=asc&apikey={key}"
-
-                    response = requests.get(url)
-                    json_internals = response.json()["result"]
-
-                    if len(json_internals) > 0:
-                        message = "<strong>INTERNALS</strong> - Found internals"
-                        logger.info(message.replace("<strong>", "").replace("</strong>", ""))
-                        data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
-                        yield f"data:{data}\n\n"
-                    else:
-                        message = "<strong>INTERNALS<strong> - Internals <strong>NOT FOUND</strong>"
-                        logger.info(message.replace("<strong>", "").replace("</strong>", ""))
-                        data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
-                        yield f"data:{data}\n\n"
-
-                except Exception:
-                    traceback.print_exc()
-                    traceback_text = traceback.format_exc()
-
-                    connection.close()
-                    message = "<strong>Error...</strong>"
-                    logger.warning(f"{message}")
-                    data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
-                    yield f"data:{data}\n\n"
-
-                    for line in traceback_text.splitlines():
-                        message = f"{line}"
-                        logger.warning(f"{message}")
-                        data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
-                        yield f"data:{data}\n\n"
-
-                    message = " "
-                    logger.warning(f"{message}")
-                    data = json.dumps({"msg": f"{message}", "end": True, "error": True, "content": {}})
-                    yield f"data:{data}\n\n"
-
-                # INFO: Get transfers
-                try:
-                    url = f"https://api.etherscan.io/api?module=account&action=tokentx&address={address}&startblock=0&endblock=99999999&sort=asc&apikey={key}"
-
-                    response = requests.get(url)
-                    json_transfers = response.json()["result"]
-
-                    if len(json_transfers) > 0:
-                        message = "<strong>TRANSFERS</strong> - Found transfers"
-                        logger.info(message.replace("<strong>", "").replace("</strong>", ""))
-                        data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
-                        yield f"data:{data}\n\n"
-                    else:
-                        message = "<strong>TRANSFERS<strong> - Transfers <strong>NOT FOUND</strong>"
-                        logger.info(message.replace("<strong>", "").replace("</strong>", ""))
-                        data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
-                        yield f"data:{data}\n\n"
-
-                except Exception:
-                    traceback.print_exc()
-                    traceback_text = traceback.format_exc()
-
-                    connection.close()
-                    message = "<strong>Error...</strong>"
-                    logger.warning(f"{message}")
-                    data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
-                    yield f"data:{data}\n\n"
-
-                    for line in traceback_text.splitlines():
-                        message = f"{line}"
-                        logger.warning(f"{message}")
-                        data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
-                        yield f"data:{data}\n\n"
-
-                    message = " "
-                    logger.warning(f"{message}")
-                    data = json.dumps({"msg": f"{message}", "end": True, "error": True, "content": {}})
-                    yield f"data:{data}\n\n"
-
-                # INFO: Get NFTs (ERC-721)
-                try:
-                    url = f"https://api.etherscan.io/api?module=account&action=tokennfttx&address={address}&sort=asc&apikey={key}"
-
-                    response = requests.get(url)
-                    json_nfts = response.json()["result"]
-
-                    if len(json_nfts) > 0:
-                        message = "<strong>NFTs</strong> - Found NFTs"
-                        logger.info(message.replace("<strong>", "").replace("</strong>", ""))
-                        data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
-                        yield f"data:{data}\n\n"
-                    else:
-                        message = "<strong>NFTs<strong> - Transfers <strong>NOT FOUND</strong>"
-                        logger.info(message.replace("<strong>", "").replace("</strong>", ""))
-                        data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
-                        yield f"data:{data}\n\n"
-
-                except Exception:
-                    traceback.print_exc()
-                    traceback_text = traceback.format_exc()
-
-                    connection.close()
-                    message = "<strong>Error...</strong>"
-                    logger.warning(f"{message}")
-                    data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
-                    yield f"data:{data}\n\n"
-
-                    for line in traceback_text.splitlines():
-                        message = f"{line}"
-                        logger.warning(f"{message}")
-                        data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
-                        yield f"data:{data}\n\n"
-
-                    message = " "
-                    logger.warning(f"{message}")
-                    data = json.dumps({"msg": f"{message}", "end": True, "error": True, "content": {}})
-                    yield f"data:{data}\n\n"
-
-                # INFO: Get Multitoken trx (ERC-1551)
-                try:
-                    url = f"https://api.etherscan.io/api?module=account&action=token1155tx&address={address}&sort=asc&apikey={key}"
-
-                    response = requests.get(url)
-                    json_multitokens = response.json()["result"]
-
-                    if len(json_multitokens) > 0:
-                        message = "<strong>MULTITOKENS</strong> - Found Multi Token Standard"
-                        logger.info(message.replace("<strong>", "").replace("</strong>", ""))
-                        data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
-                        yield f"data:{data}\n\n"
-                    else:
-                        message = "<strong>MULTITOKENS<strong> - Transfers <strong>NOT FOUND</strong>"
-                        logger.info(message.replace("<strong>", "").replace("</strong>", ""))
-                        data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
-                        yield f"data:{data}\n\n"
-
-                except Exception:
-                    traceback.print_exc()
-                    traceback_text = traceback.format_exc()
-
-                    connection.close()
-                    message = "<strong>Error...</strong>"
-                    logger.warning(f"{message}")
-                    data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
-                    yield f"data:{data}\n\n"
-
-                    for line in traceback_text.splitlines():
-                        message = f"{line}"
-                        logger.warning(f"{message}")
-                        data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
-                        yield f"data:{data}\n\n"
-
-                    message = " "
-                    logger.warning(f"{message}")
-                    data = json.dumps({"msg": f"{message}", "end": True, "error": True, "content": {}})
-                    yield f"data:{data}\n\n"
-
-                # TODO: If wallet is a contract, get and store contract information
-
-                # INFO: Store wallet detail in DB
-                try:
-                    message = "<strong>TRANSACTIONS</strong> - Storing details..."
-                    logger.info(message.replace("<strong>", "").replace("</strong>", ""))
-                    data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
-                    yield f"data:{data}\n\n"
-
-                    # Get first trx
-                    first = json_object[0].copy()
-                    logger.debug(f"First trx :\n{first}")
-                    # Determine type of address   # TODO: NFT
-                    first["type"] = "wallet"
-
-                    if first["to"] == "" and first["contractAddress"] != "":
-                        first["type"] = "contract"
-                    # Get last block collected
-                    first["last_block"] = json_object[-1]["blockNumber"]
-                    first["timeStamp_to"] = json_object[-1]["timeStamp"]
-                    # TODO: Do this check more complex for large wallets and contracts,
-                    if len(json_object) == 10000:
-                        first["all_data"] = False
-                    else:
-                        first["all_data"] = True
-                    # Set address
-                    first["address"] = address
-
-                    # PERF: Analyze if wallet_detail and block table can merge
-
-                    # Store detail
-                    db_store_wallet_detail(connection, first)
-                    # Store blocks
-                    db_store_address_block(connection, first)
-                except Exception:
-                    traceback.print_exc()
-                    traceback_text = traceback.format_exc()
-
-                    connection.close()
-                    message = "<strong>Error...</strong>"
-                    logger.warning(f"{message}")
-                    data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
-                    yield f"data:{data}\n\n"
-
-                    for line in traceback_text.splitlines():
-                        message = f"{line}"
-                        logger.warning(f"{message}")
-                        data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
-                        yield f"data:{data}\n\n"
-
-                    message = " "
-                    logger.warning(f"{message}")
-                    data = json.dumps({"msg": f"{message}", "end": True, "error": True, "content": {}})
-                    yield f"data:{data}\n\n"
-
-                # INFO: Store transaction, internals, transfers and NFTs in DB
-                try:
-                    message = "<strong>DATA COLLECTED</strong> - Storing..."
-                    logger.info(message.replace("<strong>", "").replace("</strong>", ""))
-                    data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
-                    yield f"data:{data}\n\n"
-
-                    # HACK: Here is the crux of it all, because I have to transfer the methodID and funcname to the rest!!!!
-                    # TODO: Register in internals, transfers, nfts and multitoken the trxs neccesary to complete methodIs and functionName
-                    # INFO: transactions
-                    tic = time.perf_counter()
-                    # db_store_transactions_optimized(connection, json_object)
-                    df_trx_store = pd.DataFrame(json_object)
-                    df_trx_store["blockChain"] = blockchain
-                    df_trx_store.to_sql("t_transactions", connection, if_exists="append", index=False, method=insert_with_ignore)
-                    toc = time.perf_counter()
-                    message = f"<strong>STORE</strong> - Transactions...<strong>{toc - tic:0.4f}</strong> seconds"
-                    logger.info(message.replace("<strong>", "").replace("</strong>", ""))
-                    data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
-                    yield f"data:{data}\n\n"
-
-                    # INFO: internals
-                    tic = toc
-                    # db_store_internals_optimized(connection, json_internals)
-                    if json_internals != []:
-                        df_internals_store = pd.DataFrame(json_internals)
-                        df_internals_store["blockChain"] = blockchain
-                        df_internals_merged = df_internals_store.merge(df_trx_store[["hash", "methodId", "functionName"]], on="hash", how="left")
-                        df_internals_merged.fillna("", inplace=True)
-                        df_internals_merged.to_sql("t_internals", connection, if_exists="append", index=False, method=insert_with_ignore)
-                    toc = time.perf_counter()
-                    message = f"<strong>STORE</strong> - Internals...<strong>{toc - tic:0.4f}</strong> seconds"
-                    logger.info(message.replace("<strong>", "").replace("</strong>", ""))
-                    data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
-                    yield f"data:{data}\n\n"
-
-                    # INFO: transfers
-                    tic = toc
-                    # db_store_transfers_optimized(connection, json_transfers)
-                    if json_transfers != []:
-                        df_transfers_store = pd.DataFrame(json_transfers)
-                        df_transfers_store["blockChain"] = blockchain
-                        df_transfers_merged = df_transfers_store.merge(df_trx_store[["hash", "methodId", "functionName"]], on="hash", how="left")
-                        df_transfers_merged.fillna("", inplace=True)
-                        df_transfers_merged.to_sql("t_transfers", connection, if_exists="append", index=False, method=insert_with_ignore)
-                    toc = time.perf_counter()
-                    message = f"<strong>STORE</strong> - Transfers ERC20...<strong>{toc - tic:0.4f}</strong> seconds"
-                    logger.info(message.replace("<strong>", "").replace("</strong>", ""))
-                    data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
-                    yield f"data:{data}\n\n"
-
-                    # INFO: NFTs
-                    tic = toc
-                    # db_store_nfts_optimized(connection, json_nfts)
-                    if json_nfts != []:
-                        df_nfts_store = pd.DataFrame(json_nfts)
-                        df_nfts_store["blockChain"] = blockchain
-                        df_nfts_merged = df_nfts_store.merge(df_trx_store[["hash", "methodId", "functionName"]], on="hash", how="left")
-                        df_nfts_merged.fillna("", inplace=True)
-                        df_nfts_merged.to_sql("t_nfts", connection, if_exists="append", index=False, method=insert_with_ignore)
-                    toc = time.perf_counter()
-                    message = f"<strong>STORE</strong> - Transfers ERC721...<strong>{toc - tic:0.4f}</strong> seconds"
-                    logger.info(message.replace("<strong>", "").replace("</strong>", ""))
-                    data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
-                    yield f"data:{data}\n\n"
-
-                    # INFO: Multitokens
-                    tic = toc
-                    # db_store_multitoken_optimized(connection, json_multitokens)
-                    if json_multitokens != []:
-                        df_multitoken_store = pd.DataFrame(json_multitokens)
-                        df_multitoken_store["blockChain"] = blockchain
-                        df_multitoken_merged = df_multitoken_store.merge(df_trx_store[["hash", "methodId", "functionName"]], on="hash", how="left")
-                        df_multitoken_merged.fillna("", inplace=True)
-                        df_multitoken_merged.to_sql("t_multitoken", connection, if_exists="append", index=False, method=insert_with_ignore)
-                    toc = time.perf_counter()
-                    message = f"<strong>STORE</strong> - Transfers ERC1155...<strong>{toc - tic:0.4f}</strong> seconds"
-                    logger.info(message.replace("<strong>", "").replace("</strong>", ""))
-                    data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
-                    yield f"data:{data}\n\n"
-                except Exception:
-                    traceback.print_exc()
-                    traceback_text = traceback.format_exc()
-
+                # INFO: Get trx, internals, transfers, NFTs (ERC-721) and multitokens (ERC-1155)
+                # NOTE: Endpoints are requested concurrently and paged past the 10000 rows cap,
+                #       every page is stored as soon as it arrives
+                collected = yield from event_collect_wallet(connection, params, address, blockchain)
+                if collected is None:
                     connection.close()
-                    message = "<strong>Error...</strong>"
-                    logger.error(message.replace("<strong>", "").replace("</strong>", ""))
-                    logger.warning(f"{message}")
-                    data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
-                    yield f"data:{data}\n\n"
-
-                    for line in traceback_text.splitlines():
-                        message = f"{line}"
-                        logger.warning(f"{message}")
-                        data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
-                        yield f"data:{data}\n\n"
+                    return
 
-                    message = " "
-                    logger.warning(f"{message}")
-                    data = json.dumps({"msg": f"{message}", "end": True, "error": True, "content": {}})
-                    yield f"data:{data}\n\n"
+                # INFO: Tag and classify the stored movements (also the ones of an aborted ingest)
+                hashes = db_pending_hashes(connection, address)
+                df_stored = db_collected(connection, address, hashes)
 
                 # INFO: Generating internals tags
                 tic = time.perf_counter()
                 # db_store_tagging(connection, address, json_object, json_transfers, json_internals)
-                db_store_tagging_opt(connection, address, json_object, json_transfers, json_internals, json_nfts, json_multitokens)
+                db_store_tagging_opt(
+                    connection,
+                    address,
+                    df_stored["txlist"],
+                    df_stored["tokentx"],
+                    df_stored["txlistinternal"],
+                    df_stored["tokennfttx"],
+                    df_stored["token1155tx"],
+                )
                 toc = time.perf_counter()
                 message = f"<strong>STORE</strong> - Tagging...<strong>{toc - tic:0.4f}</strong> seconds"
                 logger.info(message.replace("<strong>", "").replace("</strong>", ""))
@@ -1018,9 +1145,7 @@ def event_stream_ether(params):
                 yield f"data:{data}\n\n"
 
                 # INFO: KKK - Store nodes and links for classification
-                trxs = store_nodes_links_db(
-                    connection, address, params, df_trx_store, df_internals_store, df_transfers_store, df_nfts_store, df_multitoken_store
-                )
+                trxs = store_nodes_links_db(connection, address, params, hashes)
                 trxs = get_nodes_links_bd(connection, address, params)
 
         # INFO: Exist information in db
@@ -1032,109 +1157,48 @@ def event_stream_ether(params):
 
             # TODO: Add contract validation (Read the HACK comment)
 
-            # Validate if all trxs are collected
-            query = f"SELECT all_data FROM t_blocks WHERE address = '{address}';"
-            cursor.execute(query)
-            all_data_collected = cursor.fetchone()
-
-            # INFO: No more info to collect
-
-            # if (not all_data_collected[0]):
-
-            #     # Get last block number
-            #     query = f"SELECT rowid, * FROM t_blocks WHERE address = '{address}' ORDER BY block_to DESC LIMIT 1;"
-            #     cursor.execute(query)
-            #     row = cursor.fetchone()
-            #     last_block = int(row[4]) + 1
-            #     rowid = int(row[0])
-
-            #     logger.debug(f"Last block: {last_block}")
-            #
-            #     # Get more blocks from last block
-            #     try:
-            #         url = f"https://api.etherscan.io/api?module=account&action=txlist&address={address}&startblock={last_block}&endblock=99999999&sort=asc&apikey={key}"
-            #         # print(url)
-            #         response = requests.get(url)
-            #         json_object = response.json()['result']
-
-            #         if (len(json_object) > 0):
-            #             message = f"<strong>TRANSACTIONS</strong> - Get more transactions"
-            #             logger.info(message.replace('<strong>', '').replace('</strong>', ''))
-            #             data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
-            #             yield f"data:{data}\n\n"
-            #         else:
-            #             message = f"<strong>TRANSACTIONS<strong> - More transactions <strong>NOT FOUND</strong>"
-            #             logger.info(message.replace('<strong>', '').replace('</strong>', ''))
-            #             data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
-            #             yield f"data:{data}\n\n"
-
-            #     except Exception:
-            #         traceback.print_exc()
-            #         traceback_text = traceback.format_exc()
-
-            #         connection.close()
-            #         message = f"<strong>Error...</strong>"
-            #         logger.warning(f"{message}")
-            #         data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
-            #         yield f"data:{data}\n\n"
-
-            #         for line in traceback_text.splitlines():
-            #             message = f"{line}"
-            #             logger.warning(f"{message}")
-            #             data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
-            #             yield f"data:{data}\n\n"
-
-            #         message = f" "
-            #         logger.warning(f"{message}")
-            #         data = json.dumps({"msg": f"{message}", "end": True, "error": True, "content": {}})
-            #         yield f"data:{data}\n\n"
-
-            #     # Store transaction in DB
-            #     try:
-            #         message = f"<strong>TRANSACTIONS</strong> - Storing..."
-            #         logger.info(message.replace('<strong>', '').replace('</strong>', ''))
-            #         data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
-            #         yield f"data:{data}\n\n"
-
-            #         db_store_transactions(connection, json_object)
-            #     except Exception:
-            #         traceback.print_exc()
-            #         traceback_text = traceback.format_exc()
-
-            #         connection.close()
-            #         message = f"<strong>Error...</strong>"
-            #         logger.error(message.replace('<strong>', '').replace('</strong>', ''))
-            #         logger.warning(f"{message}")
-            #         data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
-            #         yield f"data:{data}\n\n"
-
-            #         for line in traceback_text.splitlines():
-            #             message = f"{line}"
-            #             logger.warning(f"{message}")
-            #             data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
-            #             yield f"data:{data}\n\n"
-
-            #         message = f" "
-            #         logger.warning(f"{message}")
-            #         data = json.dumps({"msg": f"{message}", "end": True, "error": True, "content": {}})
-            #         yield f"data:{data}\n\n"
-
-            #     # Get new last block and date
-            #     new_last_block = json_object[-1]['blockNumber']
-            #     new_timeStamp_to = json_object[-1]['timeStamp']
-
-            #     logger.debug(f"New Last block: {json_object[-1]}")
-            #     logger.debug(f"New Last block number: {new_last_block}")
-
-            #     # Update last block
-            #     update = f"UPDATE t_blocks SET block_to = {new_last_block}, date_to = {new_timeStamp_to} WHERE rowid = {rowid}"
-            #     cursor.execute(update)
-            #     logger.debug(f"UPDATE: {update}")
-            #     connection.commit()
-
-            #     # TODO: Store transfer in DB
-            #     # TODO: Store internal in DB
-            #     # TODO: Generating internals tags
+            # INFO: Refresh the wallet from the last collected block when asked or when the collection was interrupted
+            query = "SELECT block_to, all_data FROM t_blocks WHERE blockChain = ? AND address = ?"
+            cursor.execute(query, (blockchain, address))
+            blocks = cursor.fetchone()
+            refresh = str(params.get("refresh", "")).lower() in ("true", "1")
+
+            if blocks and (wallet_detail[12] == "wallet") and (refresh or not blocks[1]):
+                block_to = int(blocks[0])
+                message = f"<strong>REFRESH</strong> - Collecting from block {block_to + 1}..."
+                logger.info(message.replace("<strong>", "").replace("</strong>", ""))
+                data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
+                yield f"data:{data}\n\n"
+
+                collected = yield from event_collect_wallet(connection, params, address, blockchain, block_to + 1, stored=True)
+                if collected is None:
+                    connection.close()
+                    return
+
+                # INFO: Tag and classify only the stored movements not classified yet, the ones collected now
+                #       and the ones an aborted collection stored before
+                hashes = db_pending_hashes(connection, address)
+                if hashes:
+                    df_stored = db_collected(connection, address, hashes)
+
+                    tic = time.perf_counter()
+                    db_store_tagging_opt(
+                        connection,
+                        address,
+                        df_stored["txlist"],
+                        df_stored["tokentx"],
+                        df_stored["txlistinternal"],
+                        df_stored["tokennfttx"],
+                        df_stored["token1155tx"],
+                        incremental=True,
+                    )
+                    toc = time.perf_counter()
+                    message = f"<strong>STORE</strong> - Tagging...<strong>{toc - tic:0.4f}</strong> seconds"
+                    logger.info(message.replace("<strong>", "").replace("</strong>", ""))
+                    data = json.dumps({"msg": message, "end": False, "error": False, "content": {}})
+                    yield f"data:{data}\n\n"
+
+                    store_nodes_links_db(connection, address, params, hashes)
 
         # INFO: Send wallet detail information
         query = f"SELECT * FROM t_address_detail WHERE address = '{address}' AND blockChain = '{blockchain}'"
@@ -1233,9 +1297,8 @@ def event_stream_ether(params):
 
 def recreate_db(params):
     # Checking wallet and first trx
-    dbname = params["config"]["dbname"]
     address = params.get("address")
-    connection = sqlite3.connect(dbname)
+    connection = db.connect(params["config"])
 
     address = ("eth", address, "central")
     # trxs = get_trx_from_address(connection, address)
@@ -1256,9 +1319,8 @@ def recreate_db(params):
 
 def test_function_1(params):
     # Checking wallet and first trx
-    dbname = params["config"]["dbname"]
     address = params.get("address")
-    connection = sqlite3.connect(dbname)
+    connection = db.connect(params["config"])
 
     address = ("eth", address, "central")
     # trxs = get_trx_from_address(connection, address)
@@ -1286,9 +1348,8 @@ def test_function_1(params):
 
 def test_function_2(params):
     # Checking wallet and first trx
-    dbname = params["config"]["dbname"]
     address = params.get("address")
-    connection = sqlite3.connect(dbname)
+    connection = db.connect(params["config"])
 
     address = ("eth", address, "central")
 
@@ -1307,9 +1368,9 @@ def test_function_2(params):
 # TODO: Include type of address and evaluate
 # HACK: Merge with labels??
 # TODO: Add NFTs and Multitoken
-def db_store_tagging_opt(connection, address, trxs, transfers, internals, nfts, multitoken):
+def db_store_tagging_opt(connection, address, trxs, transfers, internals, nfts, multitoken, incremental=False):
     # Create dataframes
-    if not trxs:
+    if len(trxs) == 0:
         df_t = pd.DataFrame(
             columns=[
                 "blockChain",
@@ -1329,7 +1390,7 @@ def db_store_tagging_opt(connection, address, trxs, transfers, internals, nfts,
         )
     else:
         df_t = pd.DataFrame(trxs)
-    if not transfers:
+    if len(transfers) == 0:
         df_f = pd.DataFrame(
             columns=[
                 "blockChain",
@@ -1349,7 +1410,7 @@ def db_store_tagging_opt(connection, address, trxs, transfers, internals, nfts,
         )
     else:
         df_f = pd.DataFrame(transfers)
-    if not internals:
+    if len(internals) == 0:
         df_i = pd.DataFrame(
             columns=[
                 "blockChain",
@@ -1369,7 +1430,7 @@ def db_store_tagging_opt(connection, address, trxs, transfers, internals, nfts,
         )
     else:
         df_i = pd.DataFrame(internals)
-    if not nfts:
+    if len(nfts) == 0:
         df_n = pd.DataFrame(
             columns=[
                 "blockChain",
@@ -1389,7 +1450,7 @@ def db_store_tagging_opt(connection, address, trxs, transfers, internals, nfts,
         )
     else:
         df_n = pd.DataFrame(nfts)
-    if not multitoken:
+    if len(multitoken) == 0:
         df_m = pd.DataFrame(
             columns=[
                 "blockChain",
@@ -1437,6 +1498,17 @@ def db_store_tagging_opt(connection, address, trxs, transfers, internals, nfts,
 
     df_addresses.loc[df_addresses["address"].isin(contracts), "tag"] = "contract"
 
+    # INFO: On a refresh an address is a contract if the rows collected before said so, and a contract found
+    #       now is not a wallet anymore (every address has one of both tags)
+    if incremental:
+        query = "SELECT address FROM t_tags WHERE tag = 'contract' AND address IN ({placeholders})"
+        df_addresses.loc[df_addresses["address"].isin(db_select_in(connection, query, df_addresses["address"])), "tag"] = "contract"
+        connection.executemany(
+            "DELETE FROM t_tags WHERE tag = 'wallet' AND address = ?",
+            [(contract,) for contract in df_addresses.loc[df_addresses["tag"] == "contract", "address"]],
+        )
+        connection.commit()
+
     # INFO: Funders or creators
     # TODO: Evaluate type to distinguish Funders and creators
     # df_all = pd.concat([df[['from', 'to', 'timeStamp']] for df in [df_t, df_f, df_i] if 'timeStamp' in df.columns], ignore_index=True).sort_values(by='timeStamp')
@@ -1444,6 +1516,29 @@ def db_store_tagging_opt(connection, address, trxs, transfers, internals, nfts,
         [df[["from", "to", "timeStamp"]] for df in [df_t, df_f, df_i, df_n, df_m] if "timeStamp" in df.columns], ignore_index=True
     ).sort_values(by="timeStamp")
     min_timestamp = df_all.loc[df_all["from"] == address, "timeStamp"].min()
+    # INFO: On a refresh the first outgoing trx can be in the rows collected before
+    if incremental:
+        query = """
+            SELECT MIN(timeStamp) FROM (
+                SELECT timeStamp FROM t_transactions WHERE `from` = ?
+                UNION ALL SELECT timeStamp FROM t_internals WHERE `from` = ?
+                UNION ALL SELECT timeStamp FROM t_transfers WHERE `from` = ?
+                UNION ALL SELECT timeStamp FROM t_nfts WHERE `from` = ?
+                UNION ALL SELECT timeStamp FROM t_multitoken WHERE `from` = ?
+            )
+        """
+        stored_timestamp = connection.execute(query, (address,) * 5).fetchone()[0]
+        if stored_timestamp is not None:
+            stored_timestamp = str(stored_timestamp)  # INFO: Collected timeStamp are strings
+            min_timestamp = stored_timestamp if pd.isna(min_timestamp) else min(min_timestamp, stored_timestamp)
+
+        # INFO: Funders are in the rows collected before too, every stored row received before that trx
+        if not pd.isna(min_timestamp):
+            df_t, df_i, df_f, df_n, df_m = [
+                pd.read_sql_query(f"SELECT * FROM {table} WHERE `to` = ? AND timeStamp < ?", connection, params=(address, int(min_timestamp))).astype(str)
+                for table in ["t_transactions", "t_internals", "t_transfers", "t_nfts", "t_multitoken"]
+            ]
+            df_all = pd.concat([df[["from", "to", "timeStamp"]] for df in [df_t, df_f, df_i, df_n, df_m]], ignore_index=True)
     funders_addresses = df_all.loc[df_all["timeStamp"] < min_timestamp, "from"].unique()
 
     df_funders = pd.DataFrame(funders_addresses, columns=["address"])
@@ -1619,8 +1714,7 @@ def get_trx_from_addresses_opt(conn, address_central):
     tags_dict = pd.Series(tags_grouped.tags.values, index=tags_grouped.address).to_dict()
 
     # INFO: Labels
-    df_labels = pd.read_sql_query("SELECT * FROM t_labels WHERE blockChain = 'ethereum'", conn)  # TODO: Multichain
-    labels_dict = df_labels.set_index("address").apply(lambda row: row.to_dict(), axis=1).to_dict()
+    labels_dict = labels.Lookup(conn, "ethereum")  # TODO: Multichain
 
     # stat_coo =
     # stat_con = len(json_tags) - stat_coo
@@ -1631,22 +1725,11 @@ def get_trx_from_addresses_opt(conn, address_central):
     # - More info in links
 
     # INFO: Get all Trx, Transfers and internals
-    query = """
-        SELECT blockChain, type, hash, `from`, `to`, value, contractAddress, symbol, name, decimal, valConv, timeStamp, isError
-        FROM (
-            SELECT blockChain, 'transaction' as 'type', hash, `from`, `to`, value, 
-                contractAddress, 'ETH' as 'symbol', 'Ether' as 'name', 18 as 'decimal', value / POWER(10, 18) as valConv, timeStamp, isError
-            FROM t_transactions
-            UNION ALL
-            SELECT blockChain, 'internals', hash, `from`, `to`, value, 
-                contractAddress, 'ETH', 'Ether', 18, value / POWER(10, 18), timeStamp, isError
-            FROM t_internals
-            UNION ALL
-            SELECT blockChain, 'transfers', hash, `from`, `to`, value, 
-                contractAddress, tokenSymbol, tokenName, tokenDecimal, value / POWER(10, tokenDecimal), timeStamp, 0
-            FROM t_transfers
-        ) AS combined
-        ORDER BY timeStamp ASC
+    query = f"""
+        SELECT {movements.SELECT}
+        FROM {movements.DECODE}
+        WHERE m.type IN ({movements.TRANSACTION}, {movements.INTERNALS}, {movements.TRANSFERS})
+        ORDER BY m.timeStamp ASC
     """
     df_all = pd.read_sql_query(query, conn)
 
@@ -1763,66 +1846,44 @@ def get_balance_and_gas(conn, address_central, type, key):
     address_central = address_central[1]
 
     if type == "wallet":
-        # INFO: Get all Trx, Transfers and internals balance
-        query = f"""
-            SELECT 
-                blockChain,
-                '{address_central}',
-                token,
-                tokenName,
-                SUM(
-                    CASE 
-                        WHEN "From" = '{address_central}' THEN -value / POWER(10, SymbolDecimal)
-                        WHEN "To" = '{address_central}' THEN value / POWER(10, SymbolDecimal)
-                        ELSE 0
-                    END
-                ) AS balance
-            FROM 
-                (
-                SELECT blockChain, 'transaction', hash, `from`, `to`, value, contractAddress, 'ETH' as 'token', 'Ether' as 'tokenName', 18 as 'SymbolDecimal', timeStamp, isError
-                FROM t_transactions
-                UNION 
-                SELECT blockChain, 'internals', hash, `from`, `to`, value, contractAddress, 'ETH',  'Ether', 18 as 'SymbolDecimal', timeStamp, isError
-                FROM t_internals
-                UNION 
-                SELECT blockChain, 'transfers', hash, `from`, `to`, value, contractAddress, tokenSymbol, tokenName, tokenDecimal, timeStamp, 0
-                FROM t_transfers
-                ) AS balance_temp
-            WHERE 
-                "isError" = 0 AND
-                ("From" = '{address_central}' OR "To" = '{address_central}')
-            GROUP BY 
-                token;
-        """
-        # df_balance = pd.read_sql_query(query, conn).to_json(orient = "records")
-        df_balance = pd.read_sql_query(query, conn)
-
-        # INFO: Get Gas
-        query = f"""
+        # INFO: Balance and gas of the ledger (t_ledger, kept at ingest), exact in wei (see core/wei.py)
+        query = """
             SELECT 
-                SUM(gasPrice * gasUsed * 1e-18) as "Gas"
-            FROM t_transactions
+                tk.blockChain,
+                tk.symbol AS token,
+                tk.name AS tokenName,
+                tk.decimal AS SymbolDecimal,
+                l.inflow,
+                l.outflow,
+                l.gas
+            FROM t_ledger AS l
+                JOIN t_tokens AS tk ON tk.id = l.token_id
             WHERE 
-                "isError" = 0 AND
-                "From" = '{address_central}'
+                l.address_id = ?
         """
-        cursor = conn.cursor()
-        cursor.execute(query)
-        gas = cursor.fetchone()[0]
+        df_ledger = pd.read_sql_query(query, conn, params=(movements.address_id(conn, address_central),))
+        df_ledger["raw"] = [int(inflow) - int(outflow) for inflow, outflow in zip(df_ledger["inflow"], df_ledger["outflow"])]
+        gas_raw = wei.exact_sum(df_ledger["gas"])
+        gas = wei.to_float(gas_raw, 18)
+
+        # INFO: By symbol, as the balance query had it
+        df_balance = df_ledger.groupby("token", dropna=False, sort=True)[["blockChain", "tokenName", "SymbolDecimal"]].first()
+        df_balance["raw"] = df_ledger.groupby("token", dropna=False, sort=True)["raw"].agg(wei.exact_sum)
+
+        # INFO: Gas out of the ETH balance, then one conversion by token. No ETH row (only tokens in or only
+        #       errored transactions) leaves the balance empty, the gas is still reported
+        if "ETH" in df_balance.index:
+            df_balance.loc["ETH", "raw"] = max(df_balance.loc["ETH", "raw"] - gas_raw, 0)
+        df_balance["balance"] = [
+            wei.to_float(raw, decimals) if pd.notna(decimals) else None for raw, decimals in zip(df_balance["raw"], df_balance["SymbolDecimal"])
+        ]
+        df_balance = df_balance.reset_index()
+        df_balance.insert(1, f"'{address_central}'", address_central)
+        df_balance = df_balance[["blockChain", f"'{address_central}'", "token", "tokenName", "balance"]]
 
         # Get index of ETH row
         index = df_balance.index[df_balance["token"] == "ETH"].tolist()
-        balance = df_balance[df_balance["token"] == "ETH"]
-
-        if (balance.loc[index[0], "balance"] - gas) >= 0:
-            balance.loc[index[0], "balance"] -= gas
-        else:
-            balance.loc[index[0], "balance"] = 0
-
-        # balance.loc[index, 'balance'] -= gas
-        # if (balance.loc[index, 'balance'] < 0):
-        #     balance.loc[index, 'balance'] = 0.0
-        balance = json.loads(balance[balance["token"] == "ETH"].to_json(orient="records"))
+        balance = json.loads(df_balance[df_balance["token"] == "ETH"].to_json(orient="records"))
 
         # Remove row from tokens
         df_balance.drop(index, inplace=True)
@@ -1832,8 +1893,8 @@ def get_balance_and_gas(conn, address_central, type, key):
 
     else:
         # INFO: Get balance of contract
-        url = f"https://api.etherscan.io/api?module=account&action=balance&address={address_central}&tag=latest&apikey={key}"
-        response = requests.get(url)
+        url = f"https://api.etherscan.io/api?module=account&action=balance&address={address_central}&tag=latest"
+        response = api.get(key, url)
         json_object = response.json()["result"]
         # print(f"BALANCE: {json_object}")
         balance = [{"blockChain": "eth", "balance": int(json_object) / 1e18, "token": "ETH", "tokenName": "Ether"}]
@@ -1862,13 +1923,30 @@ def get_tags_labels(conn, address_central):
     df_tags = json.loads(pd.read_sql_query(query, conn).to_json(orient="records"))
 
     # INFO: Get Labels
-    query = f"SELECT * FROM t_labels WHERE blockChain = 'ethereum' and address = '{address_central}';"
-    df_labels = json.loads(pd.read_sql_query(query, conn).to_json(orient="records"))
+    df_labels = labels.find(conn, address_central, "ethereum")
 
     return {"tags": df_tags, "labels": df_labels}
 
 
-def store_nodes_links_db(conn, address_central, params=[], df_trx=[], df_int=[], df_trf=[], df_nft=[], df_mul=[]):
+def prepare_movements(df_all):
+    # INFO: Movements without error for the classification and the count of the ones with error
+    # INFO: Convert to datetime
+    df_all["decimal"] = df_all["decimal"].astype("int64")
+    df_all["timeStamp"] = df_all["decimal"].astype("int64")
+    df_all["isError"] = df_all["isError"].astype("int64")
+    df_all["timeStamp"] = pd.to_datetime(df_all["timeStamp"], unit="s")
+    stat_err = len(df_all[df_all["isError"] != 0])
+    df_all = df_all[df_all["isError"] == 0].copy()
+
+    # INFO: Exact conversion of the amounts (wei.Wei keeps the raw units for exact link sums)
+    amounts = df_all["type"].isin(["transaction", "internals", "transfers"])
+    df_all["valConv"] = df_all["valConv"].astype(object)
+    df_all.loc[amounts, "valConv"] = wei.to_floats(df_all.loc[amounts, "value"], df_all.loc[amounts, "decimal"])
+
+    return df_all, stat_err
+
+
+def store_nodes_links_db(conn, address_central, params=[], hashes={}):
     address_central = address_central.lower()
     nodes = {}
     links = {}
@@ -1908,1473 +1986,72 @@ def store_nodes_links_db(conn, address_central, params=[], df_trx=[], df_int=[],
             cursor.execute("UPDATE t_nodes_classification SET tag = ? WHERE address = ?", (new_tag_str, address_central))
             conn.commit()
 
-    # NOTE: Get nodes and links in db
-    cursor.execute("SELECT address FROM t_nodes_classification")
-    nodes_sql = cursor.fetchall()
-    nodes_db = [address[0] for address in nodes_sql]
-    # print(nodes_db)
-    cursor.execute("SELECT link_key FROM t_links_classification")
-    links_sql = cursor.fetchall()
-    links_db = [lk[0] for lk in links_sql]
-    # print(links_db)
-
-    # INFO: Auxiliar function to add nodes to dict
-    def add_nodes(address, tag, label, contract=False):
-        nonlocal nodes  # HACK: It is not local to this function
-        nonlocal nodes_db  # HACK: It is not local to this function
-        nonlocal stat_wal  # HACK: It is not local to this function
-        nonlocal stat_con  # HACK: It is not local to this function
-
-        if address not in nodes:
-            if contract:
-                tag.append("contract")
-                stat_con += 1
-            else:
-                tag.append("wallet")
-                stat_wal += 1
-
-            nodes[address] = {"id": address, "address": address, "tag": tag, "label": label}
-        return True
-
-    # INFO: Auxiliar function to add links to dict
-    def add_link(from_address, to_address, symbol, name, contract, value, action, type, node_create=True):
-        nonlocal links  # HACK: It is not local to this function
-        nonlocal links_db  # HACK: It is not local to this function
-        nonlocal address_central  # HACK: It is not local to this function
-
-        if node_create:
-            # Nodes
-            for node_address in [from_address, to_address]:
-                if (node_address not in nodes) and (node_address not in nodes_db):
-                    tag = tags_dict.get(node_address, [])  # Get tag
-                    label = labels_dict.get(node_address, [])  # Get label
-                    if node_address == address_central:
-                        resp = add_nodes(node_address, tag, label, contract=False)
-                    else:
-                        resp = add_nodes(node_address, tag, label, contract=True)
-
-        if type == "nfts":  # NOTE: Add nfts condition
-            key = f"{from_address}->{to_address}-{symbol}-{value}"
-        elif type == "multitokens":  # NOTE: Add multitoken condition
-            key = f"{from_address}->{to_address}-{symbol}-{value}"
-        elif type == "incomplete - nft":  # NOTE: Add incomplete nft condition
-            key = f"{from_address}->{to_address}-{symbol}-{value}"
-        elif type == "incomplete - multitoken":  # NOTE: Add incomplete multitoken condition
-            key = f"{from_address}->{to_address}-{symbol}-{value}"
-        else:
-            key = f"{from_address}->{to_address}-{symbol}"
-
-        # key = (from_address, to_address, symbol)
-        # if (key not in links) and (key not in links_db):
-        if key not in links:
-            links[key] = {}
-            links[key]["link_key"] = key
-            links[key]["source"] = from_address
-            links[key]["target"] = to_address
-            links[key]["symbol"] = symbol
-            links[key]["name"] = name
-            links[key]["contract"] = contract
-            links[key]["count"] = 1
-            links[key]["sum"] = value
-            links[key]["action"] = [action]
-            links[key]["type"] = type
-        else:
-            links[key]["count"] += 1
-            links[key]["sum"] += value
-            if action not in links[key]["action"]:
-                links[key]["action"].append(action)
-        return True
-
     tic = time.perf_counter()
 
     # INFO: Config Log Level
     if params:
         log_format = "%(asctime)s [%(filename)s:%(lineno)d] %(levelname)s %(message)s"
         coloredlogs.install(level=params["config"]["level"], fmt=log_format, logger=logger)
+        coloredlogs.install(level=params["config"]["level"], fmt=log_format, logger=classify.logger)
         logger.propagate = False  # INFO: To prevent duplicates with flask
+        classify.logger.propagate = False
         address_central = params["address"].lower()
 
     logger.debug("++++++++++++++++++++++++++++++++++++++++++++++++++++")
     logger.debug(f"+ Address: {address_central}")
     logger.debug("++++++++++++++++++++++++++++++++++++++++++++++++++++")
 
-    data_frames = {"df_trx": df_trx, "df_int": df_int, "df_trf": df_trf, "df_nft": df_nft, "df_mul": df_mul}
-
     # INFO: Tagging: Here exclude wallets and contracts
     df_tags = pd.read_sql_query("SELECT address, tag FROM t_tags WHERE tag NOT IN ('wallet', 'contract')", conn)
     tags_grouped = df_tags.groupby("address")["tag"].apply(list).reset_index(name="tags")
     tags_dict = pd.Series(tags_grouped.tags.values, index=tags_grouped.address).to_dict()
 
     # INFO: Labels
-    df_labels = pd.read_sql_query("SELECT * FROM t_labels WHERE blockChain = 'ethereum'", conn)
-    labels_dict = df_labels.set_index("address").apply(lambda row: row.to_dict(), axis=1).to_dict()
-
-    # INFO: Get all Trx, Transfers, internals, nfts and multitoken
-    query = """
-        SELECT blockChain, type, hash, `from`, `to`, value, contractAddress, symbol, name, decimal, valConv, timeStamp, isError, methodId, functionName
-        FROM (
-            SELECT df_trx.blockChain, 'transaction' as 'type', df_trx.hash, df_trx.`from`, df_trx.`to`, df_trx.value, df_trx.contractAddress, 
-            'ETH' as 'symbol', 'Ether' as 'name', 18 as 'decimal', df_trx.value / POWER(10, 18) as valConv, df_trx.timeStamp, df_trx.isError, 
-            df_trx.methodId, df_trx.functionName
-            FROM df_trx
-            UNION ALL
-            SELECT df_int.blockChain, 'internals', df_int.hash, df_int.`from`, df_int.`to`, df_int.value, 
-                df_int.contractAddress, 'ETH', 'Ether', 18, df_int.value / POWER(10, 18), df_int.timeStamp, df_int.isError, '0x', ''
-            FROM df_int
-            UNION ALL
-            SELECT df_trf.blockChain, 'transfers', df_trf.hash, df_trf.`from`, df_trf.`to`, df_trf.value,
-                df_trf.contractAddress, df_trf.tokenSymbol, df_trf.tokenName, df_trf.tokenDecimal, df_trf.value / POWER(10, df_trf.tokenDecimal), 
-                df_trf.timeStamp, 0, '0x', ''
-            FROM df_trf
-            UNION ALL
-            SELECT df_nft.blockChain, 'nfts', df_nft.hash, df_nft.`from`, df_nft.`to`, df_nft.tokenID,
-                df_nft.contractAddress, df_nft.tokenSymbol, df_nft.tokenName, df_nft.tokenDecimal, df_nft.tokenID, df_nft.timeStamp, 0, '0x', ''
-            FROM df_nft
-            UNION ALL
-            SELECT df_mul.blockChain, 'multitoken', df_mul.hash, df_mul.`from`, df_mul.`to`, df_mul.tokenID,
-                df_mul.contractAddress, df_mul.tokenSymbol, df_mul.tokenName, df_mul.tokenValue, df_mul.tokenID, df_mul.timeStamp, 0, '0x', ''
-            FROM df_mul
-        ) AS combined
-        ORDER BY timeStamp ASC
-    """
-
-    # Ejecutar la consulta
-    df_all = psql.sqldf(query, data_frames)
-
-    # INFO: Convert to datetime
-    df_all["decimal"] = df_all["decimal"].astype("int64")
-    df_all["timeStamp"] = df_all["decimal"].astype("int64")
-    df_all["isError"] = df_all["isError"].astype("int64")
-    df_all["timeStamp"] = pd.to_datetime(df_all["timeStamp"], unit="s")
-    stat_err = len(df_all[df_all["isError"] != 0])
-    df_all = df_all[df_all["isError"] == 0]
-
-    # for index, row in df_all.iterrows():
-    grouped = df_all.groupby("hash")
-
-    inc = 0
-
-    for hash, group in grouped:
-        group_size = len(group)
-        has_transaction = "transaction" in group["type"].values
-
-        # INFO: Complete transaction and pure =======================================
-        if (group_size == 1) and (has_transaction):
-            # logger.info(colored(f"== SIMPLE ========================================", 'blue'))
-            for _, row in group.iterrows():
-                from_address = row["from"]
-                to_address = row["to"]
-                symbol = row["symbol"]
-                name = row["name"]
-                value = float(row["valConv"])
-                function = row["functionName"]
-
-                #     logger.debug(colored(f"== DETAIL\nTYPE: {row['type']} - HASH: {hash}\nXFROM: {row['from']} -> XTO: {row['to']} " +
-                #                          f"<--> CONTRACT: {row['contractAddress']}\nXVALUE: {row['valConv']} - XSYMBOL: {row['symbol']} " +
-                #                          f"- XMETHOD: {row['methodId']} - XFUNC: {row['functionName']}", 'blue'))
-                action = ""
-                if (float(row["value"]) != 0.0) and (row["functionName"] == ""):
-                    # logger.info(colored(f"++ ETHER MOVE ====================================", 'blue'))   # NOTE: Checked
-                    action = "ether move"
-                elif row["from"] == row["to"]:
-                    # logger.info(colored(f"++ SELF-DEPOSIT ==================================", 'blue'))   # NOTE: Checked
-                    action = "self deposit"
-                elif (float(row["value"]) != 0.0) and ("deposit" in row["functionName"]):
-                    # logger.info(colored(f"++ DEPOSIT =======================================", 'blue'))   # NOTE: Checked
-                    action = "deposit"
-                # elif (float(row['value']) == 0.0) and (row['functionName'] != ''):
-                elif row["functionName"] != "":  # 0xfb09c6e73cccf49307bb0f81428dc9ebbbb93699c5834c5a71e5aa8a5220229d
-                    # TODO: Nest to distinguish differents functions (?)
-                    # logger.info(colored(f"++ CONTRACT EXECUTION ============================", 'blue'))   # NOTE: Checked
-                    action = "contract execution"
-                elif (float(row["value"]) == 0.0) and (
-                    row["functionName"] == ""
-                ):  # 0x9ea05e6effbd5deea270a5296fd3e88e2653cefdff177296a487efe71b6fd728
-                    # logger.info(colored(f"++ DO NOTHING ====================================", 'blue'))   # TODO: Checked
-                    action = "do nothing"
-                else:
-                    logger.error(f"++ NOT DETECTED = {row['type']} ==================")
-
-                # Nodes
-                node_address = from_address
-                if (node_address not in nodes) and (node_address not in nodes_db):
-                    tag = tags_dict.get(node_address, [])  # Get tag
-                    label = labels_dict.get(node_address, [])  # Get label
-                    resp = add_nodes(node_address, tag, label, contract=False)
-
-                node_address = to_address
-                if (node_address not in nodes) and (node_address not in nodes_db):
-                    tag = tags_dict.get(node_address, [])  # Get tag
-                    label = labels_dict.get(node_address, [])  # Get label
-                    if function != "":
-                        resp = add_nodes(node_address, tag, label, contract=True)
-                    else:
-                        resp = add_nodes(node_address, tag, label, contract=False)
-
-                # Links
-                add_link(from_address, to_address, symbol, name, "", value, action, row["type"], node_create=False)
-
-            # # logger.info(colored(f"==================================================\n", 'black'))
-
-        # INFO: OTHERS
-        elif (group_size > 1) and (has_transaction):
-            # logger.debug(colored("== COMPLEX =======================================", "cyan"))
-            xfrom_address = xto_address = xsymbol = xname = xfunc = xtype = xparam = ""
-            xvalue = 0
-            for _, row in group.iterrows():
-                if row["type"] == "transaction":
-                    xtype = row["type"]
-                    xfrom_address = row["from"]
-                    xto_address = row["to"]
-                    xcontract = row["contractAddress"]
-                    xvalue = row["valConv"]
-                    xsymbol = row["symbol"]
-                    xname = row["name"]
-                    if row["functionName"]:
-                        xfunc = row["functionName"].split("(")[0]
-                        xparam = row["functionName"].split("(")[1]
-                    # logger.debug(
-                    #     colored(
-                    #         f"== DETAIL\nTYPE: {row['type']} - HASH: {hash}\nXFROM: {xfrom_address} -> XTO: {xto_address} "
-                    #         + f"<--> CONTRACT: {xcontract}\nXVALUE: {xvalue} - XSYMBOL: {xsymbol} "
-                    #         + f"- XMETHOD: {row['methodId']} - XFUNC: {xfunc}-{xparam}",
-                    #         "cyan",
-                    #     )
-                    # )
-                else:
-                    # logger.debug(colored(f"   ERC - {row['type']} =============================== \n" +
-                    #                      f"FROM: {row['from']} -> TO: {row['to']} <-> CON: {row['contractAddress']}\n" +
-                    #                      f"VALUE: {row['valConv']} - SYMBOL: {row['symbol']} - FUNC: {row['functionName']}", 'cyan'))
-                    from_address = row["from"]
-                    to_address = row["to"]
-                    contract = row["contractAddress"]
-                    value = row["valConv"]
-                    symbol = row["symbol"]
-                    name = row["name"]
-
-                    # INFO: Internals
-                    if row["type"] == "internals":
-                        if ("withdraw" in xfunc) and (xfrom_address == row["to"] == address_central) and (xto_address == row["from"]):
-                            # 0x344bc8fcc078e736944f728d29f1a5a04303588c793417143e8f5852e5e04b22
-                            # logger.debug(colored(f"++ WITHDRAW INTERNAL =(Do more research)==========", 'light_cyan'))  # NOTE: Checked
-                            action = "withdraw internal (unwrap)"
-
-                            # Links
-                            add_link(xfrom_address, xto_address, xsymbol, xname, "", xvalue, action, xtype, node_create=True)
-                            add_link(xto_address, xfrom_address, symbol, name, "", value, action, row["type"], node_create=False)
-
-                        elif (
-                            ("swap" in xfunc)
-                            and (group.iloc[1]["from"] == group.iloc[-1]["to"])
-                            and ((group["type"] == "internals").any())
-                            and ((group["type"] == "transfers").any())
-                        ):
-                            # 0x26bae55868fed567c6f865259156ff1c56891f2c2bb87ba5cdfa1903d3823d18
-                            # print(f"{group[['type', 'from', 'to', 'value', 'contractAddress']]}")
-                            # NOTE: Group processed
-                            action = "swap ether by token" if group.iloc[1]["from"] == address_central else "swap token by ether"
-                            # logger.debug(colored(f"++ BUY TOKEN WITH ETHER ==========================", 'light_cyan'))  # NOTE: Checked
-
-                            # Links
-                            add_link(
-                                group.iloc[1]["from"],
-                                group.iloc[1]["to"],
-                                group.iloc[1]["symbol"],
-                                group.iloc[1]["name"],
-                                group.iloc[1]["contractAddress"],
-                                group.iloc[1]["valConv"],
-                                action,
-                                group.iloc[1]["type"],
-                                node_create=True,
-                            )
-                            add_link(
-                                group.iloc[-1]["from"],
-                                group.iloc[-1]["to"],
-                                group.iloc[-1]["symbol"],
-                                group.iloc[-1]["name"],
-                                group.iloc[-1]["contractAddress"],
-                                group.iloc[-1]["valConv"],
-                                action,
-                                group.iloc[-1]["type"],
-                                node_create=False,
-                            )
-                            break
-
-                        # WARN: REVIEW
-                        elif (
-                            ("swap" in xfunc or "multicall" in xfunc)
-                            and (group.iloc[1]["to"] == group.iloc[-1]["to"])
-                            and ((group["type"] == "internals").any())
-                            and ((group["type"] == "transfers").any())
-                            and (xvalue != 0)
-                        ):  # 0xf9358c40ad6b71c12d33139504c462c73d822ff58aaf968374858e139da0740b
-                            # 0x4a7e69831f25c741b0837ba008daf16d6a4782573729ccbe1ce9486c420c54f7
-                            # print(f"GROUP")
-                            # print(f"{group[['type', 'from', 'to', 'value', 'contractAddress']]}")
-                            # NOTE: Group processed
-                            # NOTE: There is a record “transfers” that is not shown but is in the group, due to the “break”.
-                            action = "swap ether for token"
-                            # logger.debug(colored(f"++ SWAP ETHER FOR TOKEN ==========================", 'light_cyan'))  # NOTE: Checked
-
-                            # Links
-                            add_link(xfrom_address, xto_address, xsymbol, xname, "", value, action, "transaction", node_create=True)
-                            add_link(
-                                xto_address,
-                                xfrom_address,
-                                group.iloc[-1]["symbol"],
-                                group.iloc[-1]["name"],
-                                group.iloc[-1]["contractAddress"],
-                                group.iloc[-1]["valConv"],
-                                action,
-                                group.iloc[-1]["type"],
-                                node_create=False,
-                            )
-                            break
-
-                        elif (
-                            ((group["type"] == "internals").any())
-                            and ((group["type"] == "transfers").any())
-                            and (
-                                group.loc[group["type"] == "transaction", "from"].values[0]
-                                == group.loc[group["type"] == "internals", "to"].values[0]
-                                == group.loc[group["type"] == "transfers", "from"].values[0]
-                            )
-                        ):
-                            #  0xf8f8a9326e6e6f7bcdaca207e4ece32998cb9022dfd61235939693d892c836d9
-                            # print(f"{group}")
-                            # print(f"{group[['type', 'from', 'to', 'value']]}")
-                            # NOTE: group processed
-                            # NOTE: there is a record “transfers” that is not shown but is in the group, due to the “break”.
-                            action = "swap token by ether"
-                            # logger.debug(colored(f"++ SWAP TOKEN BY ETHER ===========================", 'light_cyan'))  # NOTE: checked
-
-                            # Links
-                            add_link(xfrom_address, xto_address, xsymbol, xname, "", value, action, "transaction", node_create=True)
-                            add_link(
-                                xto_address,
-                                xfrom_address,
-                                group.iloc[-1]["symbol"],
-                                group.iloc[-1]["name"],
-                                group.iloc[-1]["contractAddress"],
-                                group.iloc[-1]["valConv"],
-                                action,
-                                group.iloc[-1]["type"],
-                                node_create=False,
-                            )
-                            break
-
-                        elif (
-                            (xfrom_address == row["to"] == address_central)
-                            and (xvalue == 0)
-                            and (group["type"] == "nfts").any()
-                            and (group.iloc[-1]["from"] == address_central)
-                        ):
-                            # 0x11eca391dfa1b0ce3ab75a96de135234b752e89e9289919ca1d3b9922a0ae256
-                            # logger.debug(colored(f"++ SWAP NFT FOR TOKEN INTERNAL =================", 'light_cyan'))  # TODO: Checked
-                            action = "bid" if "bid" in xfunc.lower() else "not detected"
-
-                            # Links
-                            add_link(
-                                xto_address,
-                                xfrom_address,
-                                group.iloc[1]["symbol"],
-                                group.iloc[1]["name"],
-                                group.iloc[1]["contractAddress"],
-                                group.iloc[1]["valConv"],
-                                action,
-                                group.iloc[1]["type"],
-                                node_create=True,
-                            )
-
-                            # Node
-                            node_address = group.iloc[-1]["to"]
-                            if (node_address not in nodes) and (node_address not in nodes_db):
-                                tag = tags_dict.get(node_address, [])  # Get tag
-                                label = labels_dict.get(node_address, [])  # Get label
-                                add_nodes(node_address, tag, label, contract=False)  # TODO: Verify that always is a wallet
-
-                            add_link(
-                                group.iloc[-1]["from"],
-                                group.iloc[-1]["to"],
-                                group.iloc[-1]["symbol"],
-                                group.iloc[-1]["name"],
-                                group.iloc[-1]["contractAddress"],
-                                group.iloc[-1]["valConv"],
-                                action,
-                                "nfts",
-                                node_create=True,
-                            )
-                            break
-
-                        elif (
-                            ("purchase" in xfunc)
-                            and (xfrom_address == row["to"] == address_central)
-                            and (xvalue != 0)
-                            and (group["type"] == "nfts").any()
-                            and (group.iloc[-1]["from"] == "0x0000000000000000000000000000000000000000")
-                        ):
-                            # 0xe7bd55ddf0b6cd170b59f724ce2297a5c28d5837e7968a0885300970a4c8e7a7
-                            # print(f"{group}")
-                            # print(f"{group[['type', 'from', 'to', 'value']]}")
-                            # NOTE: group processed
-                            # NOTE: there is a record “nfts” that is not shown but is in the group, due to the “break”.
-                            action = "purchase nft with ether"
-                            # logger.debug(colored(f"++ PURCHASE NFT WITH ETHER =======================", 'light_cyan'))  # NOTE: Checked
-
-                            # Links
-                            add_link(xfrom_address, xto_address, xsymbol, xname, "", xvalue - value, action, "transaction", node_create=True)
-                            add_link(
-                                xto_address,
-                                xfrom_address,
-                                group.iloc[-1]["symbol"],
-                                group.iloc[-1]["name"],
-                                group.iloc[-1]["contractAddress"],
-                                group.iloc[-1]["valConv"],
-                                action,
-                                "nfts",
-                                node_create=False,
-                            )
-                            break
-
-                        elif ("exit" in xfunc) and (xfrom_address == row["to"]) and (xvalue == 0):
-                            # 0xef233f6abc71024c9894f3b83cb03c94a06efc1b3f7befac95017509a907b6f4
-                            action = "bridging in"
-                            # logger.debug(colored(f"++ BRIDGING (WITHDRAW) =(?)=======================", 'light_cyan'))  # NOTE: Checked - Bridging
-
-                            # Links
-                            add_link(row["from"], row["to"], row["symbol"], row["name"], "", row["valConv"], action, row["type"], node_create=True)
-
-                        elif ("purchase" in xfunc) and (xfrom_address == row["to"]) and (xvalue != 0):  # NOTE: Generic
-                            # ?
-                            logger.debug(colored(f"++ {hash}", "red"))  # FIX: Checked
-                            logger.debug(colored("++ PURCHASE WITH ETHER ===========================", "light_cyan"))  # TODO: Checked
-
-                        elif xfrom_address == row["to"] == address_central:
-                            # 0xc5d30d442ed9899304b6234230797cee8b0c0066407a5294a9531d758a2732c5
-                            # WARN: Super generic
-                            action = "Transfer ether to wa"
-                            # logger.debug(colored(f"++ TRANSFER ETHER TO WA ===(Generic)============", 'light_cyan'))  # NOTE: Checked
-
-                            # Links
-                            add_link(row["from"], row["to"], row["symbol"], row["name"], "", row["valConv"], action, row["type"], node_create=True)
-
-                        else:
-                            logger.error(f"++ NOT DETECTED = {row['type']} ==================")
-                            logger.error(f"GROUP\n{group[['type', 'from', 'to', 'value', 'contractAddress']]}")
-                            break
-
-                    # INFO: Transfers
-                    elif row["type"] == "transfers":
-                        # TODO: Exclude nfts and multitoken
-                        if (
-                            (float(xvalue) == 0.0)
-                            and ("swap" in xfunc)
-                            and (group.iloc[1]["from"] == group.iloc[-1]["to"] == address_central)
-                            and (not (group["type"] == "multitoken").any() and (not (group["type"] == "nfts").any()))
-                        ):
-                            # 0xfff2a20407ec45aa55974a967da2fbb33d1a9590062570835f4afdcdf49ed52e
-                            # WARN: Group processed
-                            # print(f"{group[['from', 'to', 'value', 'contractAddress']]}")
-                            action = "swap tokens"
-                            # logger.debug(colored("++ SWAP TOKEN ====================================", "light_cyan"))  # NOTE: Checked
-
-                            # # Nodes
-                            # node_address = xfrom_address
-                            # if (node_address not in nodes) and (node_address not in nodes_db):
-                            #     tag = tags_dict.get(node_address, [])  # Get tag
-                            #     label = labels_dict.get(node_address, [])  # Get label
-                            #     if (node_address == address_central):
-                            #         stat_con, stat_wal = add_nodes(node_address, tag, label, stat_con, stat_wal, contract=False)
-                            #     else:
-                            #         stat_con, stat_wal = add_nodes(node_address, tag, label, stat_con, stat_wal, contract=True)
-
-                            # node_address = xto_address
-                            # if (node_address not in nodes) and (node_address not in nodes_db):
-                            #     tag = tags_dict.get(node_address, [])  # Get tag
-                            #     label = labels_dict.get(node_address, [])  # Get label
-                            #     if (node_address == address_central):
-                            #         stat_con, stat_wal = add_nodes(node_address, tag, label, stat_con, stat_wal, contract=False)
-                            #     else:
-                            #         stat_con, stat_wal = add_nodes(node_address, tag, label, stat_con, stat_wal, contract=True)
-
-                            # Links
-                            add_link(
-                                xfrom_address,
-                                xto_address,
-                                group.iloc[1]["symbol"],
-                                group.iloc[1]["name"],
-                                group.iloc[1]["contractAddress"],
-                                group.iloc[1]["valConv"],
-                                action,
-                                group.iloc[1]["type"],
-                                node_create=True,
-                            )
-                            add_link(
-                                xto_address,
-                                xfrom_address,
-                                group.iloc[-1]["symbol"],
-                                group.iloc[-1]["name"],
-                                group.iloc[-1]["contractAddress"],
-                                group.iloc[-1]["valConv"],
-                                action,
-                                group.iloc[-1]["type"],
-                                node_create=False,
-                            )
-                            break
-                        # elif (float(xvalue) == 0.0) and ("atomicMatch" in xfunc) and (group.iloc[1]['from'] == group.iloc[-1]['to']) and ((group['type'] == 'nfts').any()):
-                        #     print(f"GROUP")
-                        #     print(f"{group[['type', 'from', 'to', 'value', 'contractAddress']]}")
-                        #     # WARN: Group processed
-                        #     logger.debug(colored(f"++ TRANSFER TOKEN BY NFT =========================", 'light_cyan'))  # TODO: Determine TOKEN BY NFT or NFT BY TOKEN
-                        #     break
-                        elif (
-                            (float(xvalue) == 0.0)
-                            and (group.iloc[1]["from"] == group.iloc[-1]["to"])
-                            and ((group["type"] == "nfts").any())
-                            and (row["to"] == address_central)
-                            and (group.iloc[-1]["from"] != "0x0000000000000000000000000000000000000000")
-                        ):
-                            # 0xf1b8c703a12b2f3f9c582720d2b7cb0052c042743f74a912e625ec4208c75ce4
-                            # print(f"GROUP")
-                            # print(f"{group[['type', 'from', 'to', 'value', 'contractAddress']]}")
-                            # WARN: Group processed
-                            action = "sell nft to wallet"
-                            # logger.debug(colored("++ SELL NFT TO WALLET =(G)========================", "light_cyan"))  # NOTE: Checked
-
-                            # Links
-                            add_link(
-                                group.iloc[1]["from"],
-                                group.iloc[1]["to"],
-                                group.iloc[1]["symbol"],
-                                group.iloc[1]["name"],
-                                group.iloc[1]["contractAddress"],
-                                group.iloc[1]["valConv"],
-                                action,
-                                group.iloc[1]["type"],
-                                node_create=True,
-                            )
-                            add_link(
-                                group.iloc[-1]["from"],
-                                group.iloc[-1]["to"],
-                                group.iloc[-1]["symbol"],
-                                group.iloc[-1]["name"],
-                                group.iloc[-1]["contractAddress"],
-                                group.iloc[-1]["valConv"],
-                                action,
-                                "nfts",
-                                # group.iloc[-1]["type"],
-                                node_create=False,
-                            )
-                            break
-
-                        elif (float(xvalue) == 0.0) and ("borrow" in xfunc) and (xfrom_address == group.iloc[-1]["to"]):
-                            # 0xfcf7f2cfc1add7e3837c8d1ee1de783f5f792d08d26bf6403ba1e17c8e906d1c
-                            # WARN: Group processed
-                            action = "borrow"
-                            # logger.debug(colored(f"++ BORROW TOKEN ==================================", "light_cyan"))  # NOTE: Checked
-
-                            # Links
-                            add_link(
-                                xto_address,
-                                xfrom_address,
-                                group.iloc[-1]["symbol"],
-                                group.iloc[-1]["name"],
-                                group.iloc[-1]["contractAddress"],
-                                group.iloc[-1]["valConv"],
-                                action,
-                                group.iloc[-1]["type"],
-                                node_create=True,
-                            )
-                            break
-                        # elif ((float(xvalue) == 0.0) and ("swap" in xfunc) and (group.iloc[1]["from"] == group.iloc[-1]["to"]) and ((group["type"] == "internals").any()) and ((group["type"] == "transfers").any())):  # NOTE: Checked
-                        #     # print(f"GROUP")
-                        #     # print(f"{group[['type', 'from', 'to', 'value', 'contractAddress']]}")
-                        #     # WARN: Group processed
-                        #     # WARN: There is a record “internals” that is not shown but is in the group, due to the “break”.
-                        #     logger.debug(colored(f"++ BUY TOKEN WITH ETHER ==========================", "light_cyan"))  # NOTE: Checked
-                        #     break
-                        elif ((group["type"] == "multitoken").any()) and (  # NOTE: NEW (Extend condition excluding nft (?))
-                            (group["type"] == "transfers").any()
-                        ):
-                            # 0xf7557d9bf453561b48e523eba9ef8a364ea194e4b197c5cd50176ef108e5e06c
-                            swap_token_by_multitoken = False
-                            # print(f"GROUP")
-                            # print(f"{group[['type', 'from', 'to', 'value', 'contractAddress']]}")
-                            # WARN: Group processed
-                            filter_df = group[group["type"].isin(["transfers", "multitoken"])].copy()
-                            filter_df.loc[:, "group_key"] = filter_df.apply(lambda row: frozenset([row["from"], row["to"]]), axis=1)
-                            grouped_dfs = {name: group.drop(columns="group_key") for name, group in filter_df.groupby("group_key")}
-                            # print(grouped_dfs)
-                            for key, grouped_df in grouped_dfs.items():
-                                # print(f"\n\n{grouped_df[['type', 'from', 'to', 'value', 'contractAddress']]}\n\n")
-                                if len(grouped_df) > 1:  # NOTE: swap transfer multitoken
-                                    swap_token_by_multitoken = True
-                                    action = "swap token by multitoken"
-
-                                    # Links
-                                    add_link(
-                                        grouped_df.iloc[0]["from"],
-                                        grouped_df.iloc[0]["to"],
-                                        grouped_df.iloc[0]["symbol"],
-                                        grouped_df.iloc[0]["name"],
-                                        grouped_df.iloc[0]["contractAddress"],
-                                        grouped_df.iloc[0]["valConv"],
-                                        action,
-                                        grouped_df.iloc[0]["type"],
-                                        node_create=True,
-                                    )
-                                    add_link(
-                                        grouped_df.iloc[-1]["from"],
-                                        grouped_df.iloc[-1]["to"],
-                                        grouped_df.iloc[-1]["symbol"],
-                                        grouped_df.iloc[-1]["name"],
-                                        grouped_df.iloc[-1]["contractAddress"],
-                                        grouped_df.iloc[-1]["valConv"],
-                                        action,
-                                        grouped_df.iloc[-1]["type"],
-                                        node_create=False,
-                                    )
-                                    # logger.debug(colored(f"++ SWAP TRANSFER MULTITOKEN ======================", "light_cyan"))  # TODO: Checked
-                            if swap_token_by_multitoken:
-                                pass
-                                # logger.debug(colored(f"++ SWAP TRANSFER MULTITOKEN ======================", "light_cyan"))  # TODO: Checked
-                            else:
-                                logger.error(f"++ NOT DETECTED = {row['type']} = Multitoken =====")
-                            break
-                        elif (
-                            (float(xvalue) != 0.0)
-                            and ("swap" in xfunc)
-                            and (xfrom_address == row["to"] == address_central)
-                            and (xto_address != row["from"] != row["contractAddress"])
-                        ):
-                            # 0xe3553ba5a5c4d40d578bb3eaf5e04f0de935528f7ff24d302470e962ce342de1
-                            # logger.debug(colored(f"++ SWAP ETHER TO TK ==============================", "light_cyan"))  # NOTE: Checked
-                            action = "swap ether by token"
-
-                            # Links
-                            add_link(xfrom_address, xto_address, xsymbol, xname, "", xvalue, action, xtype, node_create=True)
-                            add_link(
-                                xto_address,
-                                xfrom_address,
-                                group.iloc[-1]["symbol"],
-                                group.iloc[-1]["name"],
-                                group.iloc[-1]["contractAddress"],
-                                group.iloc[-1]["valConv"],
-                                action,
-                                group.iloc[-1]["type"],
-                                node_create=False,
-                            )
-                        elif (
-                            (float(xvalue) == 0.0)
-                            and ("deposit" in xfunc)
-                            and (xfrom_address == row["from"] == address_central)
-                            and (xto_address == row["to"] != row["contractAddress"])
-                        ):
-                            # logger.debug(colored(f"++ DEPOSIT TOKEN =================================", "light_cyan"))  # NOTE: Checked
-                            action = "deposit token"
-
-                            # Links
-                            add_link(
-                                xto_address,
-                                xfrom_address,
-                                group.iloc[-1]["symbol"],
-                                group.iloc[-1]["name"],
-                                group.iloc[-1]["contractAddress"],
-                                group.iloc[-1]["valConv"],
-                                action,
-                                group.iloc[-1]["type"],
-                                node_create=True,
-                            )
-                        elif (
-                            (xfrom_address == row["from"] == address_central)
-                            and (xto_address == row["contractAddress"])
-                            and (row["to"] != "0x0000000000000000000000000000000000000000")
-                        ):
-                            # 0xf01325b1b4c10b4cbe86c94cf65e459dde587b86bcdcbe50beaa8fa94df4b7e8
-                            # logger.debug(colored(f"++ TRANSFER TK FROM WA ===========================", "light_cyan"))  # NOTE: Checked
-                            action = "transfer tk from wa"
-
-                            # NOTE: From wallet to wallet
-
-                            # Nodes
-                            node_address = row["to"]
-                            if (node_address not in nodes) and (node_address not in nodes_db):
-                                tag = tags_dict.get(node_address, [])  # Get tag
-                                label = labels_dict.get(node_address, [])  # Get label
-                                add_nodes(node_address, tag, label, contract=False)
-                            # Links
-                            add_link(
-                                xfrom_address,
-                                row["to"],
-                                row["symbol"],
-                                row["name"],
-                                row["contractAddress"],
-                                row["valConv"],
-                                action,
-                                row["type"],
-                                node_create=True,
-                            )
-
-                        elif (
-                            (xfrom_address == row["from"] == address_central)
-                            and (row["from"] != "0x0000000000000000000000000000000000000000")
-                            and (row["to"] != "0x0000000000000000000000000000000000000000")
-                            and ("liquidity" in xfunc.lower())
-                        ):  # 0xf8c274a35c37916eb0cd52355f68ff68252b28181dec64c074c33a537371f688
-                            # logger.debug(colored(f"++ LIQUIDITY FROM WA =============================", "light_cyan"))  # NOTE: Checked
-                            action = "add liquidity"
-
-                            # Links
-                            add_link(
-                                xfrom_address,
-                                row["to"],
-                                row["symbol"],
-                                row["name"],
-                                row["contractAddress"],
-                                row["valConv"],
-                                action,
-                                row["type"],
-                                node_create=True,
-                            )
-
-                        elif (xfrom_address == row["to"] == address_central) and (
-                            "0x0000000000000000000000000000000000000000" == row["from"]
-                        ):  # 0xf8c274a35c37916eb0cd52355f68ff68252b28181dec64c074c33a537371f688
-                            # logger.error(f"++ NOT NECESARY ================================")  # NOTE: Checked
-                            pass
-
-                        elif (
-                            (xfrom_address == row["to"] == address_central)
-                            and (xto_address == row["from"])
-                            and (row["to"] != "0x0000000000000000000000000000000000000000")
-                        ):  # 0xfe45d513dc4fc8fb844f7a4b4375b15e3e7ac0a1923fb8e9cf70b6428968a408
-                            # logger.debug(colored(f"++ TRANSFER TK TO WA ===========================", "light_cyan"))  # NOTE: Checked
-                            action = "transfer tk to wa"
-
-                            # Links
-                            add_link(
-                                xfrom_address,
-                                xto_address,
-                                row["symbol"],
-                                row["name"],
-                                row["contractAddress"],
-                                row["valConv"],
-                                action,
-                                row["type"],
-                                node_create=True,
-                            )
-
-                        elif (xfrom_address == row["from"] == address_central) and (
-                            "0x0000000000000000000000000000000000000000" == row["to"]
-                        ):  # 0xed24c36025e354558cd0ff7969351757dbde659bdad0e006e3dfddce0f5a9e9f
-                            # logger.error(f"++ NOT NECESARY ================================")  # TODO: Do it in the future
-                            pass
-
-                        elif (xfrom_address == row["to"] == address_central) and (
-                            "exit" in xfunc
-                        ):  # 0xf14dfe2372837a17b43451969d318308db1de93897e27c2669d7ea2a2f3fa393
-                            # WARN: Determine if it's always a bridging
-                            # logger.debug(colored(f"++ BRIDGING (?) ================================", "light_cyan"))  # TODO: Checked
-                            action = "bridging in"
-
-                            # Links
-                            add_link(
-                                xto_address,
-                                row["to"],
-                                row["symbol"],
-                                row["name"],
-                                row["contractAddress"],
-                                row["valConv"],
-                                action,
-                                row["type"],
-                                node_create=True,
-                            )
-                            # WARN: Bridging out?
-
-                        elif ("withdraw" in xfunc) and (xfrom_address == row["to"] == address_central) and (xto_address == row["from"]):
-                            # 0xa467f35aa8a63fbb853ce751490e0fac24fd2933414ad54f15daad3ef78bce49
-                            # logger.debug(colored(f"++ WITHDRAW TRANSFER =(Do more research)==========", "light_cyan"))  # TODO: Checked
-                            action = "transfer tk to wa (withdraw)"
-
-                            # Links
-                            add_link(
-                                xto_address,
-                                xfrom_address,
-                                row["symbol"],
-                                row["name"],
-                                row["contractAddress"],
-                                row["valConv"],
-                                action,
-                                row["type"],
-                                node_create=True,
-                            )
-
-                        elif ("stake" in xfunc) and (xfrom_address == row["from"] == address_central):
-                            # 0xe944230ad186b7849ef6e3fbf79e12ddcba2d08d525ce05572bf759ebd694bab
-                            # logger.debug(colored(f"++ STAKE TOKEN ===================================", 'light_cyan'))  # NOTE: Checked
-                            action = "staking"
-
-                            # Links
-                            add_link(
-                                xfrom_address,
-                                row["to"],
-                                row["symbol"],
-                                row["name"],
-                                row["contractAddress"],
-                                row["valConv"],
-                                action,
-                                row["type"],
-                                node_create=True,
-                            )
-
-                        elif xfrom_address == row["to"] == address_central:
-                            # 0xdfe9f6c611b98a1b9c8fb1573152b02a82a69a1cb5437847357f89722c84ba41
-                            # WARN: Super generic
-                            # logger.debug(colored(f"++ TRANSFER TK TO WA ======(Generic)============", 'light_cyan'))  # NOTE: Checked
-                            action = "transfer tk to wa (generic)"
-
-                            # Links
-                            add_link(
-                                xto_address,
-                                xfrom_address,
-                                row["symbol"],
-                                row["name"],
-                                row["contractAddress"],
-                                row["valConv"],
-                                action,
-                                row["type"],
-                                node_create=True,
-                            )
-
-                        elif xfrom_address == row["from"] == address_central:
-                            # 0xe14b6581a3f101a9dc0de191662b5f5bec4b39d3fe391605527853040e1a2a00
-                            # WARN: Super generic
-                            # logger.debug(colored(f"++ TRANSFER TK FROM WA ====(Generic)============", "light_cyan"))  # NOTE: Checked
-                            action = "transfer tk from wa (generic)"
-
-                            # Links
-                            add_link(
-                                xfrom_address,
-                                xto_address,
-                                row["symbol"],
-                                row["name"],
-                                row["contractAddress"],
-                                row["valConv"],
-                                action,
-                                row["type"],
-                                node_create=True,
-                            )
-
-                        else:
-                            logger.error(f"++ NOT DETECTED = {row['type']} ==================")
-                            logger.error(f"GROUP\n{group[['type', 'from', 'to', 'value', 'contractAddress']]}")
-                            break
-
-                    # INFO: Nfts
-                    elif row["type"] == "nfts":
-                        # if (
-                        #     (float(xvalue) == 0.0)
-                        #     and ("atomicMatch" in xfunc)
-                        #     and (group.iloc[1]["from"] == group.iloc[-1]["to"])
-                        #     and ((group["type"] == "transfers").any())
-                        # ):
-                        #     # print(f"GROUP")
-                        #     # print(f"{group[['type', 'from', 'to', 'value', 'contractAddress']]}")
-                        #     # WARN: Group processed
-                        #     logger.debug(colored(f"++ TRANSFER TOKEN BY NFT =================", "light_cyan"))  # TODO: Checked
-                        #     # TODO: Determine TOKEN BY NFT or NFT BY TOKEN
-                        #     break
-                        # elif (xfrom_address == row["to"] == address_central) and (row["from"] == "0x0000000000000000000000000000000000000000"):
-                        if (xfrom_address == row["to"] == address_central) and (row["from"] == "0x0000000000000000000000000000000000000000"):
-                            # 0xe38cd8174c029b1d0b452a499bb9e62de2402319fc9f9514ff5059c79d220119
-                            # logger.debug(colored(f"++ MINT NFT ======================================", "light_cyan"))  # NOTE: Checked
-                            action = "mint nft"
-                            add_link(
-                                xto_address,
-                                xfrom_address,
-                                row["symbol"],
-                                row["name"],
-                                row["contractAddress"],
-                                row["value"],
-                                action,
-                                row["type"],
-                                node_create=True,
-                            )
-
-                        elif (xfrom_address == row["from"] == address_central) and (
-                            row["to"] == "0x0000000000000000000000000000000000000000"
-                        ):  # 0x83a7a3f749d400f3d33adee0e4a055901015b8c7dda9bfdac0706183f4001071
-                            # logger.debug(colored(f"++ BURN NFT ======================================", "light_cyan"))  # NOTE: Checked
-                            action = "burn nft"
-
-                            add_link(
-                                xfrom_address,
-                                xto_address,
-                                row["symbol"],
-                                row["name"],
-                                row["contractAddress"],
-                                row["value"],
-                                action,
-                                row["type"],
-                                node_create=True,
-                            )
-
-                        elif (
-                            (xfrom_address == row["from"] == address_central)
-                            and (xto_address == row["contractAddress"])
-                            and (row["to"] != "0x0000000000000000000000000000000000000000")
-                        ):
-                            # logger.debug(colored(f"++ TRANSFER NFT FROM WA ==========================", "light_cyan"))  # NOTE: Checked
-                            action = "transfer nft from wa"
-                            # WARN: Is always the "to" a wallet
-                            # Nodes (We must create a wallet node)
-                            node_address = row["to"]
-                            if (node_address not in nodes) and (node_address not in nodes_db):
-                                tag = tags_dict.get(node_address, [])  # Get tag
-                                label = labels_dict.get(node_address, [])  # Get label
-                                add_nodes(node_address, tag, label, contract=False)
-
-                            add_link(
-                                row["from"],
-                                row["to"],
-                                row["symbol"],
-                                row["name"],
-                                row["contractAddress"],
-                                row["value"],
-                                action,
-                                row["type"],
-                                node_create=True,
-                            )
-
-                        elif (xfrom_address == row["from"] == address_central) and (row["to"] != "0x0000ea00000000000000000000000000000000000"):
-                            # WARN: Similar to previous block but between particulars
-                            # logger.debug(colored(f"++ TRANSFER NFT FROM WA =(Particulars)============", "light_cyan"))  # NOTE: Checked
-                            action = "transfer nft from wa (marketplace)"
-                            # WARN: Is always the "to" a wallet
-                            # Nodes (We must create a wallet node)
-                            node_address = row["to"]
-                            if (node_address not in nodes) and (node_address not in nodes_db):
-                                tag = tags_dict.get(node_address, [])  # Get tag
-                                label = labels_dict.get(node_address, [])  # Get label
-                                add_nodes(node_address, tag, label, contract=False)
-
-                            add_link(
-                                row["from"],
-                                row["to"],
-                                row["symbol"],
-                                row["name"],
-                                row["contractAddress"],
-                                row["value"],
-                                action,
-                                row["type"],
-                                node_create=True,
-                            )
-
-                        elif (
-                            (xfrom_address == row["to"] == address_central)
-                            and (xto_address != row["to"] != row["contractAddress"])
-                            and (row["from"] != "0x0000000000000000000000000000000000000000")
-                        ):
-                            # logger.debug(colored(f"++ BUY NFT ETH ===================================", "light_cyan"))  # NOTE: Checked
-                            action = "buy nft with eth"
-
-                            add_link(xfrom_address, xto_address, xsymbol, xname, "", xvalue, action, xtype, node_create=True)
-                            add_link(
-                                xto_address,
-                                xfrom_address,
-                                row["symbol"],
-                                row["name"],
-                                row["contractAddress"],
-                                row["value"],
-                                action,
-                                row["type"],
-                                node_create=True,
-                            )
-
-                        else:
-                            logger.error(f"++ NOT DETECTED = {row['type']} ==================")
-                            logger.error(f"GROUP\n{group[['type', 'from', 'to', 'value', 'contractAddress']]}")
-                            break
-
-                    #         # INFO: Multitoken
-                    elif row["type"] == "multitoken":
-                        # FIX: Remove after code
-                        # logger.debug(
-                        #     colored(
-                        #         f"   ERC - {row['type']} =============================== \n"
-                        #         + f"FROM: {row['from']} -> TO: {row['to']} <-> CON: {row['contractAddress']}\n"
-                        #         + f"VALUE: {row['valConv']} - SYMBOL: {row['symbol']} - FUNC: {row['functionName']}",
-                        #         "cyan",
-                        #     )
-                        # )
-
-                        # if (hash == "0x46e7f1b95cddd4596e55ebe650af5d26b8932de84d9a3461cc4069922fbbd14b"):
-                        #     __import__('pdb').set_trace()
-
-                        if (xfrom_address == row["to"] == address_central) and (row["from"] == "0x0000000000000000000000000000000000000000"):
-                            # 0x8afd1b8eb53024809e52396faeb488d3b5fb769242ca2c777b32b46807ff33d2
-                            # logger.debug(colored(f"++ MULTITOKEN MINT NFT ===========================", "light_cyan"))  # NOTE: Checked
-                            action = "mint nft"
-
-                            add_link(
-                                xto_address,
-                                xfrom_address,
-                                row["symbol"],
-                                row["name"],
-                                row["contractAddress"],
-                                row["value"],
-                                action,
-                                "multitoken - nfts",
-                                node_create=True,
-                            )
-
-                        elif (xfrom_address == row["from"] == address_central) and (row["to"] == "0x0000000000000000000000000000000000000000"):
-                            # 0x8afd1b8eb53024809e52396faeb488d3b5fb769242ca2c777b32b46807ff33d2
-                            # logger.debug(colored(f"++ MULTITOKEN BURN NFT ===========================", 'light_cyan'))  # NOTE: Checked
-                            action = "burn nft"
-
-                            add_link(
-                                xfrom_address,
-                                xto_address,
-                                row["symbol"],
-                                row["name"],
-                                row["contractAddress"],
-                                row["value"],
-                                action,
-                                "multitoken - nfts",
-                                node_create=True,
-                            )
-
-                        elif (
-                            (xfrom_address == row["to"] == address_central)
-                            and (float(xvalue) > 0.0)
-                            and (xto_address != row["from"] != row["contractAddress"])
-                            and (row["decimal"] != 18)
-                        ):  # 0x3c5f26298c02fdcd9fe79d2bd7697ed65dfece0ddcab6d7228e469d58ea78afb
-                            # logger.debug(colored(f"++ MULTITOKEN BUY NFT WITH ETHER =================", "light_cyan"))
-                            action = "buy nft with ether"
-
-                            # Links
-                            add_link(xfrom_address, xto_address, xsymbol, xname, "", xvalue, action, xtype, node_create=True)
-
-                            # Node
-                            # NOTE: The source of the NFT is a wallet
-                            node_address = row["from"]
-                            if (node_address not in nodes) and (node_address not in nodes_db):
-                                tag = tags_dict.get(node_address, [])  # Get tag
-                                label = labels_dict.get(node_address, [])  # Get label
-                                add_nodes(node_address, tag, label, contract=False)
-
-                            add_link(
-                                row["from"],
-                                row["to"],
-                                row["symbol"],
-                                row["name"],
-                                row["contractAddress"],
-                                row["valConv"],
-                                action,
-                                "multitoken - nfts",
-                                node_create=True,
-                            )
-                        elif (
-                            (xfrom_address == row["from"] == address_central)
-                            and (float(xvalue) == 0.0)
-                            and (xto_address == row["contractAddress"])
-                            and (row["decimal"] == 1)
-                        ):  # 0xff29144cab03e9f3fa2ce19e0c08041d67ea6ecea4a7aed69c657e58f6a0c5a4
-                            # logger.debug(colored(f"++ MULTITOKEN TRANSFER NFT =======================", "light_cyan"))
-                            action = "transfer nft"
-
-                            # Node
-                            # NOTE: The target of the NFT is a wallet
-                            node_address = row["to"]
-                            if (node_address not in nodes) and (node_address not in nodes_db):
-                                tag = tags_dict.get(node_address, [])  # Get tag
-                                label = labels_dict.get(node_address, [])  # Get label
-                                add_nodes(node_address, tag, label, contract=False)
-
-                            add_link(
-                                row["from"],
-                                row["to"],
-                                row["symbol"],
-                                row["name"],
-                                row["contractAddress"],
-                                row["valConv"],
-                                action,
-                                "multitoken - nfts",
-                                node_create=True,
-                            )
-                        else:
-                            logger.error(f"++ NOT DETECTED = {row['type']} = {hash}")
-                            logger.error(f"GROUP\n{group[['type', 'from', 'to', 'value', 'contractAddress']]}")
-                            break
-
-                    else:
-                        logger.error(f"++ NOT DETECTED GENERAL = {row['type']} = {hash}")
-                        logger.error(f"GROUP\n{group[['type', 'from', 'to', 'value', 'contractAddress']]}")
-                        break
-
-        elif not has_transaction:
-            # logger.debug(colored(f"== INCOMPLETE ({inc}) == HASH: {group.iloc[0]['hash']} ==", "magenta"))
-            # logger.debug(f"GROUP\n{group[['type', 'from', 'to', 'value', 'contractAddress']]}")
-            inc += 1
-
-            for _, row in group.iterrows():
-                #     # INFO: Internals
-                if row["type"] == "internals":
-                    if (
-                        ((group["type"] == "nfts").any())
-                        and len(group) == 2
-                        and (group.loc[group["type"] == "internals", "to"].values[0] == group.loc[group["type"] == "nfts", "from"].values[0])
-                    ):  # 0xfb11efd2453075e0998c3b6941886858b08b0431b373a96c0347621c1a114820
-                        # print(f"{group}")
-                        # print(f"{group[['type', 'from', 'to', 'value', 'contractaddress']]}")
-                        # print(f"{group[['type', 'from', 'to', 'value']]}")
-                        # WARN: group processed
-                        # logger.debug(colored(f"++ SWAP NFT BY ETHER = {hash}", "magenta"))  # NOTE: checked
-                        action = "swap nft by ether"
-                        # Node
-                        # NOTE: The target of the NFT is a wallet
-                        node_address = group.iloc[-1]["to"]
-                        if (node_address not in nodes) and (node_address not in nodes_db):
-                            tag = tags_dict.get(node_address, [])  # Get tag
-                            label = labels_dict.get(node_address, [])  # Get label
-                            add_nodes(node_address, tag, label, contract=False)
-
-                        add_link(
-                            group.iloc[-1]["to"],
-                            group.iloc[-1]["from"],
-                            group.iloc[0]["symbol"],
-                            group.iloc[0]["name"],
-                            "",
-                            group.iloc[0]["valConv"],
-                            action,
-                            "incomplete - internal",
-                            node_create=True,
-                        )
-                        add_link(
-                            group.iloc[-1]["from"],
-                            group.iloc[-1]["to"],
-                            group.iloc[-1]["symbol"],
-                            group.iloc[-1]["name"],
-                            group.iloc[-1]["contractAddress"],
-                            group.iloc[-1]["valConv"],
-                            action,
-                            "incomplete - nft",
-                            node_create=True,
-                        )
-                        break
-
-                    elif (
-                        ((group["type"] == "multitoken").any())
-                        and len(group) == 2
-                        and (group.loc[group["type"] == "internals", "to"].values[0] == group.loc[group["type"] == "multitoken", "from"].values[0])
-                    ):  # 0xeec66c2570d78bee45bbb1e519a85a5e1cce4e948f5ead33eeddf0d3a4e43e8a
-                        # print(f"{group}")
-                        # print(f"{group[['type', 'from', 'to', 'value', 'contractaddress']]}")
-                        # print(f"{group[['type', 'from', 'to', 'value']]}")
-                        # WARN: group processed
-                        # WARN  TODO: Determine multitoken nft
-                        # print(f"DECIMAL {group.iloc[-1]['decimal']}")
-                        if group.iloc[-1]["decimal"] != 18:
-                            # logger.debug(colored(f"++ SWAP NFT BY ETHER = {hash}", "magenta"))  # NOTE: checked
-                            action = "swap nft by ether"
-                            # Node
-                            # NOTE: The target of the NFT is a wallet
-                            node_address = group.iloc[-1]["to"]
-                            if (node_address not in nodes) and (node_address not in nodes_db):
-                                tag = tags_dict.get(node_address, [])  # Get tag
-                                label = labels_dict.get(node_address, [])  # Get label
-                                add_nodes(node_address, tag, label, contract=False)
-
-                            add_link(
-                                group.iloc[-1]["to"],
-                                group.iloc[-1]["from"],
-                                group.iloc[0]["symbol"],
-                                group.iloc[0]["name"],
-                                "",
-                                group.iloc[0]["valConv"],
-                                action,
-                                "incomplete - internal",
-                                node_create=True,
-                            )
-                            add_link(
-                                group.iloc[-1]["from"],
-                                group.iloc[-1]["to"],
-                                group.iloc[-1]["symbol"],
-                                group.iloc[-1]["name"],
-                                group.iloc[-1]["contractAddress"],
-                                group.iloc[-1]["valConv"],
-                                action,
-                                "incomplete - multitoken",
-                                node_create=True,
-                            )
-                        else:
-                            logger.error(f"++ NOT DETECTED = INCOMPLETE = internal = multitoken = {hash}")
-                        break
-                    elif row["from"] == address_central:
-                        print(f"{group[['type', 'from', 'to', 'value']]}")
-                        logger.debug(colored(f"++ TRANSFER ETHER FROM WA = {hash}", "magenta"))
-                    elif row["to"] == address_central and len(group) == 1:
-                        # 0xf8a8423ec2343ec73f0e74bece8d080bb2ff2358172dfa1bcfef33eac175e402
-                        # logger.debug(colored(f"++ TRANSFER ETHER TO WA = {hash}", "magenta"))
-                        action = "transfer ether to wa"
-                        add_link(
-                            row["from"], row["to"], row["symbol"], row["name"], "", row["valConv"], action, "incomplete - internal", node_create=True
-                        )
-                    else:
-                        logger.error(f"++ NOT DETECTED = INCOMPLETE = {row['type']} ==================")
-                        logger.error(f"GROUP\n{group[['type', 'from', 'to', 'value', 'contractAddress']]}")
-                        break
-
-                # INFO: Transfers
-                elif row["type"] == "transfers":
-                    if row["from"] == address_central:
-                        # 0xe66315f2fe34aa1bfaa588f0d13ae451295e3eeaad8667ae29d6eb35020ee5c6
-                        # logger.debug(colored(f"++ TRANSFER TOKEN FROM WA = {hash}", 'magenta'))
-                        action = "transfer token from wa"
-
-                        # Node
-                        # TODO: Determine in always is a wallet
-                        node_address = row["to"]
-                        if (node_address not in nodes) and (node_address not in nodes_db):
-                            tag = tags_dict.get(node_address, [])  # Get tag
-                            label = labels_dict.get(node_address, [])  # Get label
-                            add_nodes(node_address, tag, label, contract=False)
-
-                        add_link(
-                            row["from"],
-                            row["to"],
-                            row["symbol"],
-                            row["name"],
-                            row["contractAddress"],
-                            row["valConv"],
-                            action,
-                            "incomplete - transfer",
-                            node_create=True,
-                        )
-
-                    elif row["to"] == address_central:
-                        # 0xa0546af5aa96775452ccb151399e3b27738e2f1912659516a75e36e5be0dc4c7
-                        # logger.debug(colored(f"++ TRANSFER TOKEN TO WA = {hash}", 'magenta'))
-                        action = "transfer token to wa"
-
-                        # Node
-                        # TODO: Determine in always is a wallet
-                        node_address = row["from"]
-                        if (node_address not in nodes) and (node_address not in nodes_db):
-                            tag = tags_dict.get(node_address, [])  # Get tag
-                            label = labels_dict.get(node_address, [])  # Get label
-                            add_nodes(node_address, tag, label, contract=False)
-
-                        add_link(
-                            row["from"],
-                            row["to"],
-                            row["symbol"],
-                            row["name"],
-                            row["contractAddress"],
-                            row["valConv"],
-                            action,
-                            "incomplete - transfer",
-                            node_create=True,
-                        )
-
-                    else:
-                        logger.error(f"++ NOT DETECTED = INCOMPLETE = transfer = {hash} ==============")
-                        logger.error(f"GROUP\n{group[['type', 'from', 'to', 'value', 'contractAddress']]}")
-                        break
-
-                # INFO: Nfts
-                elif row["type"] == "nfts":
-                    if (row["to"] == address_central) and (row["from"] == "0x0000000000000000000000000000000000000000"):
-                        # 0xfff4d346c753177912550b94746d7f4f6d82a46853de29fa111efdf13613a738
-                        # logger.debug(colored(f"++ MINT NFT = {hash} =========", 'magenta'))
-                        action = "mint nft"
-
-                        # WARN: Mint nft without source transaction shows the source node as nft contract instead 0x0000...
-                        add_link(
-                            row["contractAddress"],
-                            row["to"],
-                            row["symbol"],
-                            row["name"],
-                            row["contractAddress"],
-                            row["value"],
-                            action,
-                            "incomplete - nft",
-                            node_create=True,
-                        )
-
-                    elif (row["from"] == address_central) and (row["to"] == "0x0000000000000000000000000000000000000000"):
-                        logger.debug(colored(f"++ BURN NFT = {hash} =========", "magenta"))
-                        action = "burn nft"
-
-                        # WARN: Burn nft without source transaction shows the target node as nft contract instead 0x0000...
-                        add_link(
-                            row["from"],
-                            row["contractAddress"],
-                            row["symbol"],
-                            row["name"],
-                            row["contractAddress"],
-                            row["value"],
-                            action,
-                            "incomplete - nft",
-                            node_create=True,
-                        )
-
-                    elif row["from"] == address_central:
-                        # 0xf29085efbaf2ce00835a4a30a0f6e4b072247cba80d15b514b2766607d87e78a
-                        # logger.debug(colored(f"++ TRANSFER NFT FROM WA = {hash} =========", 'magenta'))
-                        action = "transfer nft from wa"
-
-                        # TODO: Verify that source node always be a wallet
-                        node_address = row["to"]
-                        if (node_address not in nodes) and (node_address not in nodes_db):
-                            tag = tags_dict.get(node_address, [])  # Get tag
-                            label = labels_dict.get(node_address, [])  # Get label
-                            add_nodes(node_address, tag, label, contract=False)
-
-                        add_link(
-                            row["from"],
-                            row["to"],
-                            row["symbol"],
-                            row["name"],
-                            row["contractAddress"],
-                            row["value"],
-                            action,
-                            "incomplete - nft",
-                            node_create=True,
-                        )
-
-                    elif row["to"] == address_central:
-                        # 0xfe59b6be7da4e8f8c1e8e61bc5c6d9b60e73c217135c7ad4891c6749223abc1b
-                        # logger.debug(colored(f"++ TRANSFER NFT TO WA = {hash} =========", 'magenta'))
-                        action = "transfer nft to wa"
-
-                        # TODO: Verify that source node always be a wallet
-                        node_address = row["from"]
-                        if (node_address not in nodes) and (node_address not in nodes_db):
-                            tag = tags_dict.get(node_address, [])  # Get tag
-                            label = labels_dict.get(node_address, [])  # Get label
-                            add_nodes(node_address, tag, label, contract=False)
-
-                        add_link(
-                            row["from"],
-                            row["to"],
-                            row["symbol"],
-                            row["name"],
-                            row["contractAddress"],
-                            row["value"],
-                            action,
-                            "incomplete - nft",
-                            node_create=True,
-                        )
-
-                    else:
-                        logger.error(f"++ NOT DETECTED = INCOMPLETE = {row['type']} = {hash} =====")
-                        logger.error(f"GROUP\n{group[['type', 'from', 'to', 'value', 'contractAddress']]}")
-                        break
-
-                # INFO: Multitoken
-                elif row["type"] == "multitoken":
-                    if (row["from"] == address_central) and (row["decimal"] <= 2) and (row["to"] == "0x0000000000000000000000000000000000000000"):
-                        logger.info(colored(f"++ MULTITOKEN BURN NFT = {hash} =====", "magenta"))
-                        action = "burn nft"
-
-                        # WARN: Burn nft without source transaction shows the target node as nft contract instead 0x0000...
-                        add_link(
-                            row["from"],
-                            row["contractAddress"],
-                            row["symbol"],
-                            row["name"],
-                            row["contractAddress"],
-                            row["value"],
-                            action,
-                            "incomplete - multitoken",
-                            node_create=True,
-                        )
-
-                    elif (row["to"] == address_central) and (row["decimal"] <= 2) and (row["from"] == "0x0000000000000000000000000000000000000000"):
-                        # 0xfe3766f76a45f1ad86ed6185f19640a947e52b178a90973ab7a0fe5255db09eb
-                        # logger.info(colored(f"++ MULTITOKEN MINT NFT = {hash} =====", 'magenta'))
-                        action = "mint nft"
-
-                        # WARN: Mint nft without source transaction shows the source node as nft contract instead 0x0000...
-                        add_link(
-                            row["contractAddress"],
-                            row["to"],
-                            row["symbol"],
-                            row["name"],
-                            row["contractAddress"],
-                            row["value"],
-                            action,
-                            "incomplete - multitoken",
-                            node_create=True,
-                        )
-
-                    elif (row["from"] == address_central) and (row["decimal"] != 18):
-                        # 0xdc750957ecefc6940acbeea777eafbd5cdaaeac2a9eae5a65a232581151a73d3
-                        # logger.info(colored(f"++ MULTITOKEN TRANSFER NFT FROM WA = {hash} =====", 'magenta'))
-                        action = "transfer nft from wa"
-
-                        # TODO: Verify that source node always be a wallet
-                        node_address = row["to"]
-                        if (node_address not in nodes) and (node_address not in nodes_db):
-                            tag = tags_dict.get(node_address, [])  # Get tag
-                            label = labels_dict.get(node_address, [])  # Get label
-                            add_nodes(node_address, tag, label, contract=False)
-
-                        add_link(
-                            row["from"],
-                            row["to"],
-                            row["symbol"],
-                            row["name"],
-                            row["contractAddress"],
-                            row["valConv"],
-                            action,
-                            "incomplete - multitoken",
-                            node_create=True,
-                        )
-
-                    elif (row["to"] == address_central) and (row["decimal"] != 18):
-                        # 0xfdfb8c4491abdd4176e82874f1c8718f961af65d06e405be76b3fb67fd4b677b
-                        # logger.info(colored(f"++ MULTITOKEN TRANSFER NFT TO WA = {hash} =====", 'magenta'))
-                        action = "transfer nft to wa"
-
-                        # TODO: Verify that source node always be a wallet
-                        node_address = row["from"]
-                        if (node_address not in nodes) and (node_address not in nodes_db):
-                            tag = tags_dict.get(node_address, [])  # Get tag
-                            label = labels_dict.get(node_address, [])  # Get label
-                            add_nodes(node_address, tag, label, contract=False)
-
-                        add_link(
-                            row["from"],
-                            row["to"],
-                            row["symbol"],
-                            row["name"],
-                            row["contractAddress"],
-                            row["valConv"],
-                            action,
-                            "incomplete - multitoken",
-                            node_create=True,
-                        )
-
-                    else:
-                        logger.error(f"++ NOT DETECTED = INCOMPLETE = {row['type']} = {hash} =====")
-                        logger.error(f"GROUP\n{group[['type', 'from', 'to', 'value', 'contractAddress']]}")
-                        break
-                else:
-                    logger.error(f"++ NOT DETECTED = INCOMPLETE = {row['type']} = {hash} =====")
-                    logger.error(f"GROUP\n{group[['type', 'from', 'to', 'value', 'contractAddress']]}")
-                    break
-
+    labels_dict = labels.Lookup(conn, "ethereum")
+
+    # INFO: Get all Trx, Transfers, internals, nfts and multitoken of the hashes to classify (see db_pending_hashes),
+    #       every movement stored of them from t_movements
+    df_all = db_movements(conn, address_central, hashes)
+    counts = df_all["hash"].value_counts()
+
+    # NOTE: Nodes in db, looked up by id for the addresses of the movements only. They keep the type they got
+    #       when they were created
+    addresses = pd.unique(pd.concat([df_all["from"], df_all["to"], df_all["contractAddress"]]).dropna())
+    nodes_db = db_select_in(conn, "SELECT id FROM t_nodes_classification WHERE id IN ({placeholders})", addresses)
+
+    df_all, stat_err = prepare_movements(df_all)
+
+    workers = params["config"].get("classify_workers", 1) if params else 1
+
+    # INFO: Hashes classified before with movements collected later are classified again with every movement,
+    #       the links of the movements classified before are taken out first
+    classified = {hash: count for hash, count in hashes.items() if count > 0}
+    df_old, stat_err_old = prepare_movements(db_movements(conn, address_central, list(classified), classified))
+    if len(df_old) > 0:
+        logger.info(f"Classifying again {len(classified)} hashes with new movements")
+        graph_old = classify.classify(df_old, address_central, set(addresses), workers)
+        db_remove_links(conn, graph_old.links)
+
+    # INFO: Classification in bulk (see core/classify.py), nodes with their tags and labels
+    graph = classify.classify(df_all, address_central, nodes_db, workers)
+    classify.report(graph)
+
+    for node_address, contract in graph.nodes.items():
+        tag = list(tags_dict.get(node_address, []))  # Get tag
+        label = labels_dict.get(node_address, [])  # Get label
+        if contract:
+            tag.append("contract")
+            stat_con += 1
         else:
-            logger.error("== NOT CLASSIFIED ================================")
-            logger.error("== NOT CLASSIFIED ================================")
-            logger.error(f"GROUP: \n{group}")
-            logger.error("== NOT CLASSIFIED ================================")
-            logger.error("== NOT CLASSIFIED ================================")
-            raise Exception("== NOT CLASSIFIED ================================")
+            tag.append("wallet")
+            stat_wal += 1
+        nodes[node_address] = {"id": node_address, "address": node_address, "tag": tag, "label": label}
+    links = graph.links
+
+    # INFO: Nodes in db join the tags they got later (funders found by a refresh)
+    for node_address in (nodes_db & set(tags_dict)) - set(nodes):
+        label = labels_dict.get(node_address, [])
+        nodes[node_address] = {"id": node_address, "address": node_address, "tag": list(tags_dict[node_address]), "label": label}
 
     toc = time.perf_counter()
     logger.info(f"Time to classification {toc - tic:0.4f} seconds")
@@ -3387,23 +2064,40 @@ def store_nodes_links_db(conn, address_central, params=[], df_trx=[], df_int=[],
     # links_list = list(links.values())
     nodes_list = list(nodes.values())
     links_list = list(links.values())
+    for link in links_list:
+        link["sum_exact"] = str(wei.to_decimal(*link["sum_exact"])) if link["sum_exact"] is not None else None
     # df_nodes = pd.DataFrame(nodes_list)
     # df_nodes['tag'] = df_nodes['tag'].apply(lambda x: json.dumps(x))
     # df_nodes['label'] = df_nodes['label'].apply(lambda x: json.dumps(x))
     # df_links = pd.DataFrame(links_list)
     # df_links['detail'] = df_links['detail'].apply(lambda x: json.dumps(x))
-    df_nodes = pd.DataFrame(nodes_list)
-    df_nodes["tag"] = df_nodes["tag"].apply(lambda x: json.dumps(x))
-    df_nodes["label"] = df_nodes["label"].apply(lambda x: json.dumps(x))
-    df_links = pd.DataFrame(links_list)
-    # print(df_links.info())
-    # print(df_links.head())
-    df_links["action"] = df_links["action"].apply(lambda x: json.dumps(x))
-
-    # df_nodes.to_sql('t_nodes_classification', conn, if_exists='append', index=False, method=insert_with_ignore)
-    # df_links.to_sql('t_links_classification', conn, if_exists='append', index=False, method=insert_with_ignore)
-    df_links.to_sql("t_links_classification", conn, if_exists="append", index=False, method=insert_with_ignore)
-    df_nodes.to_sql("t_nodes_classification", conn, if_exists="append", index=False, method=insert_with_ignore)
+    # INFO: UPSERT by id and link_key. Nodes already in db join the new tags, links already in db
+    #       (refresh or path) accumulate count and sum and join the new actions
+    if nodes_list:
+        df_nodes = pd.DataFrame(nodes_list)
+        df_nodes["tag"] = df_nodes["tag"].apply(lambda x: json.dumps(x))
+        df_nodes["label"] = df_nodes["label"].apply(lambda x: json.dumps(x))
+        db.upsert(conn, "t_nodes_classification", df_nodes, "id", {"tag": db.json_union("t_nodes_classification", "tag")})
+    if links_list:
+        df_links = pd.DataFrame(links_list)
+        # print(df_links.info())
+        # print(df_links.head())
+        df_links["sum"] = df_links["sum"].astype(float)
+        df_links["action"] = df_links["action"].apply(lambda x: json.dumps(x))
+        db.upsert(
+            conn,
+            "t_links_classification",
+            df_links,
+            "link_key",
+            {
+                "count": "count + excluded.count",
+                "sum": "sum + excluded.sum",
+                "sum_exact": "wei_add(sum_exact, excluded.sum_exact)",
+                "action": db.json_union("t_links_classification", "action"),
+            },
+        )
+
+    db_store_hashes(conn, address_central, counts)
 
     # INFO: Generate stat table
     query = """
@@ -3415,7 +2109,8 @@ def store_nodes_links_db(conn, address_central, params=[], df_trx=[], df_int=[],
         initialize = pd.Series([0] * 10, index=df_stats.columns)
         df_stats.loc[0] = initialize
 
-    type_counts = df_all["type"].value_counts()
+    type_counts = df_all["type"].value_counts().subtract(df_old["type"].value_counts(), fill_value=0).astype(int)
+    stat_err = stat_err - stat_err_old
     stat_trx = type_counts.get("transaction", 0)
     stat_int = type_counts.get("internals", 0)
     stat_tra = type_counts.get("transfers", 0)
@@ -3510,6 +2205,7 @@ def get_nodes_links_bd(conn, address_central, params=[]):
             "symbol": link["name"],
             "count": link["count"],
             "sum": link["sum"],
+            "sum_exact": link.get("sum_exact"),
             "action": link["action"],
             "type": link["type"],
         }
@@ -3541,32 +2237,18 @@ def get_nodes_links_bd(conn, address_central, params=[]):
     # TODO: Query stats
 
     # INFO: Get all Trx, Transfers, internals, nfts and multitoken
-    query = """
-        SELECT blockChain, type, hash, `from`, `to`, value, contractAddress, symbol, name, decimal, valConv, timeStamp, isError, methodId, functionName
-        FROM (
-            SELECT blockChain, 'transaction' as 'type', hash, `from`, `to`, value, contractAddress, 'ETH' as 'symbol', 
-			'Ether' as 'name', 18 as 'decimal', value / POWER(10, 18) as valConv, timeStamp, isError, methodId, functionName
-            FROM t_transactions
-            UNION ALL
-            SELECT blockChain, 'internals', hash, `from`, `to`, value, 
-                contractAddress, 'ETH', 'Ether', 18, value / POWER(10, 18), timeStamp, isError, '0x', ''
-            FROM t_internals
-            UNION ALL
-            SELECT blockChain, 'transfers', hash, `from`, `to`, value,
-                contractAddress, tokenSymbol, tokenName, tokenDecimal, value / POWER(10, tokenDecimal), timeStamp, 0, '0x', ''
-            FROM t_transfers
-            UNION ALL
-            SELECT blockChain, 'nfts', hash, `from`, `to`, tokenID,
-                contractAddress, tokenSymbol, tokenName, tokenDecimal, tokenID, timeStamp, 0, '0x', ''
-            FROM t_nfts
-            UNION ALL
-            SELECT blockChain, 'multitoken', hash, `from`, `to`, tokenID,
-                contractAddress, tokenSymbol, tokenName, tokenValue, tokenID, timeStamp, 0, '0x', ''
-            FROM t_multitoken
-        ) AS combined
-        ORDER BY timeStamp ASC
+    central_id = movements.address_id(conn, address_central)
+    query = f"""
+        SELECT {movements.SELECT}, m.methodId, m.functionName
+        FROM {movements.DECODE}
+        WHERE m.from_id = ? OR m.to_id = ?
+        ORDER BY m.timeStamp ASC
     """
-    df_all = pd.read_sql_query(query, conn)
+    if columnar.enabled:
+        # INFO: Column-wise scan of the Parquet store, only the movements of the central address are listed
+        df_all = columnar.movements(("ETH", "Ether"), address=address_central)
+    else:
+        df_all = pd.read_sql_query(query, conn, params=(central_id, central_id))
 
     # INFO: Convert to datetime
     df_all["timeStamp"] = pd.to_datetime(df_all["timeStamp"], unit="s")
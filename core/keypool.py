@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+__author__ = "KennBro"
+__copyright__ = "Copyright 2024, Personal Research"
+__credits__ = ["KennBro"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "KennBro"
+__email__ = "kennbro <at> protonmail <dot> com"
+__status__ = "Development"
+
+import time
+import logging
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+COOLDOWN_RATE_LIMIT = 1  # INFO: Seconds out of the pool after a rate limit NOTOK
+COOLDOWN_INVALID = 3600  # INFO: Seconds out of the pool after an invalid key NOTOK
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def as_list(keys):
+    # INFO: ethscan and bscscan in config.yaml can be a key or a list of keys
+    if isinstance(keys, (list, tuple)):
+        return [str(key) for key in keys]
+    return [str(keys)]
+
+
+def unconfigured(keys):
+    return all(key in ("", "XXX") for key in as_list(keys))
+
+
+def mask(key):
+    return f"{key[:4]}...{key[-4:]}" if len(key) > 8 else "****"
+
+
+class KeyPool:
+    def __init__(self, keys):
+        self.keys = keys
+        self.index = 0
+        self.cooldown = {key: 0.0 for key in keys}
+        self.usage = {key: {"calls": 0, "rate_limited": 0, "invalid": 0, "errors": 0} for key in keys}
+        self.lock = threading.Lock()
+
+    def next(self):
+        # INFO: Round robin over the keys out of cooldown. When every key is cooling down the
+        #       caller waits for the first one to come back
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                for _ in range(len(self.keys)):
+                    key = self.keys[self.index]
+                    self.index = (self.index + 1) % len(self.keys)
+                    if self.cooldown[key] <= now:
+                        self.usage[key]["calls"] += 1
+                        return key
+                wait = min(self.cooldown.values()) - now
+                # WARN: Every key is invalid, the call goes on and the caller gets the NOTOK
+                if wait > COOLDOWN_RATE_LIMIT:
+                    key = min(self.keys, key=lambda k: self.cooldown[k])
+                    self.usage[key]["calls"] += 1
+                    return key
+            time.sleep(max(wait, 0))
+
+    def available(self):
+        now = time.monotonic()
+        with self.lock:
+            return sum(1 for key in self.keys if self.cooldown[key] <= now)
+
+    def report(self, key, outcome):
+        # INFO: outcome is rate_limited, invalid or errors
+        seconds = {"rate_limited": COOLDOWN_RATE_LIMIT, "invalid": COOLDOWN_INVALID}.get(outcome, 0)
+        with self.lock:
+            self.usage[key][outcome] += 1
+            self.cooldown[key] = max(self.cooldown[key], time.monotonic() + seconds)
+        if seconds > 0:
+            logger.warning(f"Key {mask(key)} {outcome}, cooldown {seconds} seconds")
+
+
+def get_pool(keys):
+    keys = as_list(keys)
+    with pools_lock:
+        pool = pools.get(tuple(keys))
+        if pool is None:
+            pool = pools[tuple(keys)] = KeyPool(keys)
+        return pool
+
+
+def usage():
+    # INFO: Counters by (masked) key, safe to expose
+    with pools_lock:
+        current = list(pools.values())
+
+    now = time.monotonic()
+    data = []
+    for pool in current:
+        with pool.lock:
+            for key in pool.keys:
+                data.append({"key": mask(key), "cooldown": round(max(pool.cooldown[key] - now, 0), 2), **pool.usage[key]})
+    return data
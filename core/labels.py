@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+__author__ = "KennBro"
+__copyright__ = "Copyright 2024, Personal Research"
+__credits__ = ["KennBro"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "KennBro"
+__email__ = "kennbro <at> protonmail <dot> com"
+__status__ = "Development"
+
+import os
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+
+# INFO: Etherscan and bscscan labels live in their own db (labels_db in config.yaml), built once from the
+#       JSON files and attached read-only to every connection as labels. t_labels of the investigation
+#       keeps only the internal labels (contracts found while collecting)
+LABELS_DB = "data/labels.db"
+SOURCES = [
+    ("data/etherscanCombinedAllLabels.json", "ethereum", "etherscan_label"),
+    ("data/bscscanCombinedAllLabels.json", "binance", "bscscan_label"),
+]
+COLUMNS = ["blockChain", "source", "address", "name", "labels"]
+TABLES = ("main.t_labels", "labels.t_labels")
+
+build_lock = threading.Lock()
+
+
+def path(config):
+    return config.get("labels_db", LABELS_DB)
+
+
+def build(db_path):
+    # INFO: Built again only when a JSON file is newer than the db
+    sources = [source for source in SOURCES if os.path.exists(source[0])]
+    with build_lock:
+        if os.path.exists(db_path) and all(os.path.getmtime(db_path) >= os.path.getmtime(file) for file, _, _ in sources):
+            return False
+
+        logger.info(f"Building label db {db_path}")
+        tmp_path = f"{db_path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        conn = sqlite3.connect(tmp_path)
+        conn.execute("""CREATE TABLE t_labels (
+                            blockChain text NOT NULL,
+                            source text NOT NULL,
+                            address text NOT NULL,
+                            name text NOT NULL,
+                            labels text NOT NULL
+                        );""")
+        for file, blockchain, source in sources:
+            with open(file, "r") as json_file:
+                data = json.load(json_file)
+            rows = ((blockchain, source, address, info["name"], json.dumps(info["labels"])) for address, info in data.items())
+            conn.executemany("INSERT INTO t_labels (blockChain, source, address, name, labels) VALUES (?, ?, ?, ?, ?)", rows)
+        conn.execute("CREATE INDEX idx_labels_address ON t_labels (address, blockChain)")
+        conn.commit()
+        conn.close()
+
+        # NOTE: Replaced at once, connections never attach a half built db
+        os.replace(tmp_path, db_path)
+        return True
+
+
+def attach(conn, config):
+    db_path = path(config)
+    build(db_path)
+    conn.execute("ATTACH DATABASE ? AS labels", (Path(db_path).resolve().as_uri() + "?mode=ro",))
+
+
+def find(conn, address, blockchain=None):
+    # INFO: Labels of an address, the internal ones and the prebuilt ones (indexed lookups)
+    condition = "address = ?" if blockchain is None else "address = ? AND blockChain = ?"
+    params = (address,) if blockchain is None else (address, blockchain)
+
+    rows = []
+    for table in TABLES:
+        rows += conn.execute(f"SELECT {', '.join(COLUMNS)} FROM {table} WHERE {condition}", params).fetchall()
+    return [dict(zip(COLUMNS, row)) for row in rows]
+
+
+class Lookup:
+    # INFO: Labels by address loaded on demand, get(address, default) as the dict of the whole table had it
+    def __init__(self, conn, blockchain):
+        self.conn = conn
+        self.blockchain = blockchain
+        self.cache = {}
+
+    def get(self, address, default=None):
+        if address not in self.cache:
+            rows = find(self.conn, address, self.blockchain)
+            if rows:
+                label = rows[-1]
+                del label["address"]
+                self.cache[address] = label
+            else:
+                self.cache[address] = None
+        label = self.cache[address]
+        return default if label is None else label
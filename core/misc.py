@@ -15,7 +15,6 @@ import os
 import time
 import json
 import logging
-import sqlite3
 import traceback
 import pandas as pd
 
@@ -25,6 +24,10 @@ import coloredlogs, logging
 # from core.eth import get_trx_from_addresses_opt, get_funders_creators, get_balance_and_gas, get_tags_labels
 from core import eth
 from core import bsc
+from core import db
+from core import api
+from core import keypool
+from core import movements
 
 logger = logging.getLogger(__name__)
 # logger.setLevel(logging.DEBUG)
@@ -39,8 +42,11 @@ def event_stream_checking(config):
     log_format = '%(asctime)s %(name)s %(lineno)d %(levelname)s %(message)s'
     coloredlogs.install(level=config['level'], fmt=log_format, logger=logger)
 
+    # INFO: Session, timeouts and rate limit shared by every call to the explorer
+    api.configure(config)
+
     if (config['action'] == "reset"):
-        os.remove(config['dbname'])
+        db.remove(config)
 
     # if (config['filters']):
     #     filters = config['filters']
@@ -61,7 +67,7 @@ def event_stream_checking(config):
         data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
         yield f"data:{data}\n\n"
 
-        connection = sqlite3.connect(config['dbname'])
+        connection = db.connect(config)
         cursor = connection.cursor()
         key = config['ethscan']
 
@@ -71,7 +77,7 @@ def event_stream_checking(config):
         yield f"data:{data}\n\n"
 
         # WARN: This isn't the best check
-        if (config['ethscan'] == '') or (config['ethscan'] == 'XXX'):
+        if keypool.unconfigured(config['ethscan']):
             message = f"<strong>Etherscan.io api key possibly unconfigured</strong>"
             logger.error(message.replace('<strong>', '').replace('</strong>', ''))
             data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
@@ -117,7 +123,7 @@ def event_stream_checking(config):
                                                transactionIndex integer NOT NULL,
                                                `from` text NOT NULL,
                                                `to` text NOT NULL,
-                                               value integer NOT NULL,
+                                               value text NOT NULL,
                                                gas integer NOT NULL,
                                                gasPrice integer NOT NULL,
                                                isError integer NOT NULL,
@@ -147,7 +153,7 @@ def event_stream_checking(config):
                                             `from` text NOT NULL,
                                             contractAddress text NOT NULL,
                                             `to` text NOT NULL,
-                                            value integer NOT NULL,
+                                            value text NOT NULL,
                                             tokenName text NOT NULL,
                                             tokenSymbol text NOT NULL,
                                             tokenDecimal integer NOT NULL,
@@ -175,7 +181,7 @@ def event_stream_checking(config):
                                             hash text NOT NULL,
                                             `from` text NOT NULL,
                                             `to` text NOT NULL,
-                                            value integer NOT NULL,
+                                            value text NOT NULL,
                                             contractAddress text NOT NULL,
                                             input text NOT NULL,
                                             type text NOT NULL,
@@ -242,7 +248,7 @@ def event_stream_checking(config):
                                      `from` text NOT NULL,
                                      `to` text NOT NULL,
                                      tokenID text NOT NULL,
-                                     tokenValue integer NOT NULL,
+                                     tokenValue text NOT NULL,
                                      tokenName text NOT NULL,
                                      tokenSymbol text NOT NULL,
                                      confirmations integer NOT NULL,
@@ -364,7 +370,7 @@ def event_stream_checking(config):
                                            hash text NOT NULL,
                                            `from` text NOT NULL,
                                            `to` text NOT NULL,
-                                           value integer NOT NULL,
+                                           value text NOT NULL,
                                            input text NOT NULL,
                                            contractAddress text NOT NULL,
                                            tokenDecimal integer NOT NULL,
@@ -412,8 +418,10 @@ def event_stream_checking(config):
                                            contract TEXT NOT NULL,
                                            count INTEGER NOT NULL,
                                            sum REAL NOT NULL,
+                                           sum_exact TEXT,
                                            action TEXT NOT NULL,
-                                           type TEXT NOT NULL
+                                           type TEXT NOT NULL,
+                                           UNIQUE(link_key)
                                         );"""
             cursor.execute(sql_create_links_c_table)
 
@@ -448,55 +456,61 @@ def event_stream_checking(config):
                                        );"""
             cursor.execute(sql_create_labels_table)
 
-            # Load JSON etherscan
-            message = "Loading Table t_labels with etherscan labels"
-            logger.info(f"{message}")
+            # INFO: The etherscan and bscscan labels are not loaded here anymore, they are in the label db
+            #       attached to every connection (labels_db in config.yaml, see core/labels.py)
+
+            end_time = time.time()
+            elapsed_time = end_time - start_time
+
+            message = f"End of tables creation in <strong>{elapsed_time} s</strong>"
+            logger.error(message.replace('<strong>', '').replace('</strong>', ''))
             data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
             yield f"data:{data}\n\n"
-            with open('data/etherscanCombinedAllLabels.json', 'r') as file:
-                etherscan = json.load(file)
-            
-            rows = []
-            for address, info in etherscan.items():
-                row = {'blockChain': 'ethereum',
-                       'source': 'etherscan_label', 
-                       'address': address, 
-                       'name': info['name'], 
-                       'labels': info['labels']}
-                rows.append(row)
-
-            df_labels = pd.DataFrame(rows)
-            df_labels['labels'] = df_labels['labels'].apply(json.dumps)
-
-            df_labels.to_sql('t_labels', connection, if_exists='replace', index=False)
-
-            # Load JSON bscscan
-            message = "Loading Table t_labels with bscscan labels"
-            logger.info(f"{message}")
+
+        # INFO: Unified movements and dictionaries, built at ingest (dbs created before them are filled from the movement tables)
+        tic = time.perf_counter()
+        movements.migrate(connection)
+        filled = movements.backfill(connection)
+        if (filled > 0):
+            toc = time.perf_counter()
+            message = f"Filled t_movements with {filled} movements in <strong>{toc - tic:0.4f} s</strong>"
+            logger.info(message.replace('<strong>', '').replace('</strong>', ''))
             data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
             yield f"data:{data}\n\n"
-            with open('data/bscscanCombinedAllLabels.json', 'r') as file:
-                bscscan = json.load(file)
-            
-            rows = []
-            for address, info in bscscan.items():
-                row = {'blockChain': 'binance',
-                       'source': 'bscscan_label', 
-                       'address': address, 
-                       'name': info['name'], 
-                       'labels': info['labels']}
-                rows.append(row)
-
-            df_labels = pd.DataFrame(rows)
-            df_labels['labels'] = df_labels['labels'].apply(json.dumps)
 
-            df_labels.to_sql('t_labels', connection, if_exists='append', index=False)
+        # INFO: Links keyed by link_key (dbs created before it get their repeated links merged)
+        merged = db.ensure_unique_links(connection)
+        if (merged > 0):
+            message = f"Merged {merged} repeated links"
+            logger.info(message)
+            data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
+            yield f"data:{data}\n\n"
 
-            end_time = time.time()
-            elapsed_time = end_time - start_time
+        # INFO: Hashes in the graph by central address (dbs created before it skip the ones classified from now on)
+        db.ensure_hashes(connection)
+
+        # INFO: Checkpoints of the explorer pages by address (dbs created before it start from their stored blocks)
+        connection.execute(db.SQL_CREATE_FETCH_PROGRESS)
+        connection.commit()
+
+        # INFO: Dbs created before the label db have the etherscan and bscscan labels copied, only the
+        #       internal ones stay
+        if (len(db.table_columns(connection, "t_labels")) > 0):
+            with connection:
+                removed = connection.execute("DELETE FROM t_labels WHERE source != 'internal_label'").rowcount
+            if (removed > 0):
+                message = f"Removed {removed} labels now in the label db"
+                logger.info(message)
+                data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
+                yield f"data:{data}\n\n"
 
-            message = f"End of tables creation in <strong>{elapsed_time} s</strong>"
-            logger.error(message.replace('<strong>', '').replace('</strong>', ''))
+        # INFO: Indexes for per-address lookups (dbs created before them are migrated here)
+        tic = time.perf_counter()
+        created = db.ensure_indexes(connection)
+        if (created > 0):
+            toc = time.perf_counter()
+            message = f"Created {created} indexes in <strong>{toc - tic:0.4f} s</strong>"
+            logger.info(message.replace('<strong>', '').replace('</strong>', ''))
             data = json.dumps({"msg": f"{message}", "end": False, "error": False, "content": {}})
             yield f"data:{data}\n\n"
 
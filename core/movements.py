@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+__author__ = "KennBro"
+__copyright__ = "Copyright 2024, Personal Research"
+__credits__ = ["KennBro"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "KennBro"
+__email__ = "kennbro <at> protonmail <dot> com"
+__status__ = "Development"
+
+import numpy as np  # pyright: ignore
+import pandas as pd  # pyright: ignore
+
+from core import db
+from core import wei
+
+
+# INFO: t_movements is the union of the movement tables built at ingest (see db.insert_ignore), one
+#       row by movement with typed columns, so readers do not rebuild the UNION ALL on every request.
+#       Addresses and tokens are dictionary encoded (t_addresses, t_tokens), the readers join them
+#       back to hex and symbols (DECODE). t_ledger keeps the balance and gas of every address by
+#       token, maintained by a trigger on the movements actually inserted
+TRANSACTION, INTERNALS, TRANSFERS, NFTS, MULTITOKEN = range(5)
+TYPES = ("transaction", "internals", "transfers", "nfts", "multitoken")
+TABLES = {
+    "t_transactions": TRANSACTION,
+    "t_internals": INTERNALS,
+    "t_transfers": TRANSFERS,
+    "t_nfts": NFTS,
+    "t_multitoken": MULTITOKEN,
+}
+AMOUNTS = (TRANSACTION, INTERNALS, TRANSFERS)  # INFO: Types with value in units of the token (wei)
+NATIVE = {"eth": ("ETH", "Ether"), "bsc": ("BNB", "BNB")}
+TOKEN_COLUMNS = ["blockChain", "contractAddress", "symbol", "name", "decimal"]
+CHUNK = 500  # INFO: Host parameters by lookup
+
+COLUMNS = ["blockChain", "type", "blockNumber", "timeStamp", "hash", "from_id", "to_id", "contract_id", "token_id",
+           "value", "valConv", "tokenValue", "gas", "isError", "methodId", "functionName"]
+
+SQL_CREATE = [
+    """CREATE TABLE IF NOT EXISTS t_addresses (
+           id integer PRIMARY KEY,
+           address text NOT NULL UNIQUE
+       );""",
+    """CREATE TABLE IF NOT EXISTS t_tokens (
+           id integer PRIMARY KEY,
+           blockChain text NOT NULL,
+           contractAddress text NOT NULL,
+           symbol text NOT NULL,
+           name text NOT NULL,
+           decimal integer NOT NULL,
+           UNIQUE(blockChain, contractAddress, symbol, name, decimal)
+       );""",
+    """CREATE TABLE IF NOT EXISTS t_movements (
+           blockChain text NOT NULL,
+           type integer NOT NULL,
+           blockNumber integer NOT NULL,
+           timeStamp integer NOT NULL,
+           hash text NOT NULL,
+           from_id integer NOT NULL,
+           to_id integer NOT NULL,
+           contract_id integer NOT NULL,
+           token_id integer NOT NULL,
+           value text NOT NULL,
+           valConv REAL,
+           tokenValue text,
+           gas text,
+           isError integer NOT NULL,
+           methodId text NOT NULL,
+           functionName text NOT NULL,
+           UNIQUE(blockChain, type, blockNumber, hash, from_id, to_id, value)
+       );""",
+    """CREATE TABLE IF NOT EXISTS t_ledger (
+           address_id integer NOT NULL,
+           token_id integer NOT NULL,
+           inflow text NOT NULL DEFAULT '0',
+           outflow text NOT NULL DEFAULT '0',
+           gas text NOT NULL DEFAULT '0',
+           count integer NOT NULL DEFAULT 0,
+           UNIQUE(address_id, token_id)
+       );""",
+    # NOTE: As the balance query had it, a movement to itself is an outflow only. Gas is the one of the
+    #       transactions without error sent by the address (wei, exact with wei_add)
+    f"""CREATE TRIGGER IF NOT EXISTS tr_movements_ledger AFTER INSERT ON t_movements
+        WHEN NEW.type IN ({TRANSACTION}, {INTERNALS}, {TRANSFERS}) AND NEW.isError = 0
+        BEGIN
+            INSERT INTO t_ledger (address_id, token_id, outflow, gas, count)
+            VALUES (NEW.from_id, NEW.token_id, NEW.value, IFNULL(NEW.gas, '0'), 1)
+            ON CONFLICT (address_id, token_id) DO UPDATE
+            SET outflow = wei_add(outflow, excluded.outflow), gas = wei_add(gas, excluded.gas), count = count + 1;
+
+            INSERT INTO t_ledger (address_id, token_id, inflow, count)
+            SELECT NEW.to_id, NEW.token_id, NEW.value, 1 WHERE NEW.to_id != NEW.from_id
+            ON CONFLICT (address_id, token_id) DO UPDATE
+            SET inflow = wei_add(inflow, excluded.inflow), count = count + 1;
+        END;""",
+]
+
+# INFO: SQL of the readers, the columns as the old UNION ALL had them (valConv of nfts and
+#       multitoken is the tokenID, decimal of multitoken is the tokenValue)
+DECODE = """t_movements AS m
+            JOIN t_addresses AS af ON af.id = m.from_id
+            JOIN t_addresses AS at ON at.id = m.to_id
+            JOIN t_addresses AS ac ON ac.id = m.contract_id
+            JOIN t_tokens AS tk ON tk.id = m.token_id"""
+TYPE_NAME = "CASE m.type " + " ".join(f"WHEN {i} THEN '{name}'" for i, name in enumerate(TYPES)) + " END"
+SELECT = f"""m.blockChain, {TYPE_NAME} AS type, m.hash, af.address AS `from`, at.address AS `to`, m.value,
+             ac.address AS contractAddress, tk.symbol, tk.name, IFNULL(m.tokenValue, tk.decimal) AS decimal,
+             IFNULL(m.valConv, m.value) AS valConv, m.timeStamp, m.isError"""
+
+
+# INFO: Columns of the union of the collected frames (see union)
+UNION = ["blockChain", "type", "hash", "from", "to", "value", "contractAddress", "symbol", "name", "decimal", "valConv",
+         "timeStamp", "isError", "methodId", "functionName"]
+
+
+def address_id(conn, address):
+    # INFO: id of an address (None if it is not in the dictionary), a bound parameter of the readers
+    row = conn.execute("SELECT id FROM t_addresses WHERE address = ?", (address,)).fetchone()
+    return row[0] if row else None
+
+
+def migrate(conn):
+    # INFO: A t_movements of a previous version (addresses as text, without gas) is built again,
+    #       with its ledger (see backfill)
+    columns = db.table_columns(conn, "t_movements")
+    if (len(columns) > 0) and (set(COLUMNS) - set(columns)):
+        conn.execute("DROP TABLE t_movements")
+        conn.execute("DROP TABLE IF EXISTS t_ledger")
+    for sql in SQL_CREATE:
+        conn.execute(sql)
+    conn.commit()
+
+
+def address_ids(conn, values):
+    # INFO: ids of the addresses (Series), the new ones are added to the dictionary
+    values = values.fillna("").astype(str)
+    unique = list(pd.unique(values))
+    conn.executemany("INSERT INTO t_addresses (address) VALUES (?) ON CONFLICT DO NOTHING", ((address,) for address in unique))
+
+    ids = {}
+    for i in range(0, len(unique), CHUNK):
+        chunk = unique[i:i + CHUNK]
+        placeholders = ",".join(["?"] * len(chunk))
+        ids.update(conn.execute(f"SELECT address, id FROM t_addresses WHERE address IN ({placeholders})", chunk).fetchall())
+
+    return values.map(ids)
+
+
+def token_ids(conn, tokens):
+    # INFO: ids of the tokens (DataFrame of TOKEN_COLUMNS), the new ones are added to the dictionary.
+    #       The dictionary is small (one row by token), it is read whole
+    tokens = tokens[TOKEN_COLUMNS].fillna("").astype(str)
+    stmt = "INSERT INTO t_tokens (blockChain, contractAddress, symbol, name, decimal) VALUES (?,?,?,?,?) ON CONFLICT DO NOTHING"
+    conn.executemany(stmt, tokens.drop_duplicates().itertuples(index=False, name=None))
+
+    df_tokens = pd.read_sql_query("SELECT id, blockChain, contractAddress, symbol, name, decimal FROM t_tokens", conn)
+    df_tokens[TOKEN_COLUMNS] = df_tokens[TOKEN_COLUMNS].astype(str)
+
+    return tokens.merge(df_tokens, how="left", on=TOKEN_COLUMNS)["id"].values
+
+
+def project(conn, table, df):
+    # INFO: Rows of a movement table (as the explorer sends them) to t_movements rows
+    kind = TABLES[table]
+    out = pd.DataFrame({
+        "blockChain": df["blockChain"],
+        "type": kind,
+        "blockNumber": df["blockNumber"],
+        "timeStamp": df["timeStamp"],
+        "hash": df["hash"],
+        "methodId": df.get("methodId", "0x") if kind == TRANSACTION else "0x",
+        "functionName": df.get("functionName", "") if kind == TRANSACTION else "",
+    })
+
+    tokens = pd.DataFrame({"blockChain": df["blockChain"]})
+    if kind in (TRANSACTION, INTERNALS):
+        tokens["contractAddress"] = ""
+        tokens["symbol"] = df["blockChain"].map(lambda chain: NATIVE.get(chain, NATIVE["eth"])[0])
+        tokens["name"] = df["blockChain"].map(lambda chain: NATIVE.get(chain, NATIVE["eth"])[1])
+        tokens["decimal"] = 18
+        out["isError"] = df["isError"]
+    else:
+        tokens["contractAddress"] = df["contractAddress"]
+        tokens["symbol"] = df["tokenSymbol"]
+        tokens["name"] = df["tokenName"]
+        tokens["decimal"] = df["tokenDecimal"] if kind != MULTITOKEN else 0
+        out["isError"] = 0
+
+    out["from_id"] = address_ids(conn, df["from"])
+    out["to_id"] = address_ids(conn, df["to"])
+    out["contract_id"] = address_ids(conn, df["contractAddress"])
+    out["token_id"] = token_ids(conn, tokens)
+
+    if kind in AMOUNTS:
+        out["value"] = wei.integer_strings(df["value"])
+        decimals = pd.to_numeric(tokens["decimal"], errors="coerce")
+        out["valConv"] = [wei.to_float(raw, dec) if dec == dec else None for raw, dec in zip(out["value"], decimals)]
+    else:
+        out["value"] = df["tokenID"]
+        out["valConv"] = None
+    out["tokenValue"] = df["tokenValue"] if kind == MULTITOKEN else None
+
+    # INFO: Fee in wei, exact (Python ints)
+    if kind == TRANSACTION:
+        out["gas"] = (pd.to_numeric(df["gasPrice"]).astype(object) * pd.to_numeric(df["gasUsed"]).astype(object)).astype(str)
+    else:
+        out["gas"] = None
+
+    return out[COLUMNS]
+
+
+def union(native, df_trx, df_int, df_trf, df_nft, df_mul):
+    # INFO: Frames as the explorer sends them (by type) in one frame of UNION columns, by time. Ties keep the
+    #       order of the frames, as the ORDER BY of SQLite over the UNION ALL did. valConv of the amounts is
+    #       left to the exact conversion of the caller (wei), of nfts and multitoken it is the tokenID
+    parts = []
+    for kind, df in zip(TYPES, (df_trx, df_int, df_trf, df_nft, df_mul)):
+        out = pd.DataFrame({
+            "blockChain": df["blockChain"],
+            "type": kind,
+            "hash": df["hash"],
+            "from": df["from"],
+            "to": df["to"],
+            "contractAddress": df["contractAddress"],
+            "timeStamp": df["timeStamp"],
+        })
+        if kind in ("transaction", "internals"):
+            out["value"] = df["value"]
+            out["symbol"], out["name"] = native
+            out["decimal"] = 18
+            out["valConv"] = None
+            out["isError"] = df["isError"]
+        else:
+            out["value"] = df["value"] if kind == "transfers" else df["tokenID"]
+            out["symbol"] = df["tokenSymbol"]
+            out["name"] = df["tokenName"]
+            out["decimal"] = df["tokenValue"] if kind == "multitoken" else df["tokenDecimal"]
+            out["valConv"] = None if kind == "transfers" else df["tokenID"]
+            out["isError"] = 0
+        out["methodId"] = df["methodId"] if kind == "transaction" else "0x"
+        out["functionName"] = df["functionName"] if kind == "transaction" else ""
+        parts.append(out[UNION])
+
+    df_all = pd.concat(parts, ignore_index=True)
+    order = np.argsort(pd.to_numeric(df_all["timeStamp"]).to_numpy(), kind="stable")
+    return df_all.iloc[order].reset_index(drop=True)
+
+
+def backfill(conn):
+    # INFO: Fill t_movements from the movement tables of a db created before it existed, through the
+    #       same projection as the ingest
+    if conn.execute("SELECT 1 FROM t_movements LIMIT 1").fetchone() is not None:
+        return 0
+
+    count = 0
+    for table in TABLES:
+        if len(db.table_columns(conn, table)) == 0:
+            continue
+        for df in pd.read_sql_query(f"SELECT * FROM {table}", conn, chunksize=50000):
+            count += db.insert_ignore(conn, "t_movements", project(conn, table, df))
+
+    return count
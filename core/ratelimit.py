@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+__author__ = "KennBro"
+__copyright__ = "Copyright 2024, Personal Research"
+__credits__ = ["KennBro"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "KennBro"
+__email__ = "kennbro <at> protonmail <dot> com"
+__status__ = "Development"
+
+import time
+import logging
+import threading
+from urllib.parse import urlparse
+
+
+logger = logging.getLogger(__name__)
+
+RATE_DEFAULT = 5  # INFO: Calls per second of a free Etherscan/BscScan key
+
+rate = RATE_DEFAULT
+buckets = {}
+buckets_lock = threading.Lock()
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # INFO: The token is reserved before sleeping (tokens can go negative), so concurrent
+        #       callers queue one behind the other instead of racing for the same refill
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+def configure(config):
+    # INFO: rate_limit in config.yaml (calls per second for every key and host)
+    global rate
+
+    new_rate = float(config.get("rate_limit", RATE_DEFAULT))
+    if new_rate <= 0:
+        raise ValueError(f"rate_limit must be positive, not {new_rate}")
+
+    with buckets_lock:
+        rate = new_rate
+        for bucket in buckets.values():
+            bucket.rate = new_rate
+            bucket.capacity = new_rate
+
+
+def acquire(key, url):
+    # INFO: Block until the (key, host) bucket allows a call. Return the seconds waited
+    host = urlparse(url).netloc
+    with buckets_lock:
+        bucket = buckets.get((key, host))
+        if bucket is None:
+            bucket = TokenBucket(rate)
+            buckets[(key, host)] = bucket
+
+    wait = bucket.acquire()
+    if wait > 0:
+        logger.debug(f"Rate limit {host}: waited {wait:0.4f} seconds")
+    return wait
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+__author__ = "KennBro"
+__copyright__ = "Copyright 2024, Personal Research"
+__credits__ = ["KennBro"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "KennBro"
+__email__ = "kennbro <at> protonmail <dot> com"
+__status__ = "Development"
+
+import decimal
+import pandas as pd  # pyright: ignore
+
+
+# INFO: Amounts are stored as decimal text of integer units (wei), a uint256 has 78 digits at most.
+#       Exact sums are done with Python ints
+CONTEXT = decimal.Context(prec=100)
+
+
+class Wei(float):
+    # INFO: Converted value (a float for the classification) that keeps its exact raw units,
+    #       so sums of Wei can be exact (see add)
+    def __new__(cls, raw, decimals):
+        value = super().__new__(cls, to_float(raw, decimals))
+        value.raw = int(raw)
+        value.decimals = int(decimals)
+        return value
+
+    def __reduce__(self):
+        # NOTE: Pickled with its raw units (classification workers)
+        return (Wei, (self.raw, self.decimals))
+
+
+def to_decimal(raw, decimals):
+    return CONTEXT.scaleb(decimal.Decimal(str(raw)), -int(decimals))
+
+
+def to_float(raw, decimals):
+    return float(to_decimal(raw, decimals))
+
+
+def add(total, value):
+    # INFO: Exact running sum as (raw, decimals) or None once a value without raw units is added
+    if (total is None) or (not isinstance(value, Wei)) or (total[1] != value.decimals):
+        return None
+    return (total[0] + value.raw, total[1])
+
+
+def integer_strings(values):
+    # NOTE: Old dbs (value integer) hand back floats for amounts over 64 bits, those are already inexact
+    digits = values.astype(str)
+    inexact = digits.str.contains(r"[.eE]", regex=True)
+    if inexact.any():
+        digits[inexact] = digits[inexact].map(lambda v: str(int(float(v))))
+    return digits
+
+
+def exact_sum(values):
+    # INFO: Exact sum of raw amounts (Python ints, over 64 bits)
+    return sum((int(value) for value in values), 0)
+
+
+def to_floats(values, decimals):
+    # INFO: Wei by row (exact raw units, one rounding) from amounts and their decimals
+    return pd.Series([Wei(raw, dec) for raw, dec in zip(integer_strings(values), decimals)], index=values.index, dtype=object)
+
+
+# INFO: SQL helpers registered on every connection (db.connect)
+def sql_add(a, b):
+    if (a is None) or (b is None):
+        return None
+    return str(CONTEXT.add(decimal.Decimal(str(a)), decimal.Decimal(str(b))))
+
+
+def sql_to_float(a):
+    if a is None:
+        return None
+    return float(a)
+
+
+def register(conn):
+    conn.create_function("wei_add", 2, sql_add, deterministic=True)
+    conn.create_function("wei_to_float", 1, sql_to_float, deterministic=True)
@@ -9,7 +9,6 @@ build_options = {
         'flask_cors',
         'sqlalchemy',
         'sqlalchemy.dialects.sqlite',
-        'pandasql',
         'pandas',
         'pyarrow',
         'sqlite3',
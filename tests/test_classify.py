@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+__author__ = "KennBro"
+__copyright__ = "Copyright 2024, Personal Research"
+__credits__ = ["KennBro"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "KennBro"
+__email__ = "kennbro <at> protonmail <dot> com"
+__status__ = "Development"
+
+import hashlib
+
+import pandas as pd  # pyright: ignore
+import pytest  # pyright: ignore
+
+from core import eth
+from core import backend
+from core import classify
+from core import movements
+
+
+# INFO: Graph of the synthetic wallet (core/backend.py) as the loop by hash of store_nodes_links_db classified it
+#       before the rule table: (nodes, contracts, links, sum of counts, digest of nodes, digest of links).
+#       Run with python -m pytest from the root of the repo
+CENTRAL = "0x7f3acf451e372f517b45f9d2ee0e42e31bc5e53e"
+EXPECTED = {
+    300: (22, 10, 123, 256, "8a255a27838810c8", "9b040ed548f2612f"),
+    2000: (141, 77, 822, 1690, "c29450e050cfedd4", "e3a38886350a521e"),
+}
+
+
+def digest(lines):
+    return hashlib.sha256("\n".join(lines).encode()).hexdigest()[:16]
+
+
+def synthetic_movements(address, size):
+    # INFO: Movements of the synthetic wallet as the ingest gives them to the classification
+    wallet = backend.synthetic_wallet(address, size)
+    frames = [pd.DataFrame(wallet[action]).assign(blockChain="eth") for action in ("txlist", "txlistinternal", "tokentx", "tokennfttx", "token1155tx")]
+    df_all, _ = eth.prepare_movements(movements.union(("ETH", "Ether"), *frames))
+    return df_all
+
+
+@pytest.mark.parametrize("size", sorted(EXPECTED))
+def test_rule_table_matches_loop(size):
+    graph = classify.classify(synthetic_movements(CENTRAL, size), CENTRAL, set(), 1)
+
+    nodes = sorted(graph.nodes.items())
+    links = sorted((key, link["count"], sorted(link["action"])) for key, link in graph.links.items())
+    result = (
+        len(nodes),
+        sum(contract for _, contract in nodes),
+        len(links),
+        sum(count for _, count, _ in links),
+        digest(f"{address} {int(contract)}" for address, contract in nodes),
+        digest(f"{key} {count} {','.join(actions)}" for key, count, actions in links),
+    )
+    assert result == EXPECTED[size]